@@ -0,0 +1,61 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: attribute_chains.py
+Purpose: Throughput of attribute chain heavy predicates with the closure
+    backend.
+
+usage: python benchmarks/attribute_chains.py [n_orders] [repeat]
+
+The first table times the attribute expressions alone (the lowered function
+of each, evaluated on one order), the second whole queries.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from pyflwor.lower import lower
+from codegen_throughput import orders
+
+EXPRESSIONS = [
+    'self.quantity',
+    'self.customer.city',
+    'self.customer.name.lower()',
+    'self.product.name[0]',
+]
+
+QUERIES = [
+    ('one link', 'orders[self.quantity > 50]'),
+    ('chain', 'orders[self.customer.city == self.agent.city]'),
+    ('call in chain', 'orders[self.customer.name.lower() == "steve"]'),
+    ('flwr join', '''for o in <orders[self.quantity > 95]>, p in <orders[self.quantity < 5]>
+                     where o.customer.city == p.customer.city
+                     return o.quantity, p.quantity'''),
+]
+
+def main(n=20000, repeat=5):
+    namespace = {'orders': orders(n)}
+    ns = {'self': namespace['orders'][0]}
+    print('%-28s %13s' % ('expression', 'eval (us)'))
+    for expr in EXPRESSIONS:
+        f = lower(pyflwor.parse('return ' + expr).ret.values[0])
+        number = 100000
+        t = min(timeit.repeat(lambda: f(ns), number=number, repeat=repeat))
+        print('%-28s %13.3f' % (expr, t/number*1e6))
+    print()
+    print('%d orders' % n)
+    print('%-14s %13s' % ('query', 'closure (ms)'))
+    for name, query in QUERIES:
+        q = pyflwor.compile(query)
+        t = min(timeit.repeat(lambda: q(namespace), number=1, repeat=repeat))
+        print('%-14s %13.2f' % (name, t*1000))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,73 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: bag_results.py
+Purpose: Throughput of queries returning bags (dedup='bag', lists of every
+    result) against the default de-duplicated OrderedSets.
+
+usage: python benchmarks/bag_results.py [n_orders] [repeat]
+
+The orders are those of codegen_throughput.py, the bookstore workload has
+n_orders/100 stores of 100 books each (the README example, scaled up).
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+from random import Random
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from codegen_throughput import orders
+
+class Book(object):
+    def __init__(self, title, lang, price):
+        self.title = title
+        self.lang = lang
+        self.price = price
+
+class Bookstore(object):
+    def __init__(self, name, books):
+        self.name = name
+        self.books = books
+
+def stores(n, seed=5):
+    rand = Random(seed)
+    return [Bookstore('store %d' % i,
+                      [Book('book %d' % j, rand.choice(['eng', 'fr']),
+                            round(rand.random()*60, 2)) for j in range(100)])
+            for i in range(max(n//100, 1))]
+
+QUERIES = [
+    ('orders', 'orders[self.quantity > 20]'),
+    ('order products', 'orders/product'),
+    ('order quantities', 'orders/quantity'),
+    ('orders union', 'orders[self.quantity > 20] | orders[self.quantity < 80]'),
+    ('orders for', 'for o in <orders[self.quantity > 50]> return o.quantity'),
+    ('books', 'stores/books[self.price > 30.0]'),
+    ('book prices', 'stores/books/price'),
+    ('books for', 'for b in <stores/books[self.lang == "eng"]> return b.price'),
+]
+
+def main(n=100000, repeat=5):
+    namespace = {'orders': orders(n), 'stores': stores(n)}
+    print('%d orders, %d books' % (n, sum(len(s.books) for s in namespace['stores'])))
+    print('%-17s %-9s %11s %9s %9s %9s' % ('query', 'backend', 'value (ms)', 'bag (ms)',
+                                         'speedup', 'results'))
+    for name, query in QUERIES:
+        for backend in pyflwor.BACKENDS:
+            times = list()
+            for dedup in ('value', 'bag'):
+                q = pyflwor.compile(query, backend=backend, dedup=dedup)
+                times.append(min(timeit.repeat(lambda: q(namespace), number=1, repeat=repeat)))
+            results = '%d/%d' % (len(pyflwor.compile(query, backend=backend)(namespace)),
+                                 len(q(namespace)))
+            print('%-17s %-9s %11.2f %9.2f %8.1fx %9s' % (
+                name, backend, times[0]*1000, times[1]*1000, times[0]/times[1], results))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
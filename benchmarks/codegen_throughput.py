@@ -0,0 +1,58 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: codegen_throughput.py
+Purpose: Throughput of the closure and the code generating backends on filter
+    heavy path queries.
+
+usage: python benchmarks/codegen_throughput.py [n_orders] [repeat]
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+from random import Random
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pyflwor
+from pyflwor.examples import Customer, Agent, Product, Order
+
+QUERIES = [
+    ('eq filter', 'orders[self.customer.name == "Steve"]'),
+    ('and filter', 'orders[self.customer.name == "Steve" and self.agent.name == "Ullman"]'),
+    ('range filter', 'orders[self.quantity > 20 and self.quantity <= 80]/product/name'),
+    ('in list', 'orders[self.customer.city in ["Cleveland", "DC"]]'),
+    ('arith', 'orders[self.quantity * self.product.price > 1000.0]'),
+]
+
+def orders(n, seed=5):
+    rand = Random(seed)
+    cities = ['Cleveland', 'DC', 'Columbus', 'Cincinnati', 'New York']
+    customers = [Customer(name, rand.choice(cities), rand.random()/4)
+                 for name in ['Joe', 'Charlie', 'Harry', 'Steve', 'Tealc', 'Jack']]
+    agents = [Agent(name, rand.choice(cities), rand.random()/2)
+              for name in ['Aho', 'Lam', 'Sethi', 'Ullman']]
+    products = [Product('p%d' % i, rand.choice(cities), rand.randint(1, 1000),
+                        rand.random()*100) for i in range(50)]
+    return [Order(rand.choice(customers), rand.choice(agents),
+                  rand.choice(products), rand.randint(0, 100))
+            for _ in range(n)]
+
+def main(n=20000, repeat=5):
+    namespace = {'orders': orders(n)}
+    print('%d orders' % n)
+    print('%-14s %13s %13s %9s' % ('query', 'closure (ms)', 'codegen (ms)', 'speedup'))
+    for name, query in QUERIES:
+        c = pyflwor.compile(query, backend='closure')
+        g = pyflwor.compile(query, backend='codegen')
+        assert c(namespace) == g(namespace)
+        tc = min(timeit.repeat(lambda: c(namespace), number=1, repeat=repeat))
+        tg = min(timeit.repeat(lambda: g(namespace), number=1, repeat=repeat))
+        print('%-14s %13.2f %13.2f %8.1fx' % (name, tc*1000, tg*1000, tc/tg))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
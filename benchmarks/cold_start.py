@@ -0,0 +1,66 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: cold_start.py
+Purpose: Time to compile a library of saved queries in a fresh process, with
+    and without the on disk plan cache.
+
+usage: python benchmarks/cold_start.py [n_queries] [repeat]
+
+Every run is a new python process which imports pyflwor and compiles
+n_queries distinct queries. "no cache" does not use the plan cache, "warm"
+reads every plan from a cache directory filled by an earlier process.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, shutil, subprocess, tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CHILD = r'''
+import sys, time
+start = time.time()
+sys.path.insert(0, %(root)r)
+import pyflwor
+for i in range(%(n)d):
+    pyflwor.compile(%(query)r %% (i, i))
+print(time.time() - start)
+'''
+
+QUERY = '''
+    for o in <orders[self.quantity > %d and self.customer.city in ["DC", "Cleveland"]]>
+    let total = o.quantity * o.product.price
+    where total > %d.0
+    order by 'total' desc
+    return 'customer':o.customer.name, 'total':total
+'''
+
+def run(n, cache_dir=None):
+    env = dict(os.environ)
+    env.pop('PYFLWOR_CACHE_DIR', None)
+    if cache_dir is not None:
+        env['PYFLWOR_CACHE_DIR'] = cache_dir
+    code = CHILD % {'root':ROOT, 'n':n, 'query':QUERY}
+    out = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return float(out.decode('utf-8').strip().split()[-1])
+
+def main(n=300, repeat=5):
+    cache_dir = tempfile.mkdtemp()
+    try:
+        run(n, cache_dir) ## fills the cache
+        cold = min(run(n) for _ in range(repeat))
+        warm = min(run(n, cache_dir) for _ in range(repeat))
+    finally:
+        shutil.rmtree(cache_dir)
+    print('%d queries' % n)
+    print('%-10s %10.1f ms' % ('no cache', cold*1000))
+    print('%-10s %10.1f ms' % ('warm', warm*1000))
+    print('speedup    %10.1fx' % (cold/warm))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
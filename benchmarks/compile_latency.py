@@ -0,0 +1,55 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: compile_latency.py
+Purpose: Benchmark for compile latency with and without the shared LALR tables.
+
+usage: python benchmarks/compile_latency.py [repeat]
+
+"rebuilt" regenerates the parser tables and lexer for every compile (what
+pyflwor.compile did before the tables were shared), "shared" is the current
+pyflwor.compile with the compiled query cache disabled.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from pyflwor.parser import Parser
+from pyflwor.lexer import Lexer
+
+QUERIES = [
+    ('short path', 'a'),
+    ('filtered path', 'orders[self.customer.name == "Steve" and self.agent.name == "Ullman"]'),
+    ('flwr', '''
+        for bookstore in <stores>
+        let prices = <bookstore/books/price>
+        where avg(prices) < 45
+        return 'Bookstore':bookstore.name, 'Avg Price':avg(prices)
+    '''),
+]
+
+def rebuilt(query):
+    parser = Parser._build()
+    lexer = Lexer._build()
+    return parser.parse(query, lexer=lexer)
+
+def shared(query):
+    return pyflwor.compile(query, cache=False)
+
+def main(repeat=50):
+    shared('a') ## builds the shared tables once, outside of the timings
+    print('%-16s %14s %14s %9s' % ('query', 'rebuilt (ms)', 'shared (ms)', 'speedup'))
+    for name, query in QUERIES:
+        r = min(timeit.repeat(lambda: rebuilt(query), number=1, repeat=max(repeat//10, 3)))
+        s = min(timeit.repeat(lambda: shared(query), number=1, repeat=repeat))
+        print('%-16s %14.3f %14.3f %8.1fx' % (name, r*1000, s*1000, r/s))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
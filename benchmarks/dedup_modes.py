@@ -0,0 +1,61 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: dedup_modes.py
+Purpose: Throughput of path queries de-duplicating their results by value, by
+    identity and not at all (bags), one column per pyflwor.DEDUPS mode.
+
+usage: python benchmarks/dedup_modes.py [n_orders] [repeat]
+
+"orders" are the objects of codegen_throughput.py (default __hash__ and
+__eq__), "records" the same orders with a __hash__ and __eq__ written in python
+over a key, as objects mapped from database rows often have.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from codegen_throughput import orders
+
+class Record(object):
+    def __init__(self, key, order):
+        self.key = key
+        self.quantity = order.quantity
+        self.customer = order.customer
+    def __hash__(self):
+        return hash((self.__class__.__name__, self.key))
+    def __eq__(self, other):
+        return (isinstance(other, Record) and self.key == other.key)
+
+QUERIES = [
+    ('orders', 'orders'),
+    ('orders filter', 'orders[self.quantity > 50]'),
+    ('records', 'records'),
+    ('records filter', 'records[self.quantity > 50]'),
+    ('records union', 'records[self.quantity > 20] | records[self.quantity < 80]'),
+]
+
+def main(n=100000, repeat=5):
+    objects = orders(n)
+    namespace = {'orders': objects,
+                 'records': [Record(i, o) for i, o in enumerate(objects)]}
+    print('%d orders' % n)
+    print('%-16s %-9s' % ('query', 'backend') +
+          ''.join(' %13s' % ('%s (ms)' % dedup) for dedup in pyflwor.DEDUPS))
+    for name, query in QUERIES:
+        for backend in pyflwor.BACKENDS:
+            times = list()
+            for dedup in pyflwor.DEDUPS:
+                q = pyflwor.compile(query, backend=backend, dedup=dedup)
+                times.append(min(timeit.repeat(lambda: q(namespace), number=1, repeat=repeat)))
+            print('%-16s %-9s' % (name, backend) + ''.join(' %13.2f' % (t*1000) for t in times))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,59 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: descendant_axis.py
+Purpose: Time of a descendant step (root/descendant::tag) over random cyclic graphs of
+    growing size, to check it is linear in the number of nodes.
+
+usage: python benchmarks/descendant_axis.py [max_nodes] [fanout]
+
+Every node links to fanout random nodes (so the graph is full of cycles and
+most nodes are reached many times) and one node in a hundred has a tag. The
+graphs double in size up to max_nodes, the time per node should stay flat.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, time
+from random import Random
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+
+QUERY = 'root/descendant::tag'
+
+class Node(object):
+    __slots__ = ('kids', 'tag')
+
+def graph(n, fanout, seed=5):
+    rand = Random(seed)
+    nodes = [Node() for _ in range(n)]
+    for i, node in enumerate(nodes):
+        node.kids = [nodes[rand.randrange(n)] for _ in range(fanout)]
+        if i % 100 == 0:
+            node.tag = i
+    ## every node reachable from the root
+    nodes[0].kids.extend(nodes[1:])
+    return nodes[0]
+
+def main(n=1000000, fanout=3):
+    sizes = [n]
+    while sizes[0] >= 250000:
+        sizes.insert(0, sizes[0] // 2)
+    print('%-10s %-10s %10s %10s %14s' % ('backend', 'nodes', 'results', 'time (s)', 'per node (us)'))
+    for size in sizes:
+        namespace = {'root': graph(size, fanout)}
+        for backend in pyflwor.BACKENDS:
+            q = pyflwor.compile(QUERY, backend=backend)
+            start = time.time()
+            r = q(namespace)
+            elapsed = time.time() - start
+            print('%-10s %-10d %10d %10.3f %14.3f' % (backend, size, len(r), elapsed,
+                                                    elapsed/size*1e6))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
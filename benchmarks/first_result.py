@@ -0,0 +1,56 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: first_result.py
+Purpose: Time to the first result of a path query, computing the whole result
+    versus iterating it.
+
+usage: python benchmarks/first_result.py [n_stores] [repeat]
+
+Every store has 100 books, the query matches the books of the first store.
+"all" builds the result set, "first" takes the first result of iterate and
+"some" is a quantifier over the path (consumed lazily as well).
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+
+class Store(object):
+    def __init__(self, n, books):
+        self.n = n
+        self.books = books
+
+class Book(object):
+    def __init__(self, price):
+        self.price = price
+
+QUERY = 'stores/books[self.price < 10]'
+SOME = 'x[some b in <stores/books> satisfies (b.price < 10)]'
+
+def stores(n):
+    return [Store(i, [Book(i * 100 + j) for j in range(100)]) for i in range(n)]
+
+def main(n=1000, repeat=5):
+    namespace = {'stores': stores(n), 'x': 1}
+    print('%d stores, %d books' % (n, n * 100))
+    print('%-10s %11s %11s %11s' % ('backend', 'all (ms)', 'first (ms)', 'some (ms)'))
+    for backend in pyflwor.BACKENDS:
+        q = pyflwor.compile(QUERY, backend=backend)
+        s = pyflwor.compile(SOME, backend=backend)
+        times = [
+            min(timeit.repeat(lambda: q(namespace), number=1, repeat=repeat)),
+            min(timeit.repeat(lambda: next(q.iterate(namespace)), number=1, repeat=repeat)),
+            min(timeit.repeat(lambda: s(namespace), number=1, repeat=repeat)),
+        ]
+        print('%-10s %11.3f %11.3f %11.3f' % ((backend,) + tuple(t*1000 for t in times)))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
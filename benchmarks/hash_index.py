@@ -0,0 +1,69 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: hash_index.py
+Purpose: Throughput of equality predicates answered by a hash index of the
+    collection against scanning it.
+
+usage: python benchmarks/hash_index.py [n_orders] [repeat]
+
+The orders are those of codegen_throughput.py (6 customers, 50 products). The
+time to build the indexes is reported on its own. The indexes are timed
+checked against the collection on every lookup (the default) and unverified
+(verify=False).
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from codegen_throughput import orders
+
+QUERIES = [
+    ('customer', 'orders[self.customer.name == "Steve"]'),
+    ('customer and', 'orders[self.customer.name == "Steve" and self.quantity > 50]'),
+    ('product', 'orders[self.product.name == "p7"]/quantity'),
+    ('product param', 'orders[self.product.name == $name]'),
+]
+
+class Orders(list):
+    '''a list which can be weakly referenced (as an indexed collection must be)'''
+
+def index(orders, verify=True):
+    pyflwor.drop_index(orders)
+    pyflwor.index(orders, 'customer.name', verify=verify)
+    pyflwor.index(orders, 'product.name', verify=verify)
+
+def main(n=100000, repeat=5):
+    namespace = {'orders': Orders(orders(n)), '$name': 'p7'}
+    print('%d orders' % n)
+    print('%-14s %-9s %10s %11s %11s %9s %8s' % ('query', 'backend', 'scan (ms)',
+          'index (ms)', 'unverified', 'speedup', 'results'))
+    compiled = [(name, backend, pyflwor.compile(query, backend=backend))
+                for name, query in QUERIES for backend in pyflwor.BACKENDS]
+    scans = [min(timeit.repeat(lambda: q(namespace), number=1, repeat=repeat))
+             for _, _, q in compiled]
+    expected = [q(namespace) for _, _, q in compiled]
+    build = min(timeit.repeat(lambda: index(namespace['orders']), number=1, repeat=repeat))
+    times = list()
+    ## indexes checked against the collection on every lookup, then not
+    for verify in (True, False):
+        index(namespace['orders'], verify)
+        for (_, _, q), result in zip(compiled, expected):
+            assert q(namespace) == result
+        times.append([min(timeit.repeat(lambda: q(namespace), number=1, repeat=repeat))
+                      for _, _, q in compiled])
+    for (name, backend, q), scan, t, u, result in zip(compiled, scans, times[0], times[1],
+                                                     expected):
+        print('%-14s %-9s %10.2f %11.3f %11.3f %8.0fx %8d' % (name, backend, scan*1000,
+              t*1000, u*1000, scan/t, len(result)))
+    print('building both indexes: %.2f ms' % (build*1000))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,61 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: import_time.py
+Purpose: Tracks the cost of `import pyflwor` using python -X importtime.
+
+usage: python benchmarks/import_time.py [repeat] [budget_ms]
+
+Runs `import pyflwor` in repeat fresh processes (after one run which writes the
+byte code caches) and prints the best cumulative import time of the package,
+the most expensive modules it imports and whether the parser machinery (PLY)
+was loaded. Exits with status 1 if the import took longer than budget_ms, so
+the script can guard against regressions.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+def importtime(statement='import pyflwor'):
+    '''returns {module: (self_us, cumulative_us)} for one fresh process'''
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    p = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', statement],
+                         env=env, stderr=subprocess.PIPE)
+    _, err = p.communicate()
+    if p.returncode != 0:
+        raise RuntimeError(err.decode('utf-8'))
+    modules = dict()
+    for line in err.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative))
+    return modules
+
+def main(repeat=10, budget_ms=None):
+    importtime() ## writes the .pyc files
+    runs = [importtime() for _ in range(repeat)]
+    best = min(runs, key=lambda m: m['pyflwor'][1])
+    total = best['pyflwor'][1]/1000.0
+    print('import pyflwor: %.1f ms (best of %d)' % (total, repeat))
+    print('ply loaded:     %s' % any(m == 'ply' or m.startswith('ply.') for m in best))
+    print('past loaded:    %s' % any(m == 'past' or m.startswith('past.') for m in best))
+    print('most expensive modules (cumulative ms):')
+    top = sorted(best.items(), key=lambda kv: kv[1][1], reverse=True)[1:11]
+    for name, (self_us, cumulative) in top:
+        print('    %-28s %7.2f' % (name, cumulative/1000.0))
+    if budget_ms is not None and total > budget_ms:
+        print('over budget (%.1f ms > %d ms)' % (total, budget_ms))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
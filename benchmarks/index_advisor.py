@@ -0,0 +1,66 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: index_advisor.py
+Purpose: Cost of recording the predicate workload for the index advisor and
+    throughput of the workload once the advisor created its indexes.
+
+usage: python benchmarks/index_advisor.py [n_orders] [repeat]
+
+The orders are those of codegen_throughput.py. The workload is run without
+recording, while recording, and in auto mode after the indexes were created.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from codegen_throughput import orders
+
+QUERIES = [
+    'orders[self.customer.name == "Steve" and self.quantity > 50]',
+    'orders[self.quantity >= 40 and self.quantity < 45]',
+    'orders[self.product.name == $name]',
+    'orders[self.product.price > 50.0 and self.product.price < 52.5]',
+    'orders[self.agent.commision > 0.1]',
+]
+
+class Orders(list):
+    '''a list which can be weakly referenced'''
+
+def main(n=100000, repeat=5):
+    namespace = {'orders': Orders(orders(n)), '$name': 'p7'}
+    print('%d orders' % n)
+    for backend in pyflwor.BACKENDS:
+        compiled = [pyflwor.compile(q, backend=backend) for q in QUERIES]
+        def workload():
+            return [q(namespace) for q in compiled]
+        expected = workload()
+        base = min(timeit.repeat(workload, number=1, repeat=repeat))
+        pyflwor.advise()
+        recording = min(timeit.repeat(workload, number=1, repeat=repeat))
+        advice = pyflwor.index_advice()
+        pyflwor.clear_index_advice()
+        pyflwor.advise(auto=True, min_runs=2)
+        workload(); workload()
+        assert workload() == expected
+        auto = min(timeit.repeat(workload, number=1, repeat=repeat))
+        pyflwor.advise(False)
+        pyflwor.clear_index_advice()
+        pyflwor.drop_index(namespace['orders'])
+        print('%s: scan %.2f ms, recording %.2f ms (%+.0f%%), auto indexed %.2f ms (%.1fx)'
+              % (backend, base*1000, recording*1000, (recording/base - 1)*100,
+                 auto*1000, base/auto))
+        for a in advice:
+            print('    %-15s %-7s runs %3d  selectivity %.3f  savings %8d  memory %6d kB'
+                  % ('.'.join(a.chain), a.kind, a.runs, a.selectivity, a.savings,
+                     a.memory//1024))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,66 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: json_documents.py
+Purpose: Throughput of path queries navigating a large json document (dicts
+    and lists as returned by json.load) by key.
+
+usage: python benchmarks/json_documents.py [n_orders] [repeat]
+
+The document is the orders of codegen_throughput.py serialized to json and
+loaded back. The "objects" column runs the same query over the original
+objects for comparison.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, json, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from codegen_throughput import orders
+
+QUERIES = [
+    ('one step', 'doc/orders/quantity'),
+    ('nested', 'doc/orders/customer/city'),
+    ('filter', 'doc/orders[self["quantity"] > 50]/product/name'),
+    ('deep filter', 'doc/orders[self["customer"]["city"] == "Cleveland"]/agent/name'),
+]
+
+def document(objects):
+    def record(o):
+        return {
+            'quantity': o.quantity,
+            'customer': {'name': o.customer.name, 'city': o.customer.city},
+            'agent': {'name': o.agent.name, 'city': o.agent.city},
+            'product': {'name': o.product.name},
+        }
+    return json.loads(json.dumps({'orders': [record(o) for o in objects]}))
+
+def main(n=20000, repeat=5):
+    objects = orders(n)
+    namespace = {'doc': document(objects)}
+    class Doc(object):
+        pass
+    doc = Doc()
+    doc.orders = objects
+    objects_namespace = {'doc': doc}
+    print('%d orders' % n)
+    print('%-12s %13s %13s %13s' % ('query', 'closure (ms)', 'codegen (ms)', 'objects (ms)'))
+    for name, query in QUERIES:
+        times = list()
+        for backend in pyflwor.BACKENDS:
+            q = pyflwor.compile(query, backend=backend)
+            times.append(min(timeit.repeat(lambda: q(namespace), number=1, repeat=repeat)))
+        ## the objects have attributes where the document has keys
+        q = pyflwor.compile(query.replace('self["customer"]["city"]', 'self.customer.city')
+                                 .replace('self["quantity"]', 'self.quantity'))
+        times.append(min(timeit.repeat(lambda: q(objects_namespace), number=1, repeat=repeat)))
+        print('%-12s %13.2f %13.2f %13.2f' % ((name,) + tuple(t*1000 for t in times)))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,63 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: lexer_throughput.py
+Purpose: Throughput of the PLY Lexer and the single pass Tokenizer.
+
+usage: python benchmarks/lexer_throughput.py [repeat]
+
+Lexes generated queries (long literal lists, long comment headers) with both
+front ends and reports the time per query, tokens per second and the time to
+parse the query with each.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from pyflwor.lexer import Lexer
+from pyflwor.tokenizer import Tokenizer
+
+def value_list(n):
+    return 'items[self.id in [%s]]' % ', '.join(str(i*7) for i in range(n))
+
+def string_list(n):
+    return 'items[self.name in [%s]]' % ', '.join('"name %d"' % i for i in range(n))
+
+def comment_header(n):
+    lines = ['/*', ' * generated report query'] + [' * line %d of the header *' % i for i in range(n)]
+    return '\n'.join(lines + [' */', 'for x in <items[self.a > 1.5]> return x.b'])
+
+QUERIES = [
+    ('1000 numbers', value_list(1000)),
+    ('1000 strings', string_list(1000)),
+    ('comment 500', comment_header(500)),
+    ('small', 'orders[self.customer.name == "Steve" and self.agent.name == "Ullman"]'),
+]
+
+def lex(factory, query):
+    l = factory()
+    l.input(query)
+    return sum(1 for _ in l)
+
+def main(repeat=20):
+    print('%-14s %7s %12s %12s %8s %14s %14s' % ('query', 'tokens', 'ply (ms)',
+        'tokenizer', 'speedup', 'parse ply', 'parse tok'))
+    for name, query in QUERIES:
+        n = lex(Lexer, query)
+        assert n == lex(Tokenizer, query)
+        p = min(timeit.repeat(lambda: lex(Lexer, query), number=1, repeat=repeat))
+        t = min(timeit.repeat(lambda: lex(Tokenizer, query), number=1, repeat=repeat))
+        pp = min(timeit.repeat(lambda: pyflwor.parse(query, lexer='ply'), number=1, repeat=repeat))
+        pt = min(timeit.repeat(lambda: pyflwor.parse(query, lexer='tokenizer'), number=1, repeat=repeat))
+        print('%-14s %7d %12.3f %12.3f %7.1fx %14.3f %14.3f' % (name, n, p*1000,
+            t*1000, p/t, pp*1000, pt*1000))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
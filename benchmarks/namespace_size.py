@@ -0,0 +1,61 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: namespace_size.py
+Purpose: Benchmark for the per execution cost of a path query as the namespace grows.
+
+usage: python benchmarks/namespace_size.py [number]
+
+Times short queries against namespaces padded with unrelated entries. The
+second and third bind a variable (self, x) per candidate, which used to copy
+the whole namespace. "class seed" is the cost of building a class from the
+namespace, which every path query paid before the root step was resolved in
+the namespace directly.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+
+SIZES = [10, 100, 1000, 10000]
+QUERIES = [
+    'l/n',
+    'l[self.n > 2]/n',
+    'for x in <l> where x.n > 2 return x.n',
+]
+
+class A(object):
+    def __init__(self, n):
+        self.n = n
+
+def namespace(size):
+    d = dict(('pad%d' % i, i) for i in range(size))
+    d['l'] = [A(i) for i in range(5)]
+    return d
+
+def main(number=2000):
+    for query in QUERIES:
+        print(query)
+        print('%-10s %16s %16s %16s' % ('entries', 'closure (us)', 'codegen (us)',
+                                        'class seed (us)'))
+        for size in SIZES:
+            ns = namespace(size)
+            times = list()
+            for backend in pyflwor.BACKENDS:
+                q = pyflwor.compile(query, backend=backend)
+                times.append(min(timeit.repeat(lambda: q(ns), number=number, repeat=3)))
+            times.append(min(timeit.repeat(lambda: type('base', (object,), ns),
+                                           number=number, repeat=3)))
+            print('%-10d %16.2f %16.2f %16.2f' % ((size,) +
+                  tuple(t/number*1e6 for t in times)))
+        print()
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
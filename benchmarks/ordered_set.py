@@ -0,0 +1,62 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: ordered_set.py
+Purpose: Memory and throughput of the OrderedSet holding path results, with
+    the builtin (unordered) set for reference.
+
+usage: python benchmarks/ordered_set.py [n] [repeat]
+
+The members are n distinct objects; the second operand of the set operations
+holds every other one of them plus n/2 new ones. Memory is the size of one set
+of n members as measured by tracemalloc (the members themselves excluded).
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit, tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor.OrderedSet import OrderedSet
+
+class Member(object):
+    __slots__ = ('n',)
+    def __init__(self, n):
+        self.n = n
+
+def size(cls, members):
+    tracemalloc.start()
+    s = cls(members)
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del s
+    return current
+
+def main(n=1000000, repeat=3):
+    members = [Member(i) for i in range(n)]
+    others = members[::2] + [Member(i) for i in range(n, n + n//2)]
+    print('%d members' % n)
+    print('%-12s %10s %10s %10s %10s %10s %10s %12s' % (
+        'set', 'build', 'iterate', '|', '&', '-', '==', 'memory (MiB)'))
+    for cls in (OrderedSet, set):
+        a, b = cls(members), cls(others)
+        c = cls(members)
+        t = lambda f: min(timeit.repeat(f, number=1, repeat=repeat)) * 1000
+        times = [
+            t(lambda: cls(members)),
+            t(lambda: sum(1 for _ in a)),
+            t(lambda: a | b),
+            t(lambda: a & b),
+            t(lambda: a - b),
+            t(lambda: a == c),
+        ]
+        print('%-12s %10.1f %10.1f %10.1f %10.1f %10.1f %10.1f %12.1f' % (
+            (cls.__name__,) + tuple(times) + (size(cls, members) / 2.**20,)))
+    print('(times in ms)')
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
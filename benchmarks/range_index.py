@@ -0,0 +1,71 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: range_index.py
+Purpose: Throughput of range predicates answered by a sorted index of the
+    collection against scanning it.
+
+usage: python benchmarks/range_index.py [n_orders] [repeat]
+
+The orders are those of codegen_throughput.py (quantities 0 to 100, product
+prices 0 to 100). The time to build the indexes is reported on its own. The
+indexes are timed checked against the collection on every lookup (the
+default) and unverified (verify=False).
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from codegen_throughput import orders
+
+QUERIES = [
+    ('quantity >', 'orders[self.quantity > 95]'),
+    ('quantity <=', 'orders[20 >= self.quantity]/quantity'),
+    ('closed range', 'orders[self.quantity >= 40 and self.quantity < 45]'),
+    ('range param', 'orders[self.quantity > $lo and self.quantity <= $hi]'),
+    ('price range', 'orders[self.product.price > 50.0 and self.product.price < 52.5]'),
+    ('quantity ==', 'orders[self.quantity == 7]'),
+]
+
+class Orders(list):
+    '''a list which can be weakly referenced (as an indexed collection must be)'''
+
+def index(orders, verify=True):
+    pyflwor.drop_index(orders)
+    pyflwor.index(orders, 'quantity', kind='sorted', verify=verify)
+    pyflwor.index(orders, 'product.price', kind='sorted', verify=verify)
+
+def main(n=100000, repeat=5):
+    namespace = {'orders': Orders(orders(n)), '$lo': 60, '$hi': 62}
+    print('%d orders' % n)
+    print('%-13s %-9s %10s %11s %11s %9s %8s' % ('query', 'backend', 'scan (ms)',
+          'index (ms)', 'unverified', 'speedup', 'results'))
+    compiled = [(name, backend, pyflwor.compile(query, backend=backend))
+                for name, query in QUERIES for backend in pyflwor.BACKENDS]
+    scans = [min(timeit.repeat(lambda: q(namespace), number=1, repeat=repeat))
+             for _, _, q in compiled]
+    expected = [q(namespace) for _, _, q in compiled]
+    build = min(timeit.repeat(lambda: index(namespace['orders']), number=1, repeat=repeat))
+    times = list()
+    ## indexes checked against the collection on every lookup, then not
+    for verify in (True, False):
+        index(namespace['orders'], verify)
+        for (_, _, q), result in zip(compiled, expected):
+            assert q(namespace) == result
+        times.append([min(timeit.repeat(lambda: q(namespace), number=1, repeat=repeat))
+                      for _, _, q in compiled])
+    for (name, backend, q), scan, t, u, result in zip(compiled, scans, times[0], times[1],
+                                                     expected):
+        print('%-13s %-9s %10.2f %11.3f %11.3f %8.0fx %8d' % (name, backend, scan*1000,
+              t*1000, u*1000, scan/t, len(result)))
+    print('building both indexes: %.2f ms' % (build*1000))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
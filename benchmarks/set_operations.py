@@ -0,0 +1,55 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: set_operations.py
+Purpose: Throughput of set operations of path expressions (| & -) against
+    computing every operand and combining the result sets.
+
+usage: python benchmarks/set_operations.py [n_orders] [repeat]
+
+"operands" compiles every operand on its own and combines their OrderedSets
+with the python operators, "query" runs the whole expression (a chain of one
+operator is computed as a unit, see symbols.setValue).
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, timeit
+from functools import reduce
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+from codegen_throughput import orders
+
+QUERIES = [
+    ('|', ['orders[self.quantity > 20]', 'orders[self.quantity < 80]']),
+    ('&', ['orders[self.quantity > 20]', 'orders[self.quantity < 80]']),
+    ('&', ['orders', 'orders[self.quantity > 10]', 'orders[self.quantity == 50]']),
+    ('&', ['orders', 'orders[self.quantity > 10]', 'orders[self.quantity > 200]']),
+    ('-', ['orders', 'orders[self.quantity > 10]', 'orders[self.quantity < 5]']),
+]
+
+OPS = {'|': lambda a, b: a | b, '&': lambda a, b: a & b, '-': lambda a, b: a - b}
+
+def main(n=100000, repeat=5):
+    namespace = {'orders': orders(n)}
+    print('%d orders' % n)
+    print('%-4s %-9s %-14s %-14s %8s' % ('op', 'backend', 'operands (ms)', 'query (ms)', 'results'))
+    for op, operands in QUERIES:
+        query = (' %s ' % op).join(operands)
+        print(query)
+        for backend in pyflwor.BACKENDS:
+            parts = [pyflwor.compile(o, backend=backend) for o in operands]
+            q = pyflwor.compile(query, backend=backend)
+            naive = lambda: reduce(OPS[op], [p(namespace) for p in parts])
+            assert list(naive()) == list(q(namespace))
+            times = [min(timeit.repeat(f, number=1, repeat=repeat)) for f in (naive, lambda: q(namespace))]
+            print('%-4s %-9s %-14.2f %-14.2f %8d' % ((op, backend) + tuple(t*1000 for t in times) +
+                                                  (len(q(namespace)),)))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
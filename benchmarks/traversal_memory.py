@@ -0,0 +1,68 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: traversal_memory.py
+Purpose: Peak memory and time of a path query over a wide fan out graph with
+    the breadth and depth traversals.
+
+usage: python benchmarks/traversal_memory.py [n_stores] [fanout]
+
+stores/books/editions/prints with fanout children per object at every level.
+The filter on the last step keeps the result small, so the peak memory is
+(nearly) all traversal state. Memory is measured with tracemalloc, which
+slows everything down: the times are only comparable with each other.
+'''
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os, sys, time, tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyflwor import pyflwor
+
+QUERY = 'stores/books/editions/prints[self.n == 0]'
+
+class Node(object):
+    __slots__ = ('n', 'books', 'editions', 'prints')
+
+def node(n, name=None, kids=()):
+    x = Node()
+    x.n = n
+    if name is not None:
+        setattr(x, name, kids)
+    return x
+
+def stores(n, fanout):
+    k = iter(range(1, 1 << 62))
+    return [node(next(k), 'books', [
+                node(next(k), 'editions', [
+                    node(next(k), 'prints', [node(next(k)) for _ in range(fanout)])
+                    for _ in range(fanout)])
+                for _ in range(fanout)])
+            for _ in range(n)]
+
+def measure(q, namespace):
+    tracemalloc.start()
+    start = time.time()
+    q(namespace)
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, elapsed
+
+def main(n=20, fanout=30):
+    namespace = {'stores': stores(n, fanout)}
+    print('%d stores, fanout %d, %d prints' % (n, fanout, n * fanout ** 3))
+    print('%-10s %-10s %12s %10s' % ('backend', 'traversal', 'peak (KiB)', 'time (s)'))
+    for backend in pyflwor.BACKENDS:
+        for traversal in pyflwor.TRAVERSALS:
+            q = pyflwor.compile(QUERY, backend=backend, traversal=traversal)
+            peak, elapsed = measure(q, namespace)
+            print('%-10s %-10s %12.1f %10.3f' % (backend, traversal, peak/1024., elapsed))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,74 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: IdentitySet.py
+Purpose: An insertion ordered set comparing its members by identity, the result
+    of the path queries compiled with dedup='identity' (see pyflwor.compile).
+'''
+
+try:
+    from collections.abc import MutableSet, Set
+except ImportError:
+    from collections import MutableSet, Set
+
+class IdentitySet(MutableSet):
+    '''
+    An insertion ordered set of objects which are the same object (is) rather
+    than equal (==). The members are never hashed, so any object can be one
+    (lists and dicts included) and adding one costs a dict insertion keyed by
+    its id. The set holds a reference to every member, so an id can not be
+    reused by another object while its member is in the set.
+    '''
+
+    __slots__ = ('map',)
+
+    def __init__(self, iterable=None):
+        self.map = {} ## id --> member, in insertion order
+        if iterable is not None:
+            m = self.map
+            for x in iterable:
+                m.setdefault(id(x), x)
+
+    def __len__(self):
+        return len(self.map)
+
+    def __contains__(self, x):
+        return id(x) in self.map
+
+    def __iter__(self):
+        return iter(self.map.values())
+
+    def __reversed__(self):
+        return reversed(list(self.map.values()))
+
+    def add(self, x):
+        self.map.setdefault(id(x), x)
+
+    def discard(self, x):
+        self.map.pop(id(x), None)
+
+    def __repr__(self):
+        if not self:
+            return '%s()' % (self.__class__.__name__,)
+        return '%s(%r)' % (self.__class__.__name__, list(self))
+
+    def __eq__(self, other):
+        '''
+        the same members (in the same order if other is an IdentitySet as
+        well, in any order for any other set)
+        '''
+        if isinstance(other, IdentitySet):
+            return list(self.map) == list(other.map)
+        if isinstance(other, Set):
+            return len(self) == len(other) and all(x in self for x in other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
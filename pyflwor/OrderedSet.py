@@ -1,23 +1,60 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: OrderedSet.py
+Purpose: An insertion ordered set, the result of path queries.
+
+The members are the keys of an (insertion ordered) dict whose values are all
+None. A member costs one dict entry, there are no reference cycles to collect
+and building, iterating and combining sets runs in C: the set operations feed
+the members of one dict to dict.fromkeys through filter or chain rather than
+looping in python.
+'''
 from __future__ import print_function
-from builtins import next
-from builtins import range
-# OrderedSet by Raymond Hettinger
-# Active State Recipe 576694
-# Licensed Under the MIT License see the LICENSE file
-# see http://code.activestate.com/recipes/576694/
-
-import collections
-
-KEY, PREV, NEXT = list(range(3))
-
-class OrderedSet(collections.MutableSet):
+from builtins import filter, map
+
+from itertools import chain
+from operator import eq
+
+try:
+    from itertools import filterfalse
+except ImportError:
+    from itertools import ifilterfalse as filterfalse
+
+try:
+    from collections.abc import MutableSet, Set
+except ImportError:
+    from collections import MutableSet, Set
+
+def _members(other):
+    '''a container of the members of other with a fast __contains__'''
+    if isinstance(other, OrderedSet):
+        return other.map
+    if isinstance(other, (Set, dict)):
+        return other
+    return dict.fromkeys(other)
+
+class OrderedSet(MutableSet):
+    '''
+    A set remembering the order its members were first added in. The binary
+    operators keep the order of the left operand, followed (for | and ^) by the
+    new members of the right one. Two OrderedSets are equal if they have the
+    same members in the same order, an OrderedSet and any other set if they
+    have the same members.
+    '''
 
     def __init__(self, iterable=None):
-        self.end = end = []
-        end += [None, end, end]         # sentinel node for doubly linked list
-        self.map = {}                   # key --> [key, prev, next]
-        if iterable is not None:
-            self |= iterable
+        self.map = {} if iterable is None else dict.fromkeys(iterable)
+
+    @classmethod
+    def _from_map(cls, m):
+        s = cls.__new__(cls)
+        s.map = m
+        return s
 
     def __len__(self):
         return len(self.map)
@@ -25,52 +62,140 @@ class OrderedSet(collections.MutableSet):
     def __contains__(self, key):
         return key in self.map
 
-    def add(self, key):
-        if key not in self.map:
-            end = self.end
-            curr = end[PREV]
-            curr[NEXT] = end[PREV] = self.map[key] = [key, curr, end]
-
-    def discard(self, key):
-        if key in self.map:
-            key, prev, next = self.map.pop(key)
-            prev[NEXT] = next
-            next[PREV] = prev
-
     def __iter__(self):
-        end = self.end
-        curr = end[NEXT]
-        while curr is not end:
-            yield curr[KEY]
-            curr = curr[NEXT]
+        return iter(self.map)
 
     def __reversed__(self):
-        end = self.end
-        curr = end[PREV]
-        while curr is not end:
-            yield curr[KEY]
-            curr = curr[PREV]
+        return reversed(list(self.map))
+
+    def add(self, key):
+        self.map[key] = None
+
+    def discard(self, key):
+        self.map.pop(key, None)
 
     def pop(self, last=True):
-        if not self:
+        if not self.map:
             raise KeyError('set is empty')
-        key = next(reversed(self)) if last else next(iter(self))
-        self.discard(key)
+        if last:
+            return self.map.popitem()[0]
+        key = next(iter(self.map))
+        del self.map[key]
         return key
 
-    def __repr__(self):
-        if not self:
-            return '%s()' % (self.__class__.__name__,)
-        return '%s(%r)' % (self.__class__.__name__, list(self))
+    def clear(self):
+        self.map.clear()
+
+    def copy(self):
+        return self._from_map(dict(self.map))
+
+    ## -------------------------------------------------- set operations --
+
+    def __or__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return self._from_map(dict.fromkeys(chain(self.map, other)))
+
+    def __and__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return self._from_map(dict.fromkeys(filter(_members(other).__contains__, self.map)))
+
+    def __sub__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return self._from_map(dict.fromkeys(filterfalse(_members(other).__contains__, self.map)))
+
+    def __xor__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        other = OrderedSet(other) if not isinstance(other, OrderedSet) else other
+        return (self - other) | (other - self)
+
+    def __ror__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return OrderedSet(other) | self
+
+    def __rand__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return OrderedSet(other) & self
+
+    def __rsub__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return OrderedSet(other) - self
+
+    def __rxor__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return OrderedSet(other) ^ self
+
+    def __ior__(self, other):
+        self.map.update(dict.fromkeys(other))
+        return self
+
+    def __iand__(self, other):
+        self.map = (self & OrderedSet(other)).map
+        return self
+
+    def __isub__(self, other):
+        if other is self:
+            self.map.clear()
+        else:
+            for key in other:
+                self.map.pop(key, None)
+        return self
+
+    def union(self, *others):
+        return self._from_map(dict.fromkeys(chain(self.map, *others)))
+
+    def intersection(self, *others):
+        s = self
+        for other in others:
+            s = s & OrderedSet(other)
+        return s if others else self.copy()
+
+    def difference(self, *others):
+        s = self
+        for other in others:
+            s = s - OrderedSet(other)
+        return s if others else self.copy()
+
+    def isdisjoint(self, other):
+        return not any(map(_members(other).__contains__, self.map))
+
+    ## ----------------------------------------------------- comparisons --
+
+    def __le__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return len(self) <= len(other) and all(map(_members(other).__contains__, self.map))
+
+    def __lt__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return len(self) < len(other) and self <= other
+
+    def __ge__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return len(self) >= len(other) and all(map(self.map.__contains__, other))
+
+    def __gt__(self, other):
+        if not isinstance(other, Set): return NotImplemented
+        return len(self) > len(other) and self >= other
 
     def __eq__(self, other):
         if other is None: return False
         if isinstance(other, OrderedSet):
-            return len(self) == len(other) and list(self) == list(other)
-        return set(self) == set(other)
+            return len(self) == len(other) and all(map(eq, self.map, other.map))
+        if isinstance(other, Set):
+            return len(self) == len(other) and all(map(self.map.__contains__, other))
+        return self.map.keys() == set(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        if not self:
+            return '%s()' % (self.__class__.__name__,)
+        return '%s(%r)' % (self.__class__.__name__, list(self))
 
-    def __del__(self):
-        self.clear()                    # remove circular references
+    def __reduce__(self):
+        return (self.__class__, (list(self.map),))
 
 
 if __name__ == '__main__':
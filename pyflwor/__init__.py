@@ -9,5 +9,13 @@ File: __init__
 '''
 from __future__ import absolute_import
 
-from .pyflwor import compile, execute
+__version__ = '1.2'
+
+from .pyflwor import compile, execute, parse, explain
+from .pyflwor import prepare, PreparedQuery
+from .pyflwor import fingerprint, template_stats, clear_template_stats
+from .pyflwor import index, drop_index
+from .pyflwor import advise, index_advice, clear_index_advice
+from .pyflwor import cache_info, set_cache_size, clear_cache
+from .pyflwor import set_plan_cache, plan_cache_info
 
@@ -0,0 +1,218 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: advisor.py
+Purpose: Recommends indexes from the predicates the queries evaluate.
+
+While the advisor records (pyflwor.advise) every path step over a collection
+of at least min_size members whose where clause has probes (conjuncts an index
+could answer, see optimizer.index_probes) is counted per collection and
+attribute chain: the equality and range predicates on the chain, the members
+the step checked and the fraction of the members satisfying the predicates
+on the chain (their selectivity, estimated on a sample of at most SAMPLE
+members). An index by the chain would have spared the step checking the other
+members, the sum of these over the steps are the estimated savings of the
+index. Collections which can not be weakly referenced are not recorded (the
+advisor would keep them alive).
+
+In auto mode an index is created once a chain has been probed min_runs times
+and would have spared at least half of the members checked, as long as the
+estimated memory of the indexes created so (which are still alive) stays
+within the budget. The indexes created so are dropped when recording stops,
+unless pyflwor.index claimed them since.
+'''
+from builtins import object
+
+import operator
+import threading
+import weakref
+from collections import namedtuple
+from itertools import islice
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+try:
+    from . import indexes
+except SystemError:
+    import indexes
+
+Advice = namedtuple('Advice', ['collection', 'chain', 'kind', 'runs', 'equalities',
+                               'ranges', 'selectivity', 'checked', 'savings', 'memory',
+                               'indexed'])
+
+## the (estimated) bytes an index takes per member of its collection
+BYTES = {'hash': 56, 'sorted': 64}
+
+## the members the selectivity of the predicates of a step is estimated on
+SAMPLE = 64
+
+OPS = {'==': operator.eq, '<': operator.lt, '<=': operator.le,
+       '>': operator.gt, '>=': operator.ge}
+
+def _sample(collection, n):
+    '''
+    at most SAMPLE members of the collection of n members: evenly spaced ones
+    of a sequence, the first ones of any other collection (which can only be
+    iterated)
+    '''
+    if isinstance(collection, Sequence):
+        k = min(n, SAMPLE)
+        return [collection[i*n//k] for i in range(k)]
+    return list(islice(collection, SAMPLE))
+
+def _selectivity(collection, n, chain, ops):
+    '''
+    the fraction of a sample of the members of collection whose chain
+    satisfies every (op, value) of ops. Members the comparisons fail on are
+    counted as an index would (they are candidates of every lookup).
+    '''
+    get = operator.attrgetter('.'.join(chain))
+    sample = _sample(collection, n)
+    if not sample: return 1.0
+    matched = 0
+    for x in sample:
+        try:
+            key = get(x)
+            if all(OPS[op](key, value) for op, value in ops):
+                matched += 1
+        except Exception:
+            matched += 1
+    return matched / float(len(sample))
+
+class Workload(object):
+    '''the counters of the probes of the steps over one collection by chain'''
+
+    def __init__(self, collection, callback):
+        self.ref = indexes.reference(collection, callback)
+        ## chain -> [runs, equalities, ranges, selectivities, checked, savings]
+        self.chains = dict()
+
+class Advisor(object):
+    '''
+    The Workloads of the collections steps with probes went over while
+    recording, see the module docstring. The lock is reentrant as the
+    callback of a weak reference can run while it is held (as in indexes.py).
+    '''
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.workloads = dict() ## id(collection) -> Workload
+        self.auto = False
+        self.budget = 0
+        self.min_size = 1000
+        self.min_runs = 10
+        self.created = weakref.WeakKeyDictionary() ## auto created index -> bytes
+
+    def start(self, auto=False, budget=64*2**20, min_size=1000, min_runs=10):
+        if budget < 0 or min_size < 0 or min_runs < 1:
+            raise ValueError("expected budget >= 0, min_size >= 0 and min_runs >= 1")
+        self.auto = auto
+        self.budget = budget
+        self.min_size = min_size
+        self.min_runs = min_runs
+        indexes.observer = self.observe
+
+    def stop(self):
+        '''stops recording and drops the indexes created in auto mode'''
+        if indexes.observer == self.observe:
+            indexes.observer = None
+        with self.lock:
+            created = list(self.created)
+            self.created.clear()
+        for index in created:
+            collection = index.ref()
+            entry = indexes.indexes_of(collection) if collection is not None else None
+            if entry is not None and entry.indexes.get(index.chain) is index:
+                indexes.drop(collection, index.chain)
+
+    def claim(self, index):
+        '''the index is no longer the advisor's to drop (see pyflwor.index)'''
+        with self.lock:
+            self.created.pop(index, None)
+
+    def observe(self, collection, probes, found):
+        '''counts the (chain, op, value) probes of a step over collection'''
+        try:
+            n = len(collection)
+        except TypeError:
+            return
+        if n < self.min_size or iter(collection) is collection: return
+        bychain = dict()
+        for chain, op, value in probes:
+            bychain.setdefault(chain, []).append((op, value))
+        selectivities = [(chain, ops, _selectivity(collection, n, chain, ops))
+                         for chain, ops in bychain.items()]
+        checked = n if found is None else len(found)
+        entry = indexes.indexes_of(collection)
+        create = list()
+        with self.lock:
+            key = id(collection)
+            workload = self.workloads.get(key)
+            if workload is None or workload.ref() is not collection:
+                def dead(ref, key=key):
+                    with self.lock:
+                        if key in self.workloads and self.workloads[key].ref is ref:
+                            del self.workloads[key]
+                try:
+                    workload = Workload(collection, dead)
+                except TypeError: ## not weakly referenced, it would be held
+                    return
+                self.workloads[key] = workload
+            for chain, ops, selectivity in selectivities:
+                counts = workload.chains.setdefault(chain, [0, 0, 0, 0.0, 0, 0.0])
+                equalities = sum(1 for op, _ in ops if op == '==')
+                counts[0] += 1
+                counts[1] += equalities
+                counts[2] += len(ops) - equalities
+                counts[3] += selectivity
+                counts[4] += checked
+                counts[5] += max(checked - selectivity*n, 0)
+                if self.auto and counts[0] >= self.min_runs and counts[5]*2 >= counts[4]:
+                    kind = 'hash' if counts[2] == 0 else 'sorted'
+                    index = entry.indexes.get(chain) if entry is not None else None
+                    memory = BYTES[kind]*n
+                    if ((index is None or index.kind == 'hash' and kind == 'sorted') and
+                        sum(self.created.values()) + memory <= self.budget):
+                        create.append((chain, kind, memory))
+        ## outside of the lock, see indexes.create
+        for chain, kind, memory in create:
+            index = indexes.create(collection, chain, kind)
+            with self.lock:
+                self.created[index] = memory
+
+    def advice(self):
+        '''
+        the Advice of the recorded chains an index (of the kind the
+        predicates need) by which does not exist, by estimated savings
+        '''
+        advice = list()
+        with self.lock:
+            workloads = list(self.workloads.values())
+        for workload in workloads:
+            collection = workload.ref()
+            if collection is None: continue
+            entry = indexes.indexes_of(collection)
+            with self.lock:
+                chains = [(chain, list(counts)) for chain, counts in workload.chains.items()]
+            for chain, (runs, equalities, ranges, selectivity, checked, savings) in chains:
+                kind = 'hash' if ranges == 0 else 'sorted'
+                index = entry.indexes.get(chain) if entry is not None else None
+                indexed = index.kind if index is not None else None
+                if indexed == kind or indexed == 'sorted' or savings <= 0: continue
+                advice.append(Advice(collection, chain, kind, runs, equalities, ranges,
+                                     selectivity/runs, checked, int(round(savings)),
+                                     BYTES[kind]*len(collection), indexed))
+        return sorted(advice, key=lambda a: (-a.savings, a.chain))
+
+    def clear(self):
+        with self.lock:
+            self.workloads.clear()
+
+ADVISOR = Advisor()
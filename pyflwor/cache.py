@@ -0,0 +1,90 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: cache.py
+Purpose: A bounded, thread safe cache of compiled queries.
+'''
+from builtins import object
+
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo',
+                       ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+class QueryCache(object):
+    '''
+    A least recently used cache mapping normalized query text to compiled query
+    functions. Compiled queries do not hold any per execution state so a single
+    compiled function can be handed out to every caller.
+
+    All operations take the cache lock, the (expensive) compilation itself is
+    done by the caller outside of the lock. If two threads miss on the same
+    query at the same time both compile it and the last one in wins.
+
+    maxsize == 0 disables caching (every lookup is a miss).
+    '''
+
+    def __init__(self, maxsize=512):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0, got %d" % maxsize)
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        '''returns the cached value for key (or None) and marks it as recently
+        used.'''
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            if not self.maxsize: return
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            self._evict()
+
+    def resize(self, maxsize):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0, got %d" % maxsize)
+        with self.lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        '''drops every entry and resets the counters'''
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self.maxsize, len(self.entries))
+
+    def _evict(self):
+        ## must be called with the lock held.
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,651 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: codegen.py
+Purpose: Compiles the query IR into the source of a single python function.
+
+This is an alternative to lowering the IR into a composition of the functions
+in symbols.py (see lower.py). Path steps become loops, and predicates, attribute
+lookups, calls and comparisons become inline python expressions, so evaluating
+a query does not cost a python function call per operator per object.
+
+Query variables (self, for/let names, quantifier names) become python locals,
+every other name is looked up in the namespace (objs) passed to the query.
+Constructs which need a query namespace at runtime (function definitions,
+collect) are not generated, Unsupported is raised instead and the caller falls
+back on the closure interpreter.
+'''
+from __future__ import absolute_import
+from builtins import object
+from builtins import str
+
+import keyword
+import re
+from itertools import chain
+
+try:
+    from . import ir
+    from .OrderedSet import OrderedSet
+    from .IdentitySet import IdentitySet
+    from .symbols import (MAPPINGS, asSet, descendants, div, setFilter, PARAM_PREFIX,
+                          Unhashable, valueSet, keySet)
+    from .indexes import probed, candidates
+except SystemError:
+    import ir
+    from OrderedSet import OrderedSet
+    from IdentitySet import IdentitySet
+    from symbols import (MAPPINGS, asSet, descendants, div, setFilter, PARAM_PREFIX,
+                         Unhashable, valueSet, keySet)
+    from indexes import probed, candidates
+
+
+class Unsupported(Exception):
+    '''raised for IR the generator can not (yet) compile'''
+
+
+def _flatten(tup):
+    if not isinstance(tup, tuple):
+        yield tup
+    else:
+        for i in tup:
+            if isinstance(i, tuple):
+                for j in _flatten(i):
+                    yield j
+            else:
+                yield i
+
+def _order(r, attr, direction, named, single):
+    '''sorts the results of a flwr expression (see symbols.flwrSequence)'''
+    if isinstance(attr, str):
+        if not named:
+            raise SyntaxError("Using a name in the order by clause when not using named return values.")
+    else:
+        if named:
+            raise SyntaxError("Using a number in the order by clause when not using positional return values.")
+    if single:
+        keyfunc = lambda x: x
+    else:
+        keyfunc = lambda x: x[attr]
+    return sorted(r, key=keyfunc, reverse=(direction != 'ASCD'))
+
+def _member(x, s, values):
+    '''x in the frozenset s of the literal values (see symbols.setexprConstant)'''
+    try:
+        return x in s
+    except TypeError:
+        return x in values
+
+_MISSING = object()
+
+## The helpers every generated function can refer to.
+RUNTIME = {
+    'OrderedSet': OrderedSet,
+    'IdentitySet': IdentitySet,
+    '_valueset': valueSet,
+    '_keyset': keySet,
+    '_Unhashable': Unhashable,
+    '_MAPPINGS': MAPPINGS,
+    '_descendants': descendants,
+    '_setfilter': setFilter,
+    '_asset': asSet,
+    '_probed': probed,
+    '_candidates': candidates,
+    '_chain': chain,
+    'str': str,
+    '_div': div,
+    '_flatten': _flatten,
+    '_order': _order,
+    '_member': _member,
+    '_MISSING': _MISSING,
+}
+
+_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+CMP = {'==':'==', '!=':'!=', '<':'<', '<=':'<=', '>':'>', '>=':'>='}
+ARITH = {'+':'+', '-':'-', '*':'*'}
+SETCMP = {'is':'==', 'is not':'!=', 'subset':'<=', 'superset':'>=',
+          'proper subset':'<', 'proper superset':'>'}
+
+
+class CodeGen(object):
+    '''
+    Generates the source of the query function. Expressions are returned as
+    strings, statements (loops, nested functions) are emitted into self.lines
+    at the current indentation. A construct which needs statements (a path, a
+    quantifier, a flwr) is emitted as a nested function definition right before
+    the line using it and the expression is a call to that function.
+    '''
+
+    def __init__(self, traversal='breadth', dedup='value'):
+        self.traversal = traversal
+        self.dedup = dedup
+        self.identity = dedup == 'identity'
+        ## the class of the results of a path
+        self.resultset = {'value':'_valueset', 'identity':'IdentitySet',
+                          'bag':'list'}[dedup]
+        self.lines = list()
+        self.depth = 1
+        self.counter = 0
+        self.consts = dict()
+        self.scopes = [dict()]
+        self.params = dict()
+
+    def generate(self, node):
+        ## bind parameters are read from the namespace once per execution
+        for name in ir.params(node):
+            self.params[name] = self.fresh('p_%s_' % name)
+            self.emit('%s = objs[%r]' % (self.params[name], PARAM_PREFIX + name))
+        body = self.expr(node)
+        self.emit('return ' + body)
+        return '\n'.join(['def query(objs):'] + self.lines) + '\n'
+
+    ## ----------------------------------------------------------- helpers --
+
+    def emit(self, line):
+        self.lines.append('    ' * self.depth + line)
+
+    def fresh(self, prefix='_t'):
+        self.counter += 1
+        return '%s%d' % (prefix, self.counter)
+
+    def const(self, value):
+        name = self.fresh('_c')
+        self.consts[name] = value
+        return name
+
+    def bind(self, name):
+        '''binds the query variable name in the innermost scope'''
+        ident = self.fresh('v_%s_' % name)
+        self.scopes[-1][name] = ident
+        return ident
+
+    def push(self):
+        self.scopes.append(dict())
+
+    def pop(self):
+        self.scopes.pop()
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def name(self, name):
+        ident = self.lookup(name)
+        if ident is not None: return ident
+        return 'objs[%r]' % name
+
+    def getattr(self, obj, name):
+        if _identifier.match(name) and not keyword.iskeyword(name):
+            return '%s.%s' % (obj, name)
+        return 'getattr(%s, %r)' % (obj, name)
+
+    def expr(self, node):
+        method = getattr(self, 'gen_' + node.__class__.__name__, None)
+        if method is None:
+            raise Unsupported(node.__class__.__name__)
+        return method(node)
+
+    ## ------------------------------------------------------------ values --
+
+    def gen_Literal(self, node):
+        v = node.value
+        if type(v) in (int, str, bool) or v is None:
+            return repr(v)
+        if type(v) is float and repr(v) not in ('inf', '-inf', 'nan'):
+            return repr(v)
+        return self.const(v)
+
+    def gen_Param(self, node):
+        return self.params[node.name]
+
+    def gen_AttributeValue(self, node):
+        first = node.attributes[0]
+        code = self.calls(self.name(first.name), first.calls)
+        for attr in node.attributes[1:]:
+            code = self.calls(self.getattr(code, attr.name), attr.calls)
+        return code
+
+    def calls(self, code, calls):
+        for call in calls or tuple():
+            params = [self.expr(p) for p in call.params]
+            if call.lookup:
+                code = '%s[%s]' % (code, params[0])
+            else:
+                code = '%s(%s)' % (code, ', '.join(params))
+        return code
+
+    def gen_Arith(self, node):
+        left = self.expr(node.left)
+        right = self.expr(node.right)
+        if node.op == '/':
+            return '_div(%s, %s)' % (left, right)
+        return '(%s %s %s)' % (left, ARITH[node.op], right)
+
+    def gen_If(self, node):
+        cond = self.expr(node.condition)
+        then = self.expr(node.then)
+        otherwise = self.expr(node.otherwise)
+        return '(%s if %s else %s)' % (then, cond, otherwise)
+
+    def gen_DictValue(self, node):
+        return '{%s}' % ', '.join('%s: %s' % (self.expr(k), self.expr(v))
+                                  for k, v in node.pairs)
+
+    def gen_ListValue(self, node):
+        return '[%s]' % ', '.join(self.expr(v) for v in node.values)
+
+    ## -------------------------------------------------------- predicates --
+
+    def gen_Compare(self, node):
+        return '(%s %s %s)' % (self.expr(node.left), CMP[node.op],
+                               self.expr(node.right))
+
+    def gen_BoolOp(self, node):
+        return '(%s %s %s)' % (self.expr(node.left), node.op,
+                               self.expr(node.right))
+
+    def gen_Not(self, node):
+        return '(not %s)' % self.expr(node.operand)
+
+    def gen_Bool(self, node):
+        if isinstance(node.operand, ir.Path):
+            ## only searched up to the first result
+            return '(next(%s, _MISSING) is not _MISSING)' % self.lazy_path(node.operand)
+        return 'bool(%s)' % self.expr(node.operand)
+
+    def gen_In(self, node):
+        if isinstance(node.collection, ir.ConstSet):
+            values = node.collection.values
+            test = '_member(%s, %s, %s)' % (self.expr(node.value),
+                self.const(frozenset(values)), self.const(values))
+            return test if node.op == 'in' else '(not %s)' % test
+        value = self.expr(node.value)
+        if isinstance(node.collection, ir.Path):
+            ## searched up to the first match
+            return '(%s %s %s)' % (value, node.op, self.lazy_path(node.collection))
+        return '(%s %s %s)' % (value, node.op, self.expr(node.collection))
+
+    def gen_SetCompare(self, node):
+        ## bags are compared as the sets of their members
+        left, right = [('_asset(%s)' if self.bag(n) else '%s') % self.expr(n)
+                       for n in (node.left, node.right)]
+        return '(%s %s %s)' % (left, SETCMP[node.op], right)
+
+    def gen_Quantified(self, node):
+        ## the collection is computed in the enclosing scope and passed in, a
+        ## path is passed as a generator and consumed up to the first x
+        ## deciding the expression.
+        if node.mode not in ('some', 'every'):
+            raise Exception("mode '%s' is not 'every' or 'some'" % node.mode)
+        if isinstance(node.collection, ir.Path):
+            collection = self.lazy_path(node.collection)
+        else:
+            collection = self.expr(node.collection)
+        fn = self.fresh('_q')
+        s = self.fresh()
+        empty = self.fresh()
+        self.emit('def %s(%s):' % (fn, s))
+        self.depth += 1
+        self.push()
+        var = self.bind(node.name)
+        self.emit('%s = True' % empty)
+        self.emit('for %s in %s:' % (var, s))
+        self.depth += 1
+        self.emit('%s = False' % empty)
+        cond = self.expr(node.satisfies)
+        if node.mode == 'some':
+            self.emit('if %s: return True' % cond)
+        else:
+            self.emit('if not %s: return False' % cond)
+        self.depth -= 1
+        ## an empty collection satisfies neither
+        if node.mode == 'some':
+            self.emit('return False')
+        else:
+            self.emit('return not %s' % empty)
+        self.pop()
+        self.depth -= 1
+        return '%s(%s)' % (fn, collection)
+
+    ## ------------------------------------------------------- collections --
+
+    def bag(self, node):
+        '''whether the results of the node are a list (a bag path, see ir.Path)'''
+        if isinstance(node, ir.Path):
+            return self.dedup == 'bag' or bool(node.bag)
+        return self.dedup == 'bag' and isinstance(node, ir.SetOp)
+
+    def gen_Path(self, node):
+        if self.traversal == 'depth':
+            return self.depth_path(node)
+        fn = self.fresh('_p')
+        self.emit('def %s():' % fn)
+        self.depth += 1
+        nxt = self.fresh()
+        self.emit('%s = []' % nxt)
+        first = node.steps[0]
+        v = self.fresh()
+        ident = self.lookup(first.name)
+        if ident is not None:
+            self.emit('%s = %s' % (v, ident))
+        else:
+            self.emit('if %r in objs:' % first.name)
+            self.depth += 1
+            self.emit('%s = objs[%r]' % (v, first.name))
+        self.step(first, v, nxt)
+        if ident is None:
+            self.depth -= 1
+        for step in node.steps[1:]:
+            level = self.fresh()
+            u = self.fresh()
+            self.emit('%s, %s = %s, []' % (level, nxt, nxt))
+            if step.descendant:
+                self.emit('%s = _descendants(%s, set())' % (level, level))
+            self.emit('for %s in %s:' % (u, level))
+            self.depth += 1
+            self.lookup_step(step, u, v)
+            self.step(step, v, nxt)
+            self.depth -= 1
+        if self.bag(node):
+            self.emit('return %s' % nxt)
+        else:
+            self.emit('return %s(%s)' % (self.resultset, nxt))
+        self.depth -= 1
+        return '%s()' % fn
+
+    def lazy_path(self, node, distinct=True):
+        '''
+        Returns an expression creating a generator of the results of the path
+        (in the order gen_Path computes them). The steps are nested loops, so
+        the results are produced one at a time and de-duplicated as they are
+        found (unless distinct is False or the path is a bag).
+        '''
+        fn = self.fresh('_i')
+        self.emit('def %s():' % fn)
+        self.depth += 1
+        seen = self.fresh()
+        depth, scopes = self.depth, len(self.scopes)
+        if not distinct or self.bag(node):
+            x = self.nested(node, 'return')
+        elif self.identity:
+            ## the objects are kept so their ids are not reused
+            self.emit('%s = {}' % seen)
+            x = self.nested(node, 'return')
+            self.emit('if id(%s) in %s: continue' % (x, seen))
+            self.emit('%s[id(%s)] = %s' % (seen, x, x))
+        else:
+            ## an unhashable result (a mapping record) by identity, see
+            ## symbols.unique
+            self.emit('%s = set()' % seen)
+            x = self.nested(node, 'return')
+            self.emit('try:')
+            self.emit('    if %s in %s: continue' % (x, seen))
+            self.emit('    %s.add(%s)' % (seen, x))
+            self.emit('except TypeError:')
+            self.emit('    if _Unhashable(%s) in %s: continue' % (x, seen))
+            self.emit('    %s.add(_Unhashable(%s))' % (seen, x))
+        self.emit('yield %s' % x)
+        del self.scopes[scopes:]
+        self.depth = depth - 1
+        return '%s()' % fn
+
+    def depth_path(self, node):
+        '''
+        gen_Path for traversal == 'depth': the steps are nested loops, so only
+        the objects on the current chain of steps are held rather than every
+        object of a level. The results are the same, in the same order.
+        '''
+        fn = self.fresh('_p')
+        self.emit('def %s():' % fn)
+        self.depth += 1
+        out = self.fresh()
+        depth, scopes = self.depth, len(self.scopes)
+        if self.bag(node):
+            self.emit('%s = []' % out)
+            x = self.nested(node, 'return []')
+            self.emit('%s.append(%s)' % (out, x))
+            del self.scopes[scopes:]
+            self.depth = depth
+            self.emit('return %s' % out)
+            self.depth -= 1
+            return '%s()' % fn
+        self.emit('%s = {}' % out) ## insertion ordered, de-duplicates in C
+        if self.identity:
+            x = self.nested(node, 'return %s()' % self.resultset)
+            self.emit('%s.setdefault(id(%s), %s)' % (out, x, x))
+            del self.scopes[scopes:]
+            self.depth = depth
+            self.emit('return IdentitySet(%s.values())' % out)
+            self.depth -= 1
+            return '%s()' % fn
+        ## records is set once an unhashable result (a mapping record) is
+        ## keyed by identity, see symbols.keySet
+        records = self.fresh()
+        self.emit('%s = False' % records)
+        x = self.nested(node, 'return %s()' % self.resultset)
+        self.emit('try:')
+        self.emit('    %s[%s] = None' % (out, x))
+        self.emit('except TypeError:')
+        self.emit('    %s[_Unhashable(%s)] = None' % (out, x))
+        self.emit('    %s = True' % records)
+        del self.scopes[scopes:]
+        self.depth = depth
+        self.emit('return _keyset(%s) if %s else OrderedSet(%s)' % (out, records, out))
+        self.depth -= 1
+        return '%s()' % fn
+
+    def nested(self, node, missing):
+        '''
+        emits one loop per step of the path, each nested in the loop of the
+        step before it, and returns the variable holding the results in the
+        innermost loop. missing is the statement run if the first step is not
+        in the namespace. The loops are left open (and their scopes pushed)
+        for the caller.
+        '''
+        first = node.steps[0]
+        ## the objects already searched by each descendant step
+        seen = dict()
+        for step in node.steps[1:]:
+            if step.descendant:
+                seen[id(step)] = self.fresh()
+                self.emit('%s = set()' % seen[id(step)])
+        v = self.fresh()
+        ident = self.lookup(first.name)
+        if ident is not None:
+            self.emit('%s = %s' % (v, ident))
+        else:
+            self.emit('if %r not in objs: %s' % (first.name, missing))
+            self.emit('%s = objs[%r]' % (v, first.name))
+        x = self.loop(first, v)
+        for step in node.steps[1:]:
+            if step.descendant:
+                d = self.fresh()
+                self.emit('for %s in _descendants((%s,), %s):' % (d, x, seen[id(step)]))
+                self.depth += 1
+                x = d
+            v = self.fresh()
+            self.lookup_step(step, x, v)
+            x = self.loop(step, v)
+        return x
+
+    def loop(self, step, v):
+        '''
+        emits a loop over the items of the value v of one step which skips the
+        items failing the where clause, returns the loop variable. The loop
+        body is left open (and self bound) for the caller.
+        '''
+        items = self.items(v, step.probes)
+        if step.where is None:
+            var = self.fresh()
+            self.emit('for %s in %s:' % (var, items))
+            self.depth += 1
+            return var
+        self.push()
+        var = self.bind('self')
+        self.emit('for %s in %s:' % (var, items))
+        self.depth += 1
+        self.emit('if not %s: continue' % self.expr(step.where))
+        return var
+
+    def lookup_step(self, step, u, v):
+        '''
+        emits the lookup of the value v of a step from the object u (the item
+        of a mapping, the attribute of anything else, see symbols.queryValue),
+        skipping u if it has none.
+        '''
+        self.emit('%s = %s.get(%r, _MISSING) if _MAPPINGS[type(%s)] else getattr(%s, %r, _MISSING)'
+                  % (v, u, step.name, u, u, step.name))
+        self.emit('if %s is _MISSING: continue' % v)
+
+    def items(self, v, probes=None):
+        '''
+        emits the items of the value v of a step: iterables other than strings
+        and mappings are iterated, anything else is a single item. With probes
+        (see ir.Probe) only the members an index of v gives are iterated if it
+        has one.
+        '''
+        items = self.fresh()
+        self.emit('if not isinstance(%s, str) and hasattr(%s, "__iter__") and not _MAPPINGS[type(%s)]:'
+                  % (v, v, v))
+        self.emit('    %s = %s' % (items, v))
+        if probes:
+            found = self.fresh()
+            self.emit('    if _probed(%s):' % v)
+            self.emit('        %s = _candidates(%s, [%s])' % (found, v, ', '.join(
+                '(%r, %r, %s)' % (p.chain, p.op, self.expr(p.value)) for p in probes)))
+            self.emit('        if %s is not None: %s = %s' % (found, items, found))
+        self.emit('else:')
+        self.emit('    %s = (%s,)' % (items, v))
+        return items
+
+    def step(self, step, v, out):
+        '''
+        emits the expansion of the value v of one step: every item passing the
+        where clause is appended to out.
+        '''
+        items = self.items(v, step.probes)
+        if step.where is None:
+            self.emit('%s.extend(%s)' % (out, items))
+            return
+        self.push()
+        var = self.bind('self')
+        self.emit('for %s in %s:' % (var, items))
+        self.depth += 1
+        cond = self.expr(step.where)
+        self.emit('if not %s: continue' % cond)
+        self.emit('%s.append(%s)' % (out, var))
+        self.depth -= 1
+        self.pop()
+
+    def gen_ConstSet(self, node):
+        return 'list(%s)' % self.const(node.values)
+
+    def gen_SetOp(self, node):
+        '''
+        a chain of one set operation (a & b & c) is computed as a whole, see
+        symbols.setValue
+        '''
+        operands = ir.operands(node)
+        if node.op == '|':
+            items = '_chain(%s)' % ', '.join(self.items_of(n) for n in operands)
+        else:
+            items = '_setfilter(%r, %s, [%s])' % (node.op, self.items_of(operands[0]),
+                ', '.join(self.expr(n) for n in operands[1:]))
+        return '%s(%s)' % (self.resultset, items)
+
+    def items_of(self, node):
+        '''
+        an iterable of the results of the collection node, lazy (and not
+        de-duplicated) for a path
+        '''
+        if isinstance(node, ir.Path):
+            return self.lazy_path(node, distinct=False)
+        return self.expr(node)
+
+    ## -------------------------------------------------------------- flwr --
+
+    def gen_FLWR(self, node):
+        if node.ret is None:
+            raise Unsupported('collect')
+        ## the for sequences are computed in the enclosing scope (they can not
+        ## see each other) and passed in. Bags already are lists.
+        seqs = [(self.expr(f.collection) if self.bag(f.collection) else
+                 'list(%s)' % self.expr(f.collection)) for f in node.fors or tuple()]
+        fn = self.fresh('_f')
+        params = [self.fresh() for _ in seqs]
+        self.emit('def %s(%s):' % (fn, ', '.join(params)))
+        self.depth += 1
+        self.push()
+        r = self.fresh()
+        self.emit('%s = []' % r)
+        loops = 0
+        for f, param in zip(node.fors or tuple(), params):
+            var = self.bind(f.name)
+            self.emit('for %s in %s:' % (var, param))
+            self.depth += 1
+            loops += 1
+        for let in node.lets or tuple():
+            value = self.expr(let.value)
+            self.emit('%s = %s' % (self.bind(let.name), value))
+        if node.where is not None:
+            cond = self.expr(node.where)
+            if loops:
+                self.emit('if not %s: continue' % cond)
+            else:
+                self.emit('if not %s: return tuple()' % cond)
+        ret = node.ret
+        values = [self.expr(v) for v in ret.values]
+        if ret.flatten:
+            self.emit('%s.extend(_flatten(%s))' % (r, values[0]))
+        elif ret.names is not None:
+            self.emit('%s.append({%s})' % (r, ', '.join(
+                '%r: %s' % (n, v) for n, v in zip(ret.names, values))))
+        elif len(values) == 1:
+            self.emit('%s.append(%s)' % (r, values[0]))
+        else:
+            self.emit('%s.append((%s,))' % (r, ', '.join(values)))
+        self.depth -= loops
+        self.pop()
+        if node.order is not None:
+            self.emit('if %s: %s = _order(%s, %r, %r, %r, %r)' % (
+                r, r, r, node.order.key, node.order.direction,
+                ret.names is not None,
+                ret.names is None and len(values) == 1))
+        self.emit('return tuple(%s)' % r)
+        self.depth -= 1
+        return '%s(%s)' % (fn, ', '.join(seqs))
+
+
+def source(node, traversal='breadth', dedup='value'):
+    '''returns the python source generated for the (optimized) IR'''
+    return CodeGen(traversal, dedup).generate(node)
+
+def generate(node, traversal='breadth', dedup='value'):
+    '''
+    Compiles the (optimized) IR into a python function which computes the
+    query. Raises Unsupported if the IR contains constructs the generator does
+    not handle.
+
+    traversal selects how paths are computed (see pyflwor.compile):
+        'breadth' -- one step at a time, every object of a level is kept in a
+                     list until the next step is taken (default)
+        'depth'   -- the steps are nested loops, only the current chain of
+                     objects is kept
+    dedup selects how the results of paths are de-duplicated, by 'value', by
+    'identity' or not at all, 'bag' (see pyflwor.compile).
+    '''
+    gen = CodeGen(traversal, dedup)
+    src = gen.generate(node)
+    namespace = dict(RUNTIME)
+    namespace.update(gen.consts)
+    exec(compile(src, '<pyflwor query>', 'exec'), namespace)
+    query = namespace['query']
+    object.__setattr__(query, '__objquery__', True)
+    object.__setattr__(query, '__source__', src)
+    return query
@@ -0,0 +1,325 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: indexes.py
+Purpose: Indexes of the members of a collection by an attribute chain.
+
+An index is registered on a collection object (see pyflwor.index) and answers
+the predicates of a path step over that collection which compare the attribute
+chain of self with a value (self.customer.name == "Steve", self.price > 30,
+see optimizer.index_probes). Hash indexes answer equality, sorted indexes
+equality and ranges. The index only narrows the members the where clause
+of the step is evaluated on: the clause is still evaluated on every candidate,
+so an index gives the same results in the same order as scanning the
+collection.
+
+An index is checked against its collection on every lookup (see
+Index.lookup) and rebuilt if the members or the values of their chains
+changed, so it never gives stale results. The check reads the chain of every
+member (in C), it is cheaper than a scan as long as the where clause is
+(function calls, several conditions, the closure backend). An index created
+with verify=False only notices changes of the length of the collection and
+is rebuilt by its owner after other changes.
+'''
+from builtins import object
+
+import datetime
+import heapq
+import numbers
+import threading
+import weakref
+from bisect import bisect_left, bisect_right
+from operator import attrgetter, itemgetter
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+## the types (besides numbers) a sorted index orders, their values are totally
+## ordered among themselves
+ORDERED = (str, bytes, datetime.date, datetime.time, datetime.timedelta)
+
+def _kind(value):
+    '''the values a sorted index orders together with value, None if unordered'''
+    if isinstance(value, numbers.Real): return numbers.Real
+    if isinstance(value, ORDERED): return type(value)
+    return None
+
+## the key of a member which does not have the chain
+_UNPLACED = object()
+
+def _keys(get, members):
+    '''the values of the chain (get) of the members, _UNPLACED for those without it'''
+    try:
+        return list(map(get, members))
+    except AttributeError:
+        keys = list()
+        for x in members:
+            try:
+                keys.append(get(x))
+            except AttributeError:
+                keys.append(_UNPLACED)
+        return keys
+
+class Index(object):
+    '''
+    The members of a collection arranged by the value of an attribute chain
+    of each. Members which do not have the chain or whose value the index can
+    not arrange are unplaced: they are candidates for every lookup (the where
+    clause decides about them as a scan would).
+
+    The index is built when it is created and keeps the value of the chain
+    of the member at each position of the collection. A lookup reads them
+    again, from the members the collection has then, and rebuilds the index
+    if any differs: members added, removed or replaced and chains changed in
+    place are all seen. Unless verify is False, then only a change of the
+    length of the collection is (call rebuild after other changes). The
+    candidates are the members of the collection at the time of the lookup.
+    '''
+
+    def __init__(self, ref, chain, verify=True):
+        self.ref = ref ## the collection, see Indexes
+        self.chain = chain
+        self.verify = verify
+        self.get = attrgetter('.'.join(chain))
+        self.rebuild()
+
+    def rebuild(self, members=None, keys=None):
+        if members is None:
+            members = list(self.ref())
+            keys = _keys(self.get, members)
+        placed = list()
+        unplaced = list()
+        for i, key in enumerate(keys):
+            if key is _UNPLACED:
+                unplaced.append(i)
+            else:
+                placed.append((key, i))
+        self.state = (keys, unplaced, self.build(placed, unplaced))
+
+    def lookup(self, probes):
+        '''
+        the members whose chain may satisfy every one of the (op, value)
+        probes, in collection order, or None if the index can not tell
+        '''
+        members = list(self.ref())
+        if not self.verify:
+            if len(members) != len(self.state[0]):
+                self.rebuild()
+        else:
+            keys = _keys(self.get, members)
+            try:
+                current = keys == self.state[0]
+            except Exception: ## a value which can not be compared
+                current = False
+            if not current:
+                self.rebuild(members, keys)
+        _, unplaced, arranged = self.state
+        positions = self.positions(arranged, probes)
+        if positions is None: return None
+        if unplaced:
+            positions = heapq.merge(positions, unplaced)
+        return list(map(members.__getitem__, positions))
+
+    def __len__(self):
+        return len(self.state[0])
+
+    def __repr__(self):
+        return '<%s %s of %d members>' % (self.__class__.__name__,
+                                          '.'.join(self.chain), len(self.state[0]))
+
+class HashIndex(Index):
+    '''An Index grouping the members by value, answering == predicates.'''
+
+    kind = 'hash'
+
+    def build(self, placed, unplaced):
+        '''value -> the positions of the members with the value'''
+        buckets = dict()
+        for key, i in placed:
+            try:
+                buckets.setdefault(key, []).append(i)
+            except TypeError: ## unhashable
+                unplaced.append(i)
+        unplaced.sort()
+        return buckets
+
+    def positions(self, buckets, probes):
+        for op, value in probes:
+            if op != '==': continue
+            try:
+                return buckets.get(value, ())
+            except TypeError:
+                pass
+        return None
+
+class SortedIndex(Index):
+    '''
+    An Index keeping the members sorted by value, answering == < <= > >=
+    predicates and conjunctions of them (a closed range: self.x > 1 and
+    self.x <= 5) by bisecting. Only values of one kind are sorted: numbers
+    (of any type) or else the ORDERED type of the first such value. Members
+    with values of another kind, or which are not equal to themselves (nan),
+    are unplaced, and lookups of a value of another kind are left to a scan.
+    '''
+
+    kind = 'sorted'
+
+    def build(self, placed, unplaced):
+        '''the sorted values and the positions of their members'''
+        kind = None
+        pairs = list()
+        for key, i in placed:
+            if kind is None:
+                kind = _kind(key)
+            if kind is not None and _kind(key) is kind and key == key:
+                pairs.append((key, i))
+            else:
+                unplaced.append(i)
+        unplaced.sort()
+        pairs.sort(key=itemgetter(0))
+        return (kind, [k for k, _ in pairs], [i for _, i in pairs])
+
+    def positions(self, arranged, probes):
+        kind, keys, positions = arranged
+        lo, hi = 0, len(keys)
+        used = False
+        for op, value in probes:
+            if kind is None or _kind(value) is not kind or value != value:
+                continue
+            used = True
+            if op in ('>', '>=', '=='):
+                i = (bisect_right if op == '>' else bisect_left)(keys, value)
+                lo = max(lo, i)
+            if op in ('<', '<=', '=='):
+                i = (bisect_left if op == '<' else bisect_right)(keys, value)
+                hi = min(hi, i)
+        if not used: return None
+        if lo >= hi: return ()
+        return sorted(positions[lo:hi])
+
+def reference(collection, callback):
+    '''
+    a weak reference to collection calling callback when it dies. A
+    collection which can not be weakly referenced (a plain list or tuple)
+    raises a TypeError: holding it would keep it alive for good.
+    '''
+    try:
+        return weakref.ref(collection, callback)
+    except TypeError:
+        raise TypeError("can only index collections which can be weakly referenced "
+                        "(eg. a subclass of list), not %s" % type(collection).__name__)
+
+class Indexes(object):
+    '''
+    The indexes of one collection by chain. The collection is held through a
+    weak reference, the registry entry is dropped when it dies.
+    '''
+
+    def __init__(self, collection, callback):
+        self.ref = reference(collection, callback)
+        self.indexes = dict()
+
+    def candidates(self, probes):
+        '''
+        the members which may satisfy every one of the (chain, op, value)
+        probes, from the index giving the fewest of them, or None if no index
+        applies
+        '''
+        bychain = dict()
+        for chain, op, value in probes:
+            bychain.setdefault(chain, []).append((op, value))
+        best = None
+        for chain, ops in bychain.items():
+            index = self.indexes.get(chain)
+            if index is None: continue
+            found = index.lookup(ops)
+            if found is not None and (best is None or len(found) < len(best)):
+                best = found
+        return best
+
+
+## id(collection) -> Indexes. The lock is reentrant as the callback of a weak
+## reference can run (on a garbage collection) while it is held.
+REGISTRY = dict()
+_lock = threading.RLock()
+
+## while not None called as observer(collection, probes, found) on every
+## lookup of the probes of a step, indexed or not (see advisor.py)
+observer = None
+
+def _chain(chain):
+    if isinstance(chain, str):
+        chain = chain.split('.')
+    chain = tuple(chain)
+    if not chain or not all(chain):
+        raise ValueError("invalid attribute chain %r" % ('.'.join(chain),))
+    return chain
+
+## kind -> the Index class
+KINDS = {'hash': HashIndex, 'sorted': SortedIndex}
+
+def create(collection, chain, kind='hash', verify=True):
+    '''
+    registers (or returns the existing) index of collection by chain. An
+    index of another kind by the chain is replaced.
+    '''
+    if kind not in KINDS:
+        raise ValueError("unknown index kind %r, expected one of %s" %
+                         (kind, ', '.join(sorted(KINDS))))
+    if (isinstance(collection, (str, bytes, Mapping)) or
+        not hasattr(collection, '__iter__') or not hasattr(collection, '__len__')):
+        raise TypeError("can only index sized collections, not %s" %
+                        type(collection).__name__)
+    chain = _chain(chain)
+    key = id(collection)
+    with _lock:
+        entry = REGISTRY.get(key)
+        if entry is None or entry.ref() is not collection:
+            def dead(ref, key=key):
+                with _lock:
+                    if REGISTRY.get(key) is entry:
+                        del REGISTRY[key]
+            entry = REGISTRY[key] = Indexes(collection, dead)
+        index = entry.indexes.get(chain)
+        if index is None or index.kind != kind:
+            index = entry.indexes[chain] = KINDS[kind](entry.ref, chain, verify)
+        index.verify = verify
+        return index
+
+def drop(collection, chain=None):
+    '''drops the index of collection by chain, every index of it if chain is None'''
+    with _lock:
+        entry = indexes_of(collection)
+        if entry is None: return
+        if chain is not None:
+            entry.indexes.pop(_chain(chain), None)
+        if chain is None or not entry.indexes:
+            del REGISTRY[id(collection)]
+
+def indexes_of(collection):
+    '''the Indexes of the collection or None'''
+    entry = REGISTRY.get(id(collection))
+    if entry is None or entry.ref() is not collection:
+        return None
+    return entry
+
+def probed(collection):
+    '''whether a step over collection should evaluate its probes'''
+    return observer is not None or id(collection) in REGISTRY
+
+def candidates(collection, probes):
+    '''
+    the members of the collection which may satisfy the (chain, op, value)
+    probes according to its indexes, or None if it has none answering them
+    '''
+    entry = indexes_of(collection)
+    found = None if entry is None else entry.candidates(probes)
+    if observer is not None:
+        observer(collection, probes, found)
+    return found
@@ -0,0 +1,299 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: ir.py
+Purpose: The intermediate representation of a query.
+
+The parser builds a tree of the nodes defined here. The tree is rewritten by the
+optimizer (optimizer.py) and then lowered into executable functions (lower.py).
+Nodes are plain data: every node lists the names of its attributes in `fields`.
+A field holds either a node, a list (or tuple) of nodes, or plain data (names,
+operators, literal values).
+'''
+from builtins import object
+
+
+class Node(object):
+    '''
+    Base class of all the IR nodes. Nodes compare by value, so rewrite rules can
+    check whether they changed anything.
+    '''
+
+    fields = tuple()
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(self.fields):
+            raise TypeError("%s takes at most %d arguments" %
+                            (self.__class__.__name__, len(self.fields)))
+        values = dict(zip(self.fields, args))
+        for name in kwargs:
+            if name not in self.fields:
+                raise TypeError("%s has no field %s" %
+                                (self.__class__.__name__, name))
+            if name in values:
+                raise TypeError("%s got two values for %s" %
+                                (self.__class__.__name__, name))
+        values.update(kwargs)
+        for name in self.fields:
+            setattr(self, name, values.get(name, None))
+
+    def __eq__(self, other):
+        if type(self) is not type(other): return False
+        return all(getattr(self, f) == getattr(other, f) for f in self.fields)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__,
+            ', '.join('%s=%r' % (f, getattr(self, f)) for f in self.fields))
+
+    def replace(self, **changes):
+        '''returns a copy of the node with the given fields replaced'''
+        values = dict((f, getattr(self, f)) for f in self.fields)
+        values.update(changes)
+        return self.__class__(**values)
+
+    def children(self):
+        '''yields every child node (in field order)'''
+        for f in self.fields:
+            for n in _nodes(getattr(self, f)):
+                yield n
+
+    def walk(self):
+        '''yields this node and all of its descendants (pre-order)'''
+        yield self
+        for kid in self.children():
+            for n in kid.walk():
+                yield n
+
+def _nodes(value):
+    if isinstance(value, Node):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            for n in _nodes(v):
+                yield n
+
+def _map(value, f):
+    if isinstance(value, Node):
+        return f(value)
+    elif isinstance(value, list):
+        return [_map(v, f) for v in value]
+    elif isinstance(value, tuple):
+        return tuple(_map(v, f) for v in value)
+    return value
+
+def transform(node, f):
+    '''
+    Rebuilds the tree bottom up. f is called on every node after its children
+    have been transformed and returns the replacement node (or the node itself).
+    Nodes whose children did not change are not copied.
+    '''
+    changes = dict()
+    for name in node.fields:
+        value = getattr(node, name)
+        new = _map(value, lambda n: transform(n, f))
+        if not _identical(new, value):
+            changes[name] = new
+    if changes:
+        node = node.replace(**changes)
+    return f(node)
+
+def _identical(a, b):
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_identical(x, y) for x, y in zip(a, b))
+    return a is b
+
+def params(node):
+    '''the names of the bind parameters in the tree, in order of appearance'''
+    names = list()
+    for n in node.walk():
+        if isinstance(n, Param) and n.name not in names:
+            names.append(n.name)
+    return tuple(names)
+
+def operands(node):
+    '''
+    the operands of the chain of SetOps with the operator of node on the left
+    of node: [a, b, c] for a & b & c (parsed as (a & b) & c)
+    '''
+    ops = list()
+    while isinstance(node.left, SetOp) and node.left.op == node.op:
+        ops.append(node.right)
+        node = node.left
+    ops.append(node.right)
+    ops.append(node.left)
+    ops.reverse()
+    return ops
+
+def dump(node, indent=0):
+    '''pretty prints the tree for plan inspection'''
+    pad = '  ' * indent
+    if isinstance(node, (list, tuple)):
+        return '\n'.join(dump(n, indent) for n in node)
+    if not isinstance(node, Node):
+        return pad + repr(node)
+    data = list()
+    kids = list()
+    for f in node.fields:
+        value = getattr(node, f)
+        if any(True for _ in _nodes(value)):
+            kids.append((f, value))
+        elif value is not None and value is not False:
+            data.append('%s=%r' % (f, value))
+    lines = [pad + node.__class__.__name__ + ('(%s)' % ', '.join(data) if data else '')]
+    for f, value in kids:
+        lines.append(pad + '  ' + f + ':')
+        lines.append(dump(value, indent+2))
+    return '\n'.join(lines)
+
+
+## ---------------------------------------------------------------- values ----
+
+class Literal(Node):
+    '''A NUMBER or STRING constant.'''
+    fields = ('value',)
+
+class Param(Node):
+    '''A bind parameter ($name), bound when a prepared query is executed.'''
+    fields = ('name',)
+
+class AttributeValue(Node):
+    '''
+    A chain of attributes: x.y(1)[2].z. The first attribute is looked up in the
+    namespace, the rest on the value computed so far.
+    '''
+    fields = ('attributes',)
+
+class Attribute(Node):
+    '''One link of an AttributeValue, calls is a list of Call or None.'''
+    fields = ('name', 'calls')
+
+class Call(Node):
+    '''A function call (lookup == False) or item lookup (lookup == True).'''
+    fields = ('params', 'lookup')
+
+class Arith(Node):
+    '''op is one of + - * /'''
+    fields = ('op', 'left', 'right')
+
+class If(Node):
+    fields = ('condition', 'then', 'otherwise')
+
+class DictValue(Node):
+    '''pairs is a list of (key, value) tuples of nodes'''
+    fields = ('pairs',)
+
+class ListValue(Node):
+    fields = ('values',)
+
+class Function(Node):
+    '''a function definition (let f = function(a, b) { ... })'''
+    fields = ('params', 'body')
+
+
+## ------------------------------------------------------------ predicates ----
+
+class Compare(Node):
+    '''op is one of == != < <= > >='''
+    fields = ('op', 'left', 'right')
+
+class BoolOp(Node):
+    '''op is "and" or "or"'''
+    fields = ('op', 'left', 'right')
+
+class Not(Node):
+    fields = ('operand',)
+
+class Bool(Node):
+    '''the truth value of a value used as a predicate'''
+    fields = ('operand',)
+
+class In(Node):
+    '''value in collection, op is "in" or "not in"'''
+    fields = ('op', 'value', 'collection')
+
+class SetCompare(Node):
+    '''op is one of is, is not, subset, superset, proper subset, proper superset'''
+    fields = ('op', 'left', 'right')
+
+class Quantified(Node):
+    '''(some|every) name in collection satisfies (satisfies)'''
+    fields = ('mode', 'name', 'collection', 'satisfies')
+
+
+## ---------------------------------------------------------- collections ----
+
+class Path(Node):
+    '''
+    a path expression: a list of steps. The results of a bag path (bag a/b)
+    are a list in traversal order, duplicates included.
+    '''
+    fields = ('steps', 'bag')
+
+class Step(Node):
+    '''
+    one step of a path, where is the predicate (or None for no filter). A
+    descendant step (a/descendant::name) looks name up on the objects reached
+    by the previous step and on every object reachable from them. probes is
+    None or the list of Probes of where (see optimizer.index_probes).
+    '''
+    fields = ('name', 'where', 'descendant', 'probes')
+
+class Probe(Node):
+    '''
+    a conjunct of the where clause of a step, self.<chain> <op> value, which
+    an index of the collection could answer (see indexes.py). chain is a tuple
+    of attribute names, op one of == < <= > >= and value a Literal or a Param.
+    '''
+    fields = ('chain', 'op', 'value')
+
+class SetOp(Node):
+    '''op is | & or -'''
+    fields = ('op', 'left', 'right')
+
+class ConstSet(Node):
+    '''
+    A list of literals folded at compile time (see optimizer.constant_in).
+    values is a tuple of the (hashable) python values in source order.
+    '''
+    fields = ('values',)
+
+
+## ------------------------------------------------------------------ flwr ----
+
+class FLWR(Node):
+    '''
+    fors is a list of For, lets a list of Let. Exactly one of ret (a Return) and
+    collects (a list of Collect) is set.
+    '''
+    fields = ('fors', 'lets', 'where', 'order', 'ret', 'collects')
+
+class For(Node):
+    fields = ('name', 'collection')
+
+class Let(Node):
+    fields = ('name', 'value')
+
+class OrderBy(Node):
+    '''key is a position (NUMBER) or a return name (STRING), direction ASCD/DESC'''
+    fields = ('key', 'direction')
+
+class Return(Node):
+    '''
+    values are the returned expressions. names is None for positional returns
+    otherwise the list of names of the named return values. A flattened return
+    has a single value.
+    '''
+    fields = ('values', 'names', 'flatten')
+
+class Collect(Node):
+    '''collect ret as key with reducer'''
+    fields = ('ret', 'key', 'reducer')
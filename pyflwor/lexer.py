@@ -11,6 +11,9 @@ Purpose: The lexer front end for the Query Compiler.
 from __future__ import print_function
 from builtins import object
 
+import re
+import threading
+
 from ply import lex
 from ply.lex import Token
 
@@ -18,9 +21,12 @@ tokens = ('NUMBER', 'STRING', 'NAME', 'SOME', 'EVERY', 'IN', 'NOT',
           'SATISFIES', 'AND', 'OR', 'IS',
           'SUBSET', 'SUPERSET', 'PROPER', 'FOR', 'LET', 'RETURN', 'WHERE',
           'FUNCTION', 'IF', 'THEN', 'ELSE', 'FLATTEN', 'COLLECT', 'AS', 'WITH',
+          'BAG',
           'ORDER', 'BY', 'ASCD', 'DESC', 'STAR', 'DASH', 'PLUS',
-          'SLASH', 'EQEQ', 'EQ', 'NQ', 'LE', 'GE', 'COMMA', 'DOT', 'COLON',
-          # 'AT',  #'DOLLAR',
+          'SLASH', 'DESCENDANT',
+          'EQEQ', 'EQ', 'NQ', 'LE', 'GE', 'COMMA', 'DOT', 'COLON',
+          # 'AT',
+          'DOLLAR',
           'UNION', 'INTERSECTION',
           'LPAREN', 'RPAREN', 'LSQUARE', 'RSQUARE',
           'LANGLE', 'RANGLE', 'LCURLY', 'RCURLY')
@@ -37,6 +43,18 @@ reserved = {'some': 'SOME', 'every': 'EVERY', 'in': 'IN', 'not': 'NOT',
             'flatten': 'FLATTEN', 'collect': 'COLLECT',
             'as': 'AS', 'with': 'WITH'}
 
+## bag is a keyword only in prefix position, right before the name starting
+## the path it marks (bag a/b, spaces and comments in between), anywhere else
+## (a/bag, self.bag, x == bag) it is a name.
+_bag_prefix = re.compile(r'(?:\s|/\*[\s\S]*?\*/|//.*)+(?!(?:%s)(?![a-zA-Z_0-9]))[a-zA-Z_]'
+                         % '|'.join(reserved))
+
+def name_type(value, data, end):
+    '''the token type of the name value ending at the position end of data'''
+    if value == 'bag':
+        return 'BAG' if _bag_prefix.match(data, end) else 'NAME'
+    return reserved.get(value, 'NAME')
+
 # Common Regex Parts
 D = r'[0-9]'
 L = r'[a-zA-Z_]'
@@ -47,11 +65,32 @@ E = r'[Ee][+-]?(' + D + ')+'
 # Normally PLY works at the module level. I perfer having it encapsulated as
 # a class. Thus the strange construction of this class in the new method allows
 # PLY to do its magic.
+#
+# Building the master regular expression is expensive so it is only done once.
+# Every Lexer() after that is a clone of the master lexer which shares the
+# compiled regex but has its own input, position and line number.
 class Lexer(object):
 
+    _master = None
+    _lock = threading.Lock()
+
     def __new__(cls, **kwargs):
-        self = super(Lexer, cls).__new__(cls, **kwargs)
-        self.lexer = lex.lex(object=self, debug=False, optimize=True, **kwargs)
+        if kwargs:
+            ## custom PLY options, build a private lexer.
+            return cls._build(**kwargs)
+        if cls._master is None:
+            with cls._lock:
+                if cls._master is None:
+                    cls._master = cls._build()
+        return cls._master.clone()
+
+    @classmethod
+    def _build(cls, **kwargs):
+        self = super(Lexer, cls).__new__(cls)
+        ## not optimize=True: PLY would write lextab.py and later load it
+        ## without checking it against the rules here, so a stale table would
+        ## silently lex with the old tokens. The master is built once anyway.
+        self.lexer = lex.lex(object=self, debug=False, **kwargs)
         return self.lexer
 
     tokens = tokens
@@ -72,7 +111,7 @@ class Lexer(object):
     t_COLON = r'\:'
     t_SLASH = r'/'
     t_UNION = r'\|'
-    # t_DOLLAR = r'\$'
+    t_DOLLAR = r'\$'
     t_LPAREN = r'\('
     t_RPAREN = r'\)'
     t_LCURLY = r'\{'
@@ -104,10 +143,8 @@ class Lexer(object):
 
     @Token(name)
     def t_NAME(self, token):
-        if token.value in reserved:
-            token.type = reserved[token.value]
-        else:
-            token.type = 'NAME'
+        token.type = name_type(token.value, token.lexer.lexdata,
+                               token.lexpos + len(token.value))
         return token
 
     const_hex = '0[xX](' + H + ')+'
@@ -146,6 +183,12 @@ class Lexer(object):
             token.value = int(token.value, 10)
         return token
 
+    ## a/descendant::b is the descendant axis (as in XPath). It is one token,
+    ## so it can not be confused with a // comment or a / step.
+    @Token(r'/descendant::')
+    def t_DESCENDANT(self, token):
+        return token
+
     @Token(r'(/\*([^*]|[\r\n]|(\*+([^*/]|[\r\n])))*\*+/)|(//.*)')
     def t_COMMENT(self, token):
         # print token.lexer.lineno, len(token.value.split('\n')), token.value.split('\n')
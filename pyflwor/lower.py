@@ -0,0 +1,176 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: lower.py
+Purpose: Lowers the intermediate representation into executable functions.
+
+Each IR node is turned into the composition of functions from symbols.py which
+computes it. The function returned for the root node is the compiled query.
+'''
+from __future__ import absolute_import
+from builtins import object
+
+try:
+    from . import ir
+    from . import symbols
+except SystemError:
+    import ir
+    import symbols
+
+
+class Lowering(object):
+    '''
+    Dispatches on the class name of the node: node type X is lowered by the
+    method lower_X. dedup is how the results of paths (other than bag paths)
+    and set operations are de-duplicated, see pyflwor.compile.
+    '''
+
+    def __init__(self, dedup='value'):
+        self.dedup = dedup
+
+    def lower(self, node):
+        if node is None: return None
+        method = getattr(self, 'lower_' + node.__class__.__name__, None)
+        if method is None:
+            raise Exception("can not lower node %s" % node.__class__.__name__)
+        return method(node)
+
+    def lower_Literal(self, node):
+        return symbols.constantValue(node.value)
+
+    def lower_Param(self, node):
+        return symbols.paramValue(node.name)
+
+    def lower_AttributeValue(self, node):
+        return symbols.attributeValue([self.attribute(a) for a in node.attributes])
+
+    def attribute(self, node):
+        if not node.calls:
+            return symbols.Attribute(node.name)
+        return symbols.Attribute(node.name, [
+            symbols.Call([self.lower(p) for p in call.params], lookup=call.lookup)
+            for call in node.calls])
+
+    def lower_Arith(self, node):
+        return symbols.arithValue(self.lower(node.left),
+                                  symbols.arith_operator(node.op),
+                                  self.lower(node.right))
+
+    def lower_If(self, node):
+        return symbols.ifExpr(self.lower(node.condition), self.lower(node.then),
+                              self.lower(node.otherwise))
+
+    def lower_DictValue(self, node):
+        return symbols.dictValue([(self.lower(k), self.lower(v))
+                                  for k, v in node.pairs])
+
+    def lower_ListValue(self, node):
+        return symbols.listValue([self.lower(v) for v in node.values])
+
+    def lower_Function(self, node):
+        return symbols.functionDefinition(node.params, self.lower(node.body))
+
+    def lower_Compare(self, node):
+        if isinstance(node.right, ir.Literal):
+            return symbols.comparisonConstant(self.lower(node.left),
+                                              symbols.operator(node.op),
+                                              node.right.value)
+        if isinstance(node.left, ir.Literal):
+            return symbols.comparisonConstant(self.lower(node.right),
+                                              symbols.operator(node.op),
+                                              node.left.value, constant_left=True)
+        return symbols.comparisonValue(self.lower(node.left),
+                                       symbols.operator(node.op),
+                                       self.lower(node.right))
+
+    def lower_BoolOp(self, node):
+        return symbols.booleanexprValue(self.lower(node.left),
+                                        symbols.booleanOperator(node.op),
+                                        self.lower(node.right))
+
+    def lower_Not(self, node):
+        return symbols.unaryexprValue(symbols.unaryOperator('not'),
+                                      self.lower(node.operand))
+
+    def lower_Bool(self, node):
+        return symbols.booleanValue(self.lower(node.operand))
+
+    def lower_In(self, node):
+        if isinstance(node.collection, ir.ConstSet):
+            return symbols.setexprConstant(self.lower(node.value), node.op,
+                                           node.collection.values)
+        return symbols.setexprValue1(self.lower(node.value),
+                                     symbols.setexprOperator1(node.op),
+                                     self.lower(node.collection))
+
+    def lower_SetCompare(self, node):
+        return symbols.setexprValue2(self.lower(node.left),
+                                     symbols.setexprOperator2(node.op),
+                                     self.lower(node.right))
+
+    def lower_Quantified(self, node):
+        return symbols.quantifiedValue(node.mode, node.name,
+                                       self.lower(node.collection),
+                                       self.lower(node.satisfies))
+
+    def lower_Path(self, node):
+        return symbols.queryValue([self.step(s) for s in node.steps],
+                                  dedup='bag' if node.bag else self.dedup)
+
+    def step(self, node):
+        where = probes = None
+        if node.where is not None:
+            where = symbols.whereValue(self.lower(node.where))
+        if node.probes:
+            probes = [(p.chain, p.op, self.lower(p.value)) for p in node.probes]
+        return (node.name, where, bool(node.descendant), probes)
+
+    def lower_ConstSet(self, node):
+        return symbols.constantValue(list(node.values))
+
+    def lower_SetOp(self, node):
+        return symbols.setValue(node.op, [self.lower(n) for n in ir.operands(node)],
+                                dedup=self.dedup)
+
+    def lower_FLWR(self, node):
+        kwargs = dict()
+        if node.fors is not None:
+            kwargs['for_expr'] = [(f.name, self.lower(f.collection))
+                                  for f in node.fors]
+        if node.lets is not None:
+            kwargs['let_expr'] = [(l.name, self.lower(l.value))
+                                  for l in node.lets]
+        if node.where is not None:
+            kwargs['where_expr'] = self.lower(node.where)
+        if node.order is not None:
+            kwargs['order_expr'] = (node.order.key, node.order.direction)
+        if node.ret is not None:
+            return symbols.flwrSequence(self.returns(node.ret),
+                                        flatten=node.ret.flatten, **kwargs)
+        collectors = [{'value':self.returns(c.ret), 'as':self.lower(c.key),
+                       'with':self.lower(c.reducer)}
+                      for c in node.collects]
+        return symbols.flwrSequence(collectors, collecting=True, **kwargs)
+
+    def returns(self, node):
+        values = [self.lower(v) for v in node.values]
+        if node.names is None:
+            return values
+        return list(zip(node.names, values))
+
+
+def lower(node, dedup='value'):
+    '''
+    lowers the (optimized) IR tree into the compiled query function. The
+    parameters of the query are looked up once per execution, as by the
+    generated code (see symbols.boundParams).
+    '''
+    query = Lowering(dedup).lower(node)
+    names = ir.params(node)
+    if names:
+        query = symbols.boundParams(query, names)
+    return query
@@ -0,0 +1,179 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: optimizer.py
+Purpose: Rule based rewriting of the query IR.
+
+A rule is a function which takes a node and returns either a replacement node
+or None if it does not apply. The optimizer walks the tree bottom up and, at
+every node, applies the rules in order until none of them fire. Rules must
+preserve the meaning of the query, in particular they may not change the order
+or the number of times user code (attributes, calls) is evaluated unless the
+result provably does not depend on it.
+'''
+from __future__ import absolute_import
+
+try:
+    from . import ir
+    from . import symbols
+except SystemError:
+    import ir
+    import symbols
+
+def double_negation(node):
+    '''not not x => bool(x)'''
+    if isinstance(node, ir.Not) and isinstance(node.operand, ir.Not):
+        return ir.Bool(node.operand.operand)
+
+def redundant_bool(node):
+    '''
+    bool(x) => x when x already computes a bool (not, in, quantifiers).
+    '''
+    if (isinstance(node, ir.Bool) and
+        isinstance(node.operand, (ir.Bool, ir.Not, ir.In, ir.Quantified))):
+        return node.operand
+
+def negated_in(node):
+    '''not (x in y) => x not in y'''
+    if isinstance(node, ir.Not) and isinstance(node.operand, ir.In):
+        op = {'in':'not in', 'not in':'in'}[node.operand.op]
+        return node.operand.replace(op=op)
+
+def _literals(*nodes):
+    return all(isinstance(n, ir.Literal) for n in nodes)
+
+def fold_arith(node):
+    '''1 + 2 => 3, in particular the negation of a literal: -5 => -5.0'''
+    if isinstance(node, ir.Arith) and _literals(node.left, node.right):
+        try:
+            value = symbols.arith_operator(node.op)(node.left.value, node.right.value)
+        except Exception:
+            return None # leave the error to the query (eg. 1/0)
+        return ir.Literal(value)
+
+def fold_compare(node):
+    '''1 < 2 => True'''
+    if isinstance(node, ir.Compare) and _literals(node.left, node.right):
+        try:
+            value = symbols.operator(node.op)(node.left.value, node.right.value)
+        except Exception:
+            return None
+        return ir.Literal(value)
+
+def fold_not(node):
+    '''not <literal> => True/False, bool(<literal>) => True/False'''
+    if isinstance(node, (ir.Not, ir.Bool)) and _literals(node.operand):
+        value = bool(node.operand.value)
+        return ir.Literal(not value if isinstance(node, ir.Not) else value)
+
+def fold_boolop(node):
+    '''
+    <true> and x => x, <false> or x => x, otherwise the literal. Only a literal
+    on the left can be folded: on the right it does not decide whether x is
+    evaluated or what the expression returns.
+    '''
+    if isinstance(node, ir.BoolOp) and _literals(node.left):
+        if bool(node.left.value) == (node.op == 'and'):
+            return node.right
+        return node.left
+
+def fold_if(node):
+    '''if (<literal>) then x else y => x or y'''
+    if isinstance(node, ir.If) and _literals(node.condition):
+        return node.then if node.condition.value else node.otherwise
+
+def constant_in(node):
+    '''
+    x in [1, 2, 3] => x in ConstSet((1, 2, 3)). The list is otherwise rebuilt
+    for every object the predicate is evaluated on.
+    '''
+    if (isinstance(node, ir.In) and isinstance(node.collection, ir.ListValue) and
+        _literals(*node.collection.values)):
+        values = tuple(v.value for v in node.collection.values)
+        return node.replace(collection=ir.ConstSet(values))
+
+def fold_in(node):
+    '''<literal> in [<literals>] => True/False'''
+    if (isinstance(node, ir.In) and isinstance(node.collection, ir.ConstSet) and
+        _literals(node.value)):
+        value = node.value.value in node.collection.values
+        return ir.Literal(value if node.op == 'in' else not value)
+
+def true_where(node):
+    '''drops where clauses which are always true'''
+    if (isinstance(node, (ir.Step, ir.FLWR)) and isinstance(node.where, ir.Literal)
+        and node.where.value):
+        return node.replace(where=None)
+
+def _conjuncts(node):
+    if isinstance(node, ir.BoolOp) and node.op == 'and':
+        return _conjuncts(node.left) + _conjuncts(node.right)
+    return [node]
+
+def _self_chain(node):
+    '''the attribute names of self.a.b (no calls) as a tuple, or None'''
+    if not isinstance(node, ir.AttributeValue): return None
+    attrs = node.attributes
+    if len(attrs) < 2 or attrs[0].name != 'self' or any(a.calls for a in attrs):
+        return None
+    return tuple(a.name for a in attrs[1:])
+
+## the comparisons an index can answer, and each with its sides swapped
+PROBES = {'==':'==', '<':'>', '<=':'>=', '>':'<', '>=':'<='}
+
+def index_probes(node):
+    '''
+    records the conjuncts of the where clause of a step of the form
+    self.<chain> <op> <literal or parameter> (either way around, op one of
+    == < <= > >=) as the probes of the step. If the collection of the step
+    has an index by one of the chains when the query runs, the where clause
+    is only evaluated on the members the index gives for the values (see
+    indexes.py).
+    '''
+    if not isinstance(node, ir.Step) or node.where is None or node.probes is not None:
+        return None
+    probes = list()
+    for c in _conjuncts(node.where):
+        if not isinstance(c, ir.Compare) or c.op not in PROBES: continue
+        for left, op, right in ((c.left, c.op, c.right), (c.right, PROBES[c.op], c.left)):
+            chain = _self_chain(left)
+            if chain is not None and isinstance(right, (ir.Literal, ir.Param)):
+                probes.append(ir.Probe(chain, op, right))
+                break
+    if probes:
+        return node.replace(probes=probes)
+
+RULES = [
+    double_negation,
+    redundant_bool,
+    negated_in,
+    fold_arith,
+    fold_compare,
+    fold_not,
+    fold_boolop,
+    fold_if,
+    constant_in,
+    fold_in,
+    true_where,
+    index_probes,
+]
+
+def optimize(node, rules=None):
+    '''
+    Rewrites the tree with the given rules (default: RULES) and returns the
+    new tree. The tree passed in is not modified.
+    '''
+    if rules is None: rules = RULES
+    def rewrite(node):
+        for rule in rules:
+            new = rule(node)
+            if new is not None:
+                ## the replacement may contain new nodes (and is itself a new
+                ## node) which the other rules have not seen yet.
+                return ir.transform(new, rewrite)
+        return node
+    return ir.transform(node, rewrite)
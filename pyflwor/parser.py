@@ -12,29 +12,61 @@ from __future__ import print_function
 from __future__ import absolute_import
 from builtins import object
 
+import copy
+import threading
+
 from ply import yacc
 try:
     from .lexer import tokens, Lexer
-    from . import symbols
+    from . import ir
 except SystemError:
     from lexer import tokens, Lexer
-    import symbols
+    import ir
+
+# The parser builds the intermediate representation of the query defined in
+# ir.py. The tree is rewritten by the optimizer (optimizer.py) and then lowered
+# (lower.py) into a composition of the functions and objects defined in
+# symbols.py. The composed function returned computes the query based on the
+# object dictionary passed into it. This dictionary (objs) is passed down
+# through the functions (sometimes with modification).
 
-# The parser does not build an abstract syntax tree nor does it build
-# intermediate code, instead it composes functions and objects together. These
-# functions are defined in symbols.py file. The composed function returned
-# computes the query based on the object dictionary passed into it. This
-# dictionary (objs) is passed down through the functions (sometimes with
-# modification).
+def flwr(ret, fors=None, lets=None, where=None, order=None):
+    '''builds the FLWR node, ret is either a Return or a list of Collect'''
+    if isinstance(ret, ir.Return):
+        return ir.FLWR(fors, lets, where, order, ret, None)
+    return ir.FLWR(fors, lets, where, order, None, ret)
 
 # If you are confused about the syntax in this file I recommend reading the
 # documentation on the PLY website to see how this compiler compiler's syntax
 # works.
+#
+# Building the LALR tables is by far the most expensive part of compiling a
+# query and they only depend on the grammar. So the tables are generated the
+# first time a Parser is asked for and shared from then on. PLY's LRParser keeps
+# its parse stacks on the instance, therefore each thread gets its own shallow
+# copy of the shared parser (the tables themselves are never mutated).
 class Parser(object):
 
+    _shared = None
+    _lock = threading.Lock()
+    _local = threading.local()
+
     def __new__(cls, **kwargs):
+        if kwargs:
+            ## custom PLY options, build a private parser.
+            return cls._build(**kwargs)
+        parser = getattr(cls._local, 'parser', None)
+        if parser is None:
+            with cls._lock:
+                if cls._shared is None:
+                    cls._shared = cls._build()
+            parser = cls._local.parser = copy.copy(cls._shared)
+        return parser
+
+    @classmethod
+    def _build(cls, **kwargs):
         ## Does magic to allow PLY to do its thing.
-        self = super(Parser, cls).__new__(cls, **kwargs)
+        self = super(Parser, cls).__new__(cls)
         self.names = dict()
         self.yacc = yacc.yacc(module=self, debug=False, optimize=True,
                               write_tables=False, **kwargs)
@@ -56,43 +88,43 @@ class Parser(object):
 
     def p_FLWRexpr1(self, t):
         'FLWRexpr : ForExpr ReturnExpr'
-        t[0] = symbols.flwrSequence(t[2][0], for_expr=t[1], flatten=t[2][1], collecting=t[2][2])
+        t[0] = flwr(t[2], fors=t[1])
 
     def p_FLWRexpr2(self, t):
         'FLWRexpr : ForExpr LetExpr ReturnExpr'
-        t[0] = symbols.flwrSequence(t[3][0], for_expr=t[1], flatten=t[3][1], collecting=t[3][2], let_expr=t[2])
+        t[0] = flwr(t[3], fors=t[1], lets=t[2])
 
     def p_FLWRexpr3(self, t):
         'FLWRexpr : ForExpr WhereExpr ReturnExpr'
-        t[0] = symbols.flwrSequence(t[3][0], for_expr=t[1], flatten=t[3][1], collecting=t[3][2], where_expr=t[2])
+        t[0] = flwr(t[3], fors=t[1], where=t[2])
 
     def p_FLWRexpr4(self, t):
         'FLWRexpr : ForExpr LetExpr WhereExpr ReturnExpr'
-        t[0] = symbols.flwrSequence(t[4][0], for_expr=t[1], flatten=t[4][1], collecting=t[4][2], let_expr=t[2], where_expr=t[3])
+        t[0] = flwr(t[4], fors=t[1], lets=t[2], where=t[3])
 
     def p_FLWRexpr5(self, t):
         'FLWRexpr : ForExpr OrderByExpr ReturnExpr'
-        t[0] = symbols.flwrSequence(t[3][0], for_expr=t[1], flatten=t[3][1], collecting=t[3][2], order_expr=t[2])
+        t[0] = flwr(t[3], fors=t[1], order=t[2])
 
     def p_FLWRexpr6(self, t):
         'FLWRexpr : ForExpr LetExpr OrderByExpr ReturnExpr'
-        t[0] = symbols.flwrSequence(t[4][0], for_expr=t[1], flatten=t[4][1], collecting=t[4][2], let_expr=t[2], order_expr=t[3])
+        t[0] = flwr(t[4], fors=t[1], lets=t[2], order=t[3])
 
     def p_FLWRexpr7(self, t):
         'FLWRexpr : ForExpr WhereExpr OrderByExpr ReturnExpr'
-        t[0] = symbols.flwrSequence(t[4][0], for_expr=t[1], flatten=t[4][1], collecting=t[4][2], where_expr=t[2], order_expr=t[3])
+        t[0] = flwr(t[4], fors=t[1], where=t[2], order=t[3])
 
     def p_FLWRexpr8(self, t):
         'FLWRexpr : ForExpr LetExpr WhereExpr OrderByExpr ReturnExpr'
-        t[0] = symbols.flwrSequence(t[5][0], for_expr=t[1], flatten=t[5][1], collecting=t[5][2], let_expr=t[2], where_expr=t[3], order_expr=t[4])
+        t[0] = flwr(t[5], fors=t[1], lets=t[2], where=t[3], order=t[4])
 
     def p_FLWRexpr9(self, t):
         'FLWRexpr : ReturnExpr'
-        t[0] = symbols.flwrSequence(t[1][0], flatten=t[1][1], collecting=t[1][2])
+        t[0] = flwr(t[1])
 
     def p_FLWRexpr10(self, t):
         'FLWRexpr : LetExpr ReturnExpr'
-        t[0] = symbols.flwrSequence(t[2][0], flatten=t[2][1], collecting=t[2][2], let_expr=t[1])
+        t[0] = flwr(t[2], lets=t[1])
 
     def p_ForExpr(self, t):
         'ForExpr : FOR ForList'
@@ -108,15 +140,15 @@ class Parser(object):
 
     def p_ForDefinition1(self, t):
         'ForDefinition : NAME IN LANGLE Set RANGLE'
-        t[0] = (t[1], t[4])
+        t[0] = ir.For(t[1], t[4])
 
     def p_ForDefinition2(self, t):
         'ForDefinition : NAME IN LCURLY FLWRexpr RCURLY'
-        t[0] = (t[1], t[4])
+        t[0] = ir.For(t[1], t[4])
 
     def p_ForDefinition3(self, t):
         'ForDefinition : NAME IN Value'
-        t[0] = (t[1], t[3])
+        t[0] = ir.For(t[1], t[3])
 
     def p_LetExpr1(self, t):
         'LetExpr : LetExpr LET LetList'
@@ -136,27 +168,27 @@ class Parser(object):
 
     def p_LetDefinition1(self, t):
         'LetDefinition : NAME EQ LANGLE Set RANGLE'
-        t[0] = (t[1], t[4])
+        t[0] = ir.Let(t[1], t[4])
 
     def p_LetDefinition2(self, t):
         'LetDefinition : NAME EQ LCURLY FLWRexpr RCURLY'
-        t[0] = (t[1], t[4])
+        t[0] = ir.Let(t[1], t[4])
 
     def p_LetDefinition3(self, t):
         'LetDefinition : NAME EQ ArithExpr'
-        t[0] = (t[1], t[3])
+        t[0] = ir.Let(t[1], t[3])
 
     def p_LetDefinition4(self, t):
         'LetDefinition : NAME EQ Function'
-        t[0] = (t[1], symbols.functionDefinition(*t[3]))
+        t[0] = ir.Let(t[1], t[3])
 
     def p_Function1(self, t):
         'Function : FUNCTION LPAREN RPAREN LCURLY FBody RCURLY'
-        t[0] = (tuple(), t[5])
+        t[0] = ir.Function(tuple(), t[5])
 
     def p_Function2(self, t):
         'Function : FUNCTION LPAREN FParams RPAREN LCURLY FBody RCURLY'
-        t[0] = (tuple(t[3]), t[6])
+        t[0] = ir.Function(tuple(t[3]), t[6])
 
     def p_FParams1(self, t):
         'FParams : FParams COMMA NAME'
@@ -180,11 +212,11 @@ class Parser(object):
 
     def p_OrderByExpr1(self, t):
         'OrderByExpr : ORDER BY NUMBER OrderDirection'
-        t[0] = (t[3], t[4])
+        t[0] = ir.OrderBy(t[3], t[4])
 
     def p_OrderByExpr2(self, t):
         'OrderByExpr : ORDER BY STRING OrderDirection'
-        t[0] = (t[3], t[4])
+        t[0] = ir.OrderBy(t[3], t[4])
 
     def p_OrderDirection1(self, t):
         'OrderDirection : ASCD'
@@ -196,19 +228,19 @@ class Parser(object):
 
     def p_ReturnExpr1(self, t):
         'ReturnExpr : RETURN OutputTuple'
-        t[0] = (t[2], False, False)
+        t[0] = ir.Return(t[2], None, False)
 
     def p_ReturnExpr2(self, t):
         'ReturnExpr : RETURN OutputDict'
-        t[0] = (t[2], False, False)
+        t[0] = ir.Return([v for _, v in t[2]], [n for n, _ in t[2]], False)
 
     def p_ReturnExpr3(self, t):
         'ReturnExpr : RETURN FLATTEN OutputValue'
-        t[0] = ([t[3]], True, False)
+        t[0] = ir.Return([t[3]], None, True)
 
     def p_ReturnExpr4(self, t):
         'ReturnExpr : CollectList'
-        t[0] = (t[1], False, True)
+        t[0] = t[1]
 
     def p_CollectList1(self, t):
         'CollectList : CollectList Collect'
@@ -220,19 +252,19 @@ class Parser(object):
 
     def p_Collect1(self, t):
         'Collect : COLLECT OutputTuple AS ArithExpr WITH CollectFunction'
-        t[0] = {'value':t[2], 'as':t[4], 'with':t[6]}
+        t[0] = ir.Collect(ir.Return(t[2], None, False), t[4], t[6])
 
     def p_Collect2(self, t):
         'Collect : COLLECT OutputDict AS ArithExpr WITH CollectFunction'
-        t[0] = {'value':t[2], 'as':t[4], 'with':t[6]}
+        t[0] = ir.Collect(ir.Return([v for _, v in t[2]], [n for n, _ in t[2]], False), t[4], t[6])
 
     def p_CollectFunction1(self, t):
         'CollectFunction : AttributeValue'
-        t[0] = symbols.attributeValue(t[1])
+        t[0] = ir.AttributeValue(t[1])
 
     def p_CollectFunction2(self, t):
         'CollectFunction : Function'
-        t[0] = symbols.functionDefinition(*t[1])
+        t[0] = t[1]
 
     def p_OutputTuple1(self, t):
         'OutputTuple : OutputTuple COMMA OutputValue'
@@ -264,7 +296,7 @@ class Parser(object):
 
     def p_Set1(self, t):
         'Set : Set DASH UnionExpr'
-        t[0] = symbols.setValue(t[1], symbols.setoperator(t[2]), t[3])
+        t[0] = ir.SetOp(t[2], t[1], t[3])
 
     def p_Set2(self, t):
         'Set : UnionExpr'
@@ -272,7 +304,7 @@ class Parser(object):
 
     def p_UnionExpr1(self, t):
         'UnionExpr : UnionExpr UNION IntersectionExpr'
-        t[0] = symbols.setValue(t[1], symbols.setoperator(t[2]), t[3])
+        t[0] = ir.SetOp(t[2], t[1], t[3])
 
     def p_UnionExpr2(self, t):
         'UnionExpr : IntersectionExpr'
@@ -280,7 +312,7 @@ class Parser(object):
 
     def p_IntersectionExpr1(self, t):
         'IntersectionExpr : IntersectionExpr INTERSECTION Collection'
-        t[0] = symbols.setValue(t[1], symbols.setoperator(t[2]), t[3])
+        t[0] = ir.SetOp(t[2], t[1], t[3])
 
     def p_IntersectionExpr2(self, t):
         'IntersectionExpr : Collection'
@@ -294,9 +326,13 @@ class Parser(object):
         'Collection : LPAREN Set RPAREN'
         t[0] = t[2]
 
+    def p_Collection3(self, t):
+        'Collection : BAG Query'
+        t[0] = t[2].replace(bag=True)
+
     def p_QueryStart(self, t):
         'Query : Query_'
-        t[0] = symbols.queryValue(t[1])
+        t[0] = ir.Path(t[1])
 
     def p_Query1(self, t):
         'Query_ : Query_ SLASH Entity'
@@ -306,13 +342,17 @@ class Parser(object):
         'Query_ : Entity'
         t[0] = [t[1]]
 
+    def p_Query3(self, t):
+        'Query_ : Query_ DESCENDANT Entity'
+        t[0] = t[1] + [t[3].replace(descendant=True)]
+
     def p_Entity1(self, t):
         'Entity : NAME'
-        t[0] = (t[1], symbols.whereValue(lambda objs: True))
+        t[0] = ir.Step(t[1], None)
 
     def p_Entity2(self, t):
         'Entity : NAME LSQUARE Where RSQUARE'
-        t[0] = (t[1], symbols.whereValue(t[3]))
+        t[0] = ir.Step(t[1], t[3])
 
     def p_Where(self, t):
         'Where : OrExpr'
@@ -320,7 +360,7 @@ class Parser(object):
 
     def p_OrExpr1(self, t):
         'OrExpr : OrExpr OR AndExpr'
-        t[0] = symbols.booleanexprValue(t[1], symbols.booleanOperator(t[2]), t[3])
+        t[0] = ir.BoolOp(t[2], t[1], t[3])
 
     def p_OrExpr2(self, t):
         'OrExpr : AndExpr'
@@ -328,7 +368,7 @@ class Parser(object):
 
     def p_AndExpr1(self, t):
         'AndExpr : AndExpr AND NotExpr'
-        t[0] = symbols.booleanexprValue(t[1], symbols.booleanOperator(t[2]), t[3])
+        t[0] = ir.BoolOp(t[2], t[1], t[3])
 
     def p_AndExpr2(self, t):
         'AndExpr : NotExpr'
@@ -336,7 +376,7 @@ class Parser(object):
 
     def p_NotExpr1(self, t):
         'NotExpr : NOT BooleanExpr'
-        t[0] = symbols.unaryexprValue(symbols.unaryOperator(t[1]), t[2])
+        t[0] = ir.Not(t[2])
 
     def p_NotExpr2(self, t):
         'NotExpr : BooleanExpr'
@@ -356,7 +396,7 @@ class Parser(object):
 
     def p_BooleanExpr4(self, t):
         'BooleanExpr : ArithExpr'
-        t[0] = symbols.booleanValue(t[1])
+        t[0] = ir.Bool(t[1])
 
     def p_BooleanExpr5(self, t):
         'BooleanExpr : LPAREN Where RPAREN'
@@ -364,7 +404,7 @@ class Parser(object):
 
     def p_CmpExpr(self, t):
         'CmpExpr : ArithExpr CmpOp ArithExpr'
-        t[0] = symbols.comparisonValue(t[1], t[2], t[3])
+        t[0] = ir.Compare(t[2], t[1], t[3])
 
     def p_CmpOp(self, t):
         '''CmpOp : EQEQ
@@ -373,7 +413,7 @@ class Parser(object):
                 | LE
                 | RANGLE
                 | GE'''
-        t[0] = symbols.operator(t[1])
+        t[0] = t[1]
 
     def p_ArithExpr(self, t):
         'ArithExpr : AddSub'
@@ -382,12 +422,12 @@ class Parser(object):
     def p_AddSub1(self, t):
         'AddSub : AddSub PLUS MulDiv'
         #t[0] = Node('+').addkid(t[1]).addkid(t[3])
-        t[0] = symbols.arithValue(t[1], symbols.arith_operator(t[2]), t[3])
+        t[0] = ir.Arith(t[2], t[1], t[3])
 
     def p_AddSub2(self, t):
         'AddSub : AddSub DASH MulDiv'
         #t[0] = Node('-').addkid(t[1]).addkid(t[3])
-        t[0] = symbols.arithValue(t[1], symbols.arith_operator(t[2]), t[3])
+        t[0] = ir.Arith(t[2], t[1], t[3])
 
     def p_AddSub3(self, t):
         'AddSub : MulDiv'
@@ -396,11 +436,11 @@ class Parser(object):
     def p_MulDiv1(self, t):
         'MulDiv : MulDiv STAR ArithUnary'
         #t[0] = Node('*').addkid(t[1]).addkid(t[3])
-        t[0] = symbols.arithValue(t[1], symbols.arith_operator(t[2]), t[3])
+        t[0] = ir.Arith(t[2], t[1], t[3])
 
     def p_MulDiv2(self, t):
         'MulDiv : MulDiv SLASH ArithUnary'
-        t[0] = symbols.arithValue(t[1], symbols.arith_operator(t[2]), t[3])
+        t[0] = ir.Arith(t[2], t[1], t[3])
 
     def p_MulDiv3(self, t):
         'MulDiv : ArithUnary'
@@ -412,7 +452,7 @@ class Parser(object):
 
     def p_ArithUnary2(self, t):
         'ArithUnary : DASH Atomic'
-        t[0] = symbols.arithValue(symbols.attributeValue(-1.0, scalar=True), symbols.arith_operator('*'), t[2])
+        t[0] = ir.Arith('*', ir.Literal(-1.0), t[2])
 
     def p_Atomic1(self, t):
         'Atomic : Value'
@@ -424,27 +464,31 @@ class Parser(object):
 
     def p_Value1(self, t):
         'Value : NUMBER'
-        t[0] = symbols.attributeValue(t[1], scalar=True)
+        t[0] = ir.Literal(t[1])
 
     def p_Value2(self, t):
         'Value : STRING'
-        t[0] = symbols.attributeValue(t[1], scalar=True)
+        t[0] = ir.Literal(t[1])
 
     def p_Value3(self, t):
         'Value : IF Where THEN IfBody ELSE IfBody'
-        t[0] = symbols.ifExpr(t[2], t[4], t[6])
+        t[0] = ir.If(t[2], t[4], t[6])
 
     def p_Value4(self, t):
         'Value : AttributeValue'
-        t[0] = symbols.attributeValue(t[1])
+        t[0] = ir.AttributeValue(t[1])
 
     def p_Value5(self, t):
         'Value : LCURLY NameValPairs RCURLY'
-        t[0] = symbols.dictValue(t[2])
+        t[0] = ir.DictValue(t[2])
 
     def p_Value6(self, t):
         'Value : LSQUARE ValueList RSQUARE'
-        t[0] = symbols.listValue(t[2])
+        t[0] = ir.ListValue(t[2])
+
+    def p_Value7(self, t):
+        'Value : DOLLAR NAME'
+        t[0] = ir.Param(t[2])
 
     def p_NameValPairs1(self, t):
         'NameValPairs : NameValPairs COMMA NameValPair'
@@ -508,11 +552,11 @@ class Parser(object):
 
     def p_Attr1(self, t):
         'Attr : NAME'
-        t[0] = symbols.Attribute(t[1])
+        t[0] = ir.Attribute(t[1], None)
 
     def p_Attr2(self, t):
         'Attr : NAME Call'
-        t[0] = symbols.Attribute(t[1], t[2])
+        t[0] = ir.Attribute(t[1], t[2])
 
     def p_Call1(self, t):
         'Call : Call Call_'
@@ -532,23 +576,23 @@ class Parser(object):
 
     def p_Fcall1(self, t):
         'Fcall : LPAREN RPAREN'
-        t[0] = symbols.Call([])
+        t[0] = ir.Call([], False)
 
     def p_Fcall2(self, t):
         'Fcall : LPAREN ParameterList RPAREN'
-        t[0] = symbols.Call(t[2])
+        t[0] = ir.Call(t[2], False)
 
     def p_Dcall(self, t):
         'Dcall : LSQUARE ArithExpr RSQUARE'
-        t[0] = symbols.Call([t[2]], lookup=True)
+        t[0] = ir.Call([t[2]], True)
 
     def p_QuantifiedExpr1(self, t):
         'QuantifiedExpr : Quantifier NAME IN LANGLE Set RANGLE SATISFIES LPAREN Where RPAREN'
-        t[0] = symbols.quantifiedValue(t[1], t[2], t[5], t[9])
+        t[0] = ir.Quantified(t[1], t[2], t[5], t[9])
 
     def p_QuantifiedExpr2(self, t):
         'QuantifiedExpr : Quantifier NAME IN LCURLY FLWRexpr RCURLY SATISFIES LPAREN Where RPAREN'
-        t[0] = symbols.quantifiedValue(t[1], t[2], t[5], t[9])
+        t[0] = ir.Quantified(t[1], t[2], t[5], t[9])
 
     def p_Quantifier1(self, t):
         'Quantifier : EVERY'
@@ -560,51 +604,59 @@ class Parser(object):
 
     def p_SetExpr__1(self, t):
         'SetExpr : ArithExpr IN AttributeValue'
-        t[0] = symbols.setexprValue1(t[1], symbols.setexprOperator1('in'), symbols.attributeValue(t[3]))
+        t[0] = ir.In('in', t[1], ir.AttributeValue(t[3]))
 
     def p_SetExpr__2(self, t):
         'SetExpr : ArithExpr NOT IN AttributeValue'
-        t[0] = symbols.setexprValue1(t[1], symbols.setexprOperator1('not in'), symbols.attributeValue(t[4]))
+        t[0] = ir.In('not in', t[1], ir.AttributeValue(t[4]))
+
+    def p_SetExpr__3(self, t):
+        'SetExpr : ArithExpr IN DOLLAR NAME'
+        t[0] = ir.In('in', t[1], ir.Param(t[4]))
+
+    def p_SetExpr__4(self, t):
+        'SetExpr : ArithExpr NOT IN DOLLAR NAME'
+        t[0] = ir.In('not in', t[1], ir.Param(t[5]))
 
     def p_SetExpr1(self, t):
         'SetExpr : ArithExpr IN LANGLE Set RANGLE'
-        t[0] = symbols.setexprValue1(t[1], symbols.setexprOperator1('in'), t[4])
+        t[0] = ir.In('in', t[1], t[4])
 
     def p_SetExpr2(self, t):
         'SetExpr : ArithExpr NOT IN LANGLE Set RANGLE'
-        t[0] = symbols.setexprValue1(t[1], symbols.setexprOperator1('not in'), t[5])
+        t[0] = ir.In('not in', t[1], t[5])
 
     def p_SetExpr3(self, t):
         'SetExpr : LANGLE Set RANGLE SUBSET LANGLE Set RANGLE'
-        t[0] = symbols.setexprValue2(t[2], symbols.setexprOperator2('subset'), t[6])
+        t[0] = ir.SetCompare('subset', t[2], t[6])
 
     def p_SetExpr4(self, t):
         'SetExpr : LANGLE Set RANGLE SUPERSET LANGLE Set RANGLE'
-        t[0] = symbols.setexprValue2(t[2], symbols.setexprOperator2('superset'), t[6])
+        t[0] = ir.SetCompare('superset', t[2], t[6])
 
     def p_SetExpr5(self, t):
         'SetExpr : LANGLE Set RANGLE PROPER SUBSET LANGLE Set RANGLE'
-        t[0] = symbols.setexprValue2(t[2], symbols.setexprOperator2('proper subset'), t[7])
+        t[0] = ir.SetCompare('proper subset', t[2], t[7])
 
     def p_SetExpr6(self, t):
         'SetExpr : LANGLE Set RANGLE PROPER SUPERSET LANGLE Set RANGLE'
-        t[0] = symbols.setexprValue2(t[2], symbols.setexprOperator2('proper superset'), t[7])
+        t[0] = ir.SetCompare('proper superset', t[2], t[7])
 
     def p_SetExpr7(self, t):
         'SetExpr : LANGLE Set RANGLE IS LANGLE Set RANGLE'
-        t[0] = symbols.setexprValue2(t[2], symbols.setexprOperator2('is'), t[6])
+        t[0] = ir.SetCompare('is', t[2], t[6])
 
     def p_SetExpr8(self, t):
         'SetExpr : LANGLE Set RANGLE IS NOT LANGLE Set RANGLE'
-        t[0] = symbols.setexprValue2(t[2], symbols.setexprOperator2('is not'), t[7])
+        t[0] = ir.SetCompare('is not', t[2], t[7])
 
     def p_SetExpr9(self, t):
         'SetExpr : ArithExpr IN LSQUARE ValueList RSQUARE'
-        t[0] = symbols.setexprValue1(t[1], symbols.setexprOperator1('in'), symbols.listValue(t[4]))
+        t[0] = ir.In('in', t[1], ir.ListValue(t[4]))
 
     def p_SetExpr10(self, t):
         'SetExpr : ArithExpr NOT IN LSQUARE ValueList RSQUARE'
-        t[0] = symbols.setexprValue1(t[1], symbols.setexprOperator1('not in'), symbols.listValue(t[5]))
+        t[0] = ir.In('not in', t[1], ir.ListValue(t[5]))
 
 
     def p_error(self, t):
@@ -626,7 +678,9 @@ if __name__ == '__main__':
         #query = Parser().parse('''a[not (not self.a()[1](<gx>,self.z.z.b,self.a)[1] == "b attr" and
                                     #not 1 == 1)]/z/z/z/x[self.__mod__(2)]''', lexer=Lexer())
 
-        query = Parser().parse('''
+        from .optimizer import optimize
+        from .lower import lower
+        query = lower(optimize(Parser().parse('''
                                     for r in <a/r>
                                     let tuple = {
                                                     for y in <a/x>
@@ -634,7 +688,7 @@ if __name__ == '__main__':
                                                     return y
                                                 }
                                     return "r":r, "tuple":tuple
-                                ''', lexer=Lexer())
+                                ''', lexer=Lexer())))
         class A(object): pass
         a = A()
         a.t = True
@@ -0,0 +1,149 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: plancache.py
+Purpose: A persistent, on disk cache of optimized query plans.
+
+Parsing is the expensive part of compiling a query, lowering the optimized plan
+(see ir.py) into a function is cheap. A process which compiles the same queries
+on every start can keep the plans in a cache directory and skip the parser
+(and building the PLY tables) for every query it has compiled before.
+
+Every entry is stamped with the pyflwor version and a hash of the source of
+the modules which decide what a query compiles to (lexer, tokenizer, parser,
+ir, optimizer). An entry from another version, another grammar or which can not be
+read is treated as missing: the query is compiled and the entry rewritten.
+
+Entries are pickles. Only point the cache at a directory which is writable by
+trusted users.
+'''
+from builtins import object
+
+import os
+import hashlib
+import pickle
+import threading
+from collections import namedtuple
+
+try:
+    from . import ir
+    from . import __version__
+except SystemError:
+    import ir
+    __version__ = None ## not imported as a package, the grammar hash still applies
+
+PlanCacheInfo = namedtuple('PlanCacheInfo', ['hits', 'misses', 'rebuilds', 'directory'])
+
+## the modules whose source decides what plan a query compiles to.
+GRAMMAR_MODULES = ('lexer.py', 'tokenizer.py', 'parser.py', 'ir.py', 'optimizer.py')
+
+_grammar_hash = None
+
+def grammar_hash():
+    '''
+    Returns the sha1 of the source of the GRAMMAR_MODULES, computed once per
+    process.
+    '''
+    global _grammar_hash
+    if _grammar_hash is None:
+        h = hashlib.sha1()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in GRAMMAR_MODULES:
+            with open(os.path.join(here, name), 'rb') as f:
+                h.update(f.read())
+        _grammar_hash = h.hexdigest()
+    return _grammar_hash
+
+
+class PlanCache(object):
+    '''
+    Maps query text to optimized plans stored as one file per query in
+    directory (which is created if needed). Writes go to a temporary file which
+    is renamed over the entry, so readers (in this or other processes) see
+    either the old or the new entry, never a partial one.
+    '''
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.stamp = (__version__, grammar_hash())
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    def path(self, query):
+        h = hashlib.sha1()
+        for part in self.stamp + (query,):
+            h.update(str(part).encode('utf-8'))
+            h.update(b'\0')
+        return os.path.join(self.directory, h.hexdigest() + '.plan')
+
+    def load(self, query):
+        '''
+        Returns the cached plan for query or None if there is no usable entry.
+        A stale or corrupt entry is removed.
+        '''
+        path = self.path(query)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (IOError, OSError):
+            self._count('misses')
+            return None
+        except Exception:
+            entry = None ## truncated or otherwise unreadable
+        if (not isinstance(entry, tuple) or len(entry) != 3 or
+            entry[0] != self.stamp or entry[1] != query or
+            not isinstance(entry[2], ir.Node)):
+            self._count('rebuilds')
+            self._remove(path)
+            return None
+        self._count('hits')
+        return entry[2]
+
+    def store(self, query, plan):
+        '''writes the plan for query. Errors (eg. a read only directory) are
+        ignored, the cache is only an optimization.'''
+        import tempfile ## only needed once there is something to write
+        path = self.path(query)
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump((self.stamp, query, plan), f, pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+            except Exception:
+                self._remove(tmp)
+                raise
+        except (IOError, OSError, pickle.PicklingError):
+            pass
+
+    def clear(self):
+        '''removes every entry in the cache directory and resets the counters'''
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.plan') or name.endswith('.tmp'):
+                    self._remove(os.path.join(self.directory, name))
+        with self.lock:
+            self.hits = self.misses = self.rebuilds = 0
+
+    def info(self):
+        with self.lock:
+            return PlanCacheInfo(self.hits, self.misses, self.rebuilds,
+                                 self.directory)
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -10,28 +10,457 @@ Purpose: The public API for PyFlwor.
 '''
 from __future__ import absolute_import
 from __future__ import unicode_literals
-from builtins import str, bytes
+from builtins import str, bytes, object
 
 try:
-    from .parser import Parser
-    from .lexer import Lexer
+    from .cache import QueryCache
+    from .symbols import PARAM_PREFIX, Scope, iterator
+    from .optimizer import optimize
+    from .lower import lower
+    from . import ir
+    from . import indexes
+    from .advisor import ADVISOR
 
 except SystemError:
-    from parser import Parser
-    from lexer import Lexer
+    from cache import QueryCache
+    from symbols import PARAM_PREFIX, Scope, iterator
+    from optimizer import optimize
+    from lower import lower
+    import ir
+    import indexes
+    from advisor import ADVISOR
 
-import re
+import os
 
-def compile(query):
+## The parser (and PLY), the code generator and the plan cache are imported on
+## first use so `import pyflwor` stays cheap for short lived programs.
+
+def _parser():
+    try:
+        from .parser import Parser
+        from .lexer import Lexer
+        from .tokenizer import Tokenizer
+    except SystemError:
+        from parser import Parser
+        from lexer import Lexer
+        from tokenizer import Tokenizer
+    return Parser, {'tokenizer':Tokenizer, 'ply':Lexer}
+
+def _codegen():
+    try:
+        from . import codegen
+    except SystemError:
+        import codegen
+    return codegen
+
+def _templates():
+    try:
+        from . import templates
+    except SystemError:
+        import templates
+    return templates
+
+def _plancache(directory):
+    try:
+        from .plancache import PlanCache
+    except SystemError:
+        from plancache import PlanCache
+    return PlanCache(directory)
+
+## Process wide cache of compiled queries. see compile, cache_info,
+## set_cache_size and clear_cache.
+_cache = QueryCache()
+
+## Optional on disk cache of optimized plans (see plancache.py), enabled by
+## set_plan_cache or the PYFLWOR_CACHE_DIR environment variable.
+_plan_cache = None
+if os.environ.get('PYFLWOR_CACHE_DIR'):
+    _plan_cache = _plancache(os.environ['PYFLWOR_CACHE_DIR'])
+
+def _normalize(query):
+    '''
+    Normalizes the query text for use as a cache key. Only the surrounding
+    whitespace is insignificant at this level (whitespace inside of a string
+    literal is not).
+    '''
+    return query.strip()
+
+LEXERS = ('tokenizer', 'ply')
+
+def parse(query, lexer='tokenizer'):
+    '''
+    Parses the query string into its intermediate representation (see ir.py).
+
+    lexer selects the lexer front end, both produce the same tokens:
+        'tokenizer' -- the single pass tokenizer in tokenizer.py (default)
+        'ply'       -- the PLY lexer in lexer.py
+    '''
+    if lexer not in LEXERS:
+        raise ValueError("unknown lexer %r, expected one of %s" % (lexer, LEXERS))
+    Parser, lexers = _parser()
+    return Parser().parse(bytes(query, 'utf-8').decode('unicode_escape'),
+                          lexer=lexers[lexer]())
+
+BACKENDS = ('closure', 'codegen')
+TRAVERSALS = ('breadth', 'depth')
+DEDUPS = ('value', 'identity', 'bag')
+
+def _plan(query):
+    '''the optimized plan of the query, from the plan cache if there is one'''
+    plan_cache = _plan_cache
+    if plan_cache is None:
+        return optimize(parse(query))
+    key = _normalize(query)
+    plan = plan_cache.load(key)
+    if plan is None:
+        plan = optimize(parse(query))
+        plan_cache.store(key, plan)
+    return plan
+
+def _compile(query, backend, traversal, dedup):
+    plan = _plan(query)
+    q = None
+    if backend == 'codegen':
+        codegen = _codegen()
+        try:
+            q = codegen.generate(plan, traversal, dedup)
+        except codegen.Unsupported:
+            pass ## fall back on the closure interpreter
+    if q is None:
+        q = lower(plan, dedup)
+    if not hasattr(q, 'iterate'):
+        ## generated path (and set operation) queries are iterated by the
+        ## lazy closure traversal
+        lazy = isinstance(plan, (ir.Path, ir.SetOp))
+        iterate = lower(plan, dedup).iterate if lazy else iterator(q)
+        object.__setattr__(q, 'iterate', iterate)
+    object.__setattr__(q, '__params__', ir.params(plan))
+    return q
+
+def _parameterized(query, cache, backend, traversal, dedup):
+    '''
+    Compiles the template of the query (see templates.py) and returns a
+    function executing it with the literals of this query bound.
+    '''
+    templates = _templates()
+    template = templates.parameterize(query)
+    try:
+        function = compile(template.text, cache=cache, backend=backend,
+                           traversal=traversal, dedup=dedup)
+    except SyntaxError:
+        parse(query) ## report the error against the query as written
+        raise
+    templates.STATS.compiled(template)
+    executed = templates.STATS.executed
+    bound = dict((PARAM_PREFIX + templates.HIDDEN + str(i), value)
+                 for i, value in enumerate(template.values))
+    def bind(objs):
+        executed(template)
+        return Scope(objs, bound)
+    def parameterized(objs):
+        return function(bind(objs))
+    def iterate(objs):
+        return function.iterate(bind(objs))
+    object.__setattr__(parameterized, '__objquery__', True)
+    object.__setattr__(parameterized, 'iterate', iterate)
+    object.__setattr__(parameterized, '__params__', tuple(
+        p for p in function.__params__ if not p.startswith(templates.HIDDEN)))
+    object.__setattr__(parameterized, '__fingerprint__', template.fingerprint)
+    return parameterized
+
+def compile(query, cache=True, backend='closure', parameterize=False,
+            traversal='breadth', dedup='value'):
     '''
     Compiles a query string into a python function that takes one parameter, the execution namespace.
     The compiled function is re-usable. For information on the grammar see X.
+
+    Compiled queries are kept in a process wide LRU cache keyed by the
+    normalized query text, so compiling the same query twice returns the same
+    function. Pass cache=False to always compile (and not store) the query.
+    Independently of that the optimized plan is read from (and written to) the
+    on disk plan cache if one is set (see set_plan_cache).
+
+    backend selects how the query is executed:
+        'closure' -- a composition of the functions in symbols.py (default)
+        'codegen' -- a generated python function (see codegen.py). Queries
+                     using constructs the generator does not support silently
+                     use the closure backend.
+
+    traversal selects how the generated code of the codegen backend computes
+    path queries:
+        'breadth' -- a step at a time, keeping every object reached by a step
+                     until the next step is taken (default, fastest)
+        'depth'   -- one nested loop per step, only the objects on the chain
+                     of steps currently followed are kept. Use it when the
+                     paths fan out widely.
+    Either way the results of a path are in the same, stable order: ordered by
+    the object of the first step they were reached from, then by the object of
+    the second step and so on (the order a level by level traversal finds
+    them). The closure backend always evaluates a path one step generator
+    inside the other (as with 'depth', see iterate below).
+
+    dedup selects how the results of a path are de-duplicated:
+        'value'    -- equal objects (==) are one result, the result is an
+                      OrderedSet. Every result is hashed, so it must be
+                      hashable (default)
+        'identity' -- only the same object (is) reached twice is one result,
+                      the result is an IdentitySet. Results are never hashed,
+                      so de-duplicating costs the same for any object and
+                      lists and dicts can be results.
+    With 'identity' distinct but equal objects (eg. two equal strings or
+    large numbers computed separately) are all results, and the set
+    operations (| & -) and comparisons (subset, is, ...) of path results
+    compare identity as well. `x in <path>` still compares with ==.
+        'bag'      -- nothing is de-duplicated, the result is a list of every
+                      object reached, in the same order. Nothing is hashed
+                      apart from the right operands of & and -, which are
+                      searched for the objects of the left one: a result of
+                      the left operand is kept (&) or dropped (-) however
+                      often it occurs. | concatenates the operands.
+    Bags are meant for results which have no duplicates or whose duplicates
+    do not matter, eg. paths fed to an aggregation. A single path can be made
+    a bag in a query with the bag keyword (`for o in <bag orders/items> ...`),
+    whatever dedup is. Set comparisons (subset, is, ...) compare the members
+    of bags, as sets.
+
+    The compiled function also has an iterate(namespace) method returning an
+    iterator over the results. For path queries results are produced as they
+    are found (and de-duplicated on the fly), so taking the first few results
+    does not compute the rest. The same goes for set operations of paths,
+    apart from the right operands of & and - which are computed first.
+
+    parameterize=True compiles the template of the query instead: the query
+    with comments and whitespace normalized and its literals lifted into hidden
+    parameters (see templates.py). Queries differing only in their literals
+    then share one compiled plan. Only the template is kept in the compiled
+    query cache, the function binding the literals of this query is built on
+    every call. Executions are counted per template, see template_stats.
     '''
-    return Parser().parse(bytes(query, 'utf-8').decode('unicode_escape'), lexer=Lexer())
+    if backend not in BACKENDS:
+        raise ValueError("unknown backend %r, expected one of %s" % (backend, BACKENDS))
+    if traversal not in TRAVERSALS:
+        raise ValueError("unknown traversal %r, expected one of %s" % (traversal, TRAVERSALS))
+    if dedup not in DEDUPS:
+        raise ValueError("unknown dedup %r, expected one of %s" % (dedup, DEDUPS))
+    if parameterize:
+        return _parameterized(query, cache, backend, traversal, dedup)
+    if not cache:
+        return _compile(query, backend, traversal, dedup)
+    key = (backend, traversal, dedup, _normalize(query))
+    q = _cache.get(key)
+    if q is None:
+        q = _compile(query, backend, traversal, dedup)
+        _cache.put(key, q)
+    return q
 
-def execute(query, namespace):
+def execute(query, namespace, cache=True, backend='closure', parameterize=False,
+            traversal='breadth', dedup='value'):
     '''
     Compiles the query string and executes it with the suppied namespace. If you want to execute a
-    particular query many times, use compile to get a query function.
+    particular query many times, use compile to get a query function. The compiled query cache is
+    consulted first (see compile).
+    '''
+    return compile(query, cache=cache, backend=backend, parameterize=parameterize,
+                   traversal=traversal, dedup=dedup)(namespace)
+
+class PreparedQuery(object):
+    '''
+    A compiled query with bind parameters ($name). The query is compiled once,
+    executing it binds the parameter values for that execution only, so a
+    prepared query can be executed concurrently with different values.
+    '''
+
+    def __init__(self, query, function):
+        self.query = query
+        self.function = function
+        self.params = function.__params__
+
+    def bind(self, namespace, params):
+        '''
+        returns the namespace the query is executed with: the parameter values
+        layered over (not copied into) the caller's namespace.
+        '''
+        missing = [name for name in self.params if name not in params]
+        if missing:
+            raise TypeError("missing values for parameters %s" %
+                            ', '.join('$' + name for name in missing))
+        extra = [name for name in params if name not in self.params]
+        if extra:
+            raise TypeError("unknown parameters %s" %
+                            ', '.join('$' + name for name in sorted(extra)))
+        bound = dict((PARAM_PREFIX + name, params[name]) for name in self.params)
+        return Scope(namespace, bound)
+
+    def execute(self, namespace, **params):
+        return self.function(self.bind(namespace, params))
+
+    __call__ = execute
+
+    def iterate(self, namespace, **params):
+        '''the results of the query one at a time, see compile'''
+        return self.function.iterate(self.bind(namespace, params))
+
+    def __repr__(self):
+        return '<PreparedQuery %r params=%s>' % (self.query, list(self.params))
+
+def prepare(query, cache=True, backend='closure', parameterize=False,
+            traversal='breadth', dedup='value'):
+    '''
+    Compiles a query which may use bind parameters ($name) into a
+    PreparedQuery. Values are passed as keyword arguments on execution:
+
+        q = prepare('orders[self.customer.name == $name]')
+        q.execute(namespace, name='Steve')
+
+    Parameters can be used wherever a value can, and as the right side of in:
+    `self.city in $cities`. The compiled query is cached as by compile, see
+    compile for parameterize, traversal and dedup.
+    '''
+    return PreparedQuery(query, compile(query, cache=cache, backend=backend,
+                                        parameterize=parameterize,
+                                        traversal=traversal, dedup=dedup))
+
+def explain(query, optimized=True):
+    '''
+    Returns a printable description of the plan the query compiles to, that is
+    the (by default optimized) intermediate representation.
+    '''
+    plan = parse(query)
+    if optimized:
+        plan = optimize(plan)
+    return ir.dump(plan)
+
+def fingerprint(query):
+    '''
+    Returns the (text, values, fingerprint) Template of the query: the text of
+    the query with its literals replaced by hidden parameters, their values and
+    a hash of the text identifying the template.
+    '''
+    return _templates().parameterize(query)
+
+def template_stats():
+    '''
+    Returns the (fingerprint, template, variants, executions) counters of the
+    templates of the queries compiled with parameterize=True, most executed
+    first. variants is the number of distinct combinations of literal values
+    compiled to the template, exact up to templates.VARIANT_HASHES (256)
+    combinations and estimated above.
+    '''
+    return _templates().STATS.info()
+
+def clear_template_stats():
+    _templates().STATS.clear()
+
+def index(collection, chain, kind='hash', verify=True):
+    '''
+    Creates (or returns the existing) index of the members of collection by
+    the attribute chain ('customer.name' or ('customer', 'name')). Path steps
+    over the collection then evaluate a where clause containing
+    `self.customer.name == <literal or $param>` (possibly and-ed with other
+    conditions) only on the members the index gives for the value instead of
+    on every member, with the same results in the same order.
+
+    kind is 'hash' (equality only) or 'sorted', which also answers
+    `self.price > 30.0` (< <= > >=) and closed ranges such as
+    `self.price >= 10 and self.price < 20` by slicing the members sorted by
+    the chain. A sorted index orders numbers, or else strings, bytes, dates,
+    times or timedeltas; members of another kind are always checked. An
+    existing index of the other kind by the chain is replaced.
+
+    Every lookup checks the index against the collection and rebuilds it if
+    members were added, removed or replaced or their chains changed in place.
+    The check reads the chain of every member, which is cheaper than a scan
+    evaluating a costly where clause but not one like self.n == 1 in the
+    codegen backend. With verify=False only a change of the length of the
+    collection is noticed: call the rebuild() method of the index after
+    modifying the indexed attributes of members (or replacing members).
+
+    The collection must be weakly referenceable (a list subclass rather than a
+    plain list or tuple, a TypeError otherwise): the index is dropped with it.
+    '''
+    index = indexes.create(collection, chain, kind, verify)
+    ADVISOR.claim(index)
+    return index
+
+def drop_index(collection, chain=None):
+    '''drops the index of collection by chain, or all of its indexes'''
+    indexes.drop(collection, chain)
+
+def advise(record=True, auto=False, budget=64*2**20, min_size=1000, min_runs=10):
+    '''
+    Starts (or with record=False stops) recording the predicates path steps
+    over collections of at least min_size members evaluate which an index
+    could answer (see index): per collection and attribute chain the equality
+    and range predicates run, the members checked and how selective the
+    predicates are. index_advice ranks the indexes which would have spared the
+    most members being checked. Steps over collections with fewer members are
+    not recorded, nor are the steps of queries while not recording.
+
+    With auto=True the advisor also creates the index of a chain once it was
+    probed min_runs times and would have spared at least half of the members
+    checked, while the estimated memory of the indexes it created which are
+    still alive stays within budget bytes. advise(False) drops the indexes
+    it created (an index passed to index since is kept).
+
+    Recording evaluates the predicates on a sample of at most 64 members of
+    each recorded step. Collections which can not be weakly referenced
+    (plain lists, tuples) are not recorded.
+    '''
+    if record:
+        ADVISOR.start(auto, budget, min_size, min_runs)
+    else:
+        ADVISOR.stop()
+
+def index_advice():
+    '''
+    Returns the (collection, chain, kind, runs, equalities, ranges,
+    selectivity, checked, savings, memory, indexed) Advice of the recorded
+    attribute chains which are not indexed by an index of the kind their
+    predicates need, most estimated savings first. kind is 'hash' for chains
+    only compared with ==, 'sorted' otherwise. selectivity is the mean
+    fraction of the members satisfying the predicates of a step on the chain,
+    checked the members the steps checked, savings the estimated members an
+    index would have spared them checking and memory its estimated bytes.
+    indexed is the kind of the existing index by the chain or None.
+    '''
+    return ADVISOR.advice()
+
+def clear_index_advice():
+    ADVISOR.clear()
+
+def cache_info():
+    '''
+    Returns the (hits, misses, evictions, maxsize, currsize) statistics of the
+    compiled query cache.
+    '''
+    return _cache.info()
+
+def set_cache_size(maxsize):
+    '''
+    Sets the maximum number of compiled queries to keep. The least recently used
+    queries are evicted if the cache is currently larger. 0 disables the cache.
+    '''
+    _cache.resize(maxsize)
+
+def clear_cache():
+    '''Empties the compiled query cache and resets its counters.'''
+    _cache.clear()
+
+def set_plan_cache(directory):
+    '''
+    Keeps the optimized plans of compiled queries in directory (created if it
+    does not exist) so later processes compiling the same queries do not parse
+    them. None disables the plan cache. The initial directory is taken from the
+    PYFLWOR_CACHE_DIR environment variable.
+    '''
+    global _plan_cache
+    _plan_cache = _plancache(directory) if directory is not None else None
+
+def plan_cache_info():
+    '''
+    Returns the (hits, misses, rebuilds, directory) statistics of the plan cache
+    or None if it is disabled. rebuilds counts the stale or corrupt entries
+    which were replaced.
     '''
-    return compile(query)(namespace)
+    if _plan_cache is None: return None
+    return _plan_cache.info()
@@ -15,7 +15,6 @@ from future import standard_library
 standard_library.install_aliases()
 from builtins import str
 from builtins import object
-from past.utils import old_div
 
 import os, sys
 import subprocess
@@ -37,7 +36,7 @@ def _transform(s):
 
 def avg(s):
     if not len(s): return 0.0
-    return old_div(sum(s),float(len(s)))
+    return sum(s)/float(len(s))
 
 _formats = ['text', 'csv']
 
@@ -10,20 +10,35 @@ Purpose: Objects and functions representing components of a query.
 '''
 from __future__ import division
 from __future__ import absolute_import
-from builtins import zip
+from builtins import filter, zip
 from builtins import str
 from builtins import range
-from past.utils import old_div
 from builtins import object
 
 import collections
-from collections import deque
-from itertools import product
+import numbers
+import types
+from itertools import chain, product
+from operator import attrgetter
+
+try:
+    from itertools import filterfalse
+except ImportError:
+    from itertools import ifilterfalse as filterfalse
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 try:
     from .OrderedSet import OrderedSet
+    from .IdentitySet import IdentitySet
+    from .indexes import probed, candidates
 except SystemError:
     from OrderedSet import OrderedSet
+    from IdentitySet import IdentitySet
+    from indexes import probed, candidates
 
 class Attribute(object):
     '''
@@ -59,15 +74,170 @@ class Call(object):
         if self.lookup: return "__getitem__" + str(tuple(self.params))
         return "__call__" + str(tuple(self.params))
 
-class KeyValuePair(object):
-    '''
-    Represents a key,value pair for use while iterating over a dictionary.
-    '''
-    def __init__(self, key, value):
-        self.key = key
-        self.value = value
-    def __repr__(self): return str(self)
-    def __str__(self): return "<key:%s, value:%s>" % (self.key, self.value)
+class LiteralSet(object):
+    '''
+    The values of a literal list lifted out of a query text (see
+    templates.py). Membership is tested against a frozenset, unhashable
+    values fall back on comparing with each literal (as setexprConstant does).
+    Iterates over the values in their original order.
+    '''
+    def __init__(self, values):
+        self.values = tuple(values)
+        self.set = frozenset(self.values)
+    def __contains__(self, x):
+        try:
+            return x in self.set
+        except TypeError:
+            return x in self.values
+    def __iter__(self): return iter(self.values)
+    def __len__(self): return len(self.values)
+    def __eq__(self, other):
+        return isinstance(other, LiteralSet) and self.values == other.values
+    def __ne__(self, other): return not self == other
+    def __hash__(self): return hash(self.values)
+    def __repr__(self): return 'LiteralSet(%r)' % (self.values,)
+
+class Scope(dict):
+    '''
+    A namespace binding a few names (self, for and let variables, quantified
+    variables, function parameters) over the namespace of the enclosing query
+    (parent). Names which are not bound in the scope are looked up in the
+    parent, so binding a variable costs the same whatever the size of the
+    namespace, unlike copying it. Lookups of the bound names are plain dict
+    lookups.
+    '''
+    __slots__ = ('parent',)
+    def __init__(self, parent, *args):
+        dict.__init__(self, *args)
+        self.parent = parent
+    def __missing__(self, key):
+        return self.parent[key]
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.parent
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+    def __repr__(self):
+        return 'Scope(%s, %r)' % (dict.__repr__(self), self.parent)
+
+_MISSING = object()
+
+class _Mappings(dict):
+    '''
+    Whether the instances of a type are mappings, computed on the first lookup
+    of the type: the isinstance check of an abstract base class is several
+    times slower than a dict lookup.
+    '''
+    def __missing__(self, t):
+        mapping = self[t] = issubclass(t, Mapping)
+        return mapping
+
+## type -> True if a path step on its instances looks up a key (see queryValue)
+MAPPINGS = _Mappings()
+
+## values which are not searched by a descendant step
+_ATOMS = (str, bytes, numbers.Number, type(None), type, types.ModuleType,
+          types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+def _slots(t):
+    '''the names of the __slots__ of the class t and its bases'''
+    names = list()
+    for c in t.__mro__:
+        slots = c.__dict__.get('__slots__', ())
+        if isinstance(slots, str): slots = (slots,)
+        names.extend(s for s in slots if s not in ('__dict__', '__weakref__'))
+    return tuple(names)
+
+def _unexpanded(x):
+    return ()
+
+class _Expanders(dict):
+    '''
+    The function giving the objects an instance of a type refers to (see
+    descendants), computed on the first lookup of the type. None for atoms.
+    The members of collections (the iterables a step iterates, see
+    queryValue.children) are expanded, but not those of iterators
+    (generators, files, ...): iterating would consume them.
+    '''
+    def __missing__(self, t):
+        if issubclass(t, _ATOMS):
+            expand = None
+        elif MAPPINGS[t]:
+            expand = t.values
+        elif hasattr(t, '__next__'):
+            expand = _unexpanded
+        elif hasattr(t, '__iter__'):
+            expand = iter
+        else:
+            slots = _slots(t)
+            def expand(x):
+                d = getattr(x, '__dict__', None)
+                if d is not None:
+                    for v in list(d.values()): yield v
+                for name in slots:
+                    v = getattr(x, name, _MISSING)
+                    if v is not _MISSING: yield v
+        self[t] = expand
+        return expand
+
+EXPANDERS = _Expanders()
+
+def descendants(roots, seen):
+    '''
+    Yields the objects of roots and every object reachable from them (through
+    attributes, items of collections and values of mappings), depth first in
+    pre-order, skipping atoms (numbers, strings, functions, ...) and the objects
+    whose id is in seen. The id of every object yielded is added to seen, so an
+    object is expanded at most once however many paths (or cycles) lead to it
+    and the traversal is linear in the size of the graph.
+    '''
+    expanders = EXPANDERS
+    stack = [iter(roots)]
+    while stack:
+        for x in stack[-1]:
+            if id(x) in seen: continue
+            expand = expanders[type(x)]
+            if expand is None: continue
+            seen.add(id(x))
+            yield x
+            stack.append(iter(expand(x)))
+            break
+        else:
+            stack.pop()
+
+def _missing(obj, names):
+    '''
+    The slow path of an attribute chain which raised AttributeError: walks the
+    names again to report the first one the object did not have.
+    '''
+    for name in names:
+        x = getattr(obj, name, _MISSING)
+        if x is _MISSING:
+            raise Exception("object %s did not have attr %s" % (str(obj), name))
+        obj = x
+    return obj
+
+def _callchain(callchain):
+    '''
+    Returns a function applying the calls (and item lookups) of an Attribute
+    to a value. A parameter is either a query function, computed from the
+    namespace on every call, or passed as is. Which is which is decided here,
+    once, rather than on every call.
+    '''
+    calls = [(call.lookup, tuple((param, isinstance(param, types.FunctionType))
+                                 for param in call.params))
+             for call in callchain]
+    def apply(objs, x):
+        for lookup, params in calls:
+            if params:
+                p = [param(objs) if computed else param for param, computed in params]
+            else:
+                p = ()
+            if lookup:
+                x = x[p[0]]
+            else:
+                x = x(*p)
+        return x
+    return apply
 
 def attributeValue(attribute_list, scalar=False, context='locals'):
     '''
@@ -82,51 +252,112 @@ def attributeValue(attribute_list, scalar=False, context='locals'):
     translates into the attribute lookups, function calls, and __getitem__ calls
     necessary to produce a value.
 
+    The first name is looked up in the namespace. Every run of attributes
+    without calls after it (.y.z above) is looked up by one operator.attrgetter
+    ('y.z'), which resolves any kind of attribute (instance dict, __slots__,
+    properties and other descriptors) in C. A missing attribute raises an
+    Exception naming it.
+
     if scalar == True:
         it simply returns the value stored in attribute_list
 
     context is no longer used and should be removed.
     '''
-
-    def expand(objs, obj, attr, x):
-        '''
-        Expands the the value of one attribute by looking the name up in the
-        objs dict and then performing and function calls and dictionary lookups
-        specified in the callchain.
-        '''
+    if scalar:
+        def value(objs):
+            return attribute_list
+        return value
+
+    root = attribute_list[0]
+    root_calls = _callchain(root.callchain) if root.callchain else None
+    ## (getter, names, calls) for every run of attributes ending with the
+    ## first one which has calls
+    links = list()
+    names = list()
+    for attr in attribute_list[1:]:
+        names.append(attr.name)
         if attr.callchain:
-            for call in attr.callchain:
-                p = list()
-                for param in call.params:
-                    if isinstance(param, type(value)) and value.__code__ == param.__code__ or \
-                        isinstance(param, type(value)) and hasattr(param, '__objquery__'):
-                        p.append(param(objs))
-                    else:
-                        p.append(param)
-                if call.lookup:
-                    x = x.__getitem__(p[0])
-                else:
-                    x = x.__call__(*p)
-        return x
+            links.append((attrgetter('.'.join(names)), tuple(names),
+                          _callchain(attr.callchain)))
+            names = list()
+    if names:
+        links.append((attrgetter('.'.join(names)), tuple(names), None))
+
+    if root_calls is None and len(links) == 1 and links[0][2] is None:
+        ## the common case, eg. self.customer.name
+        name = root.name
+        getter, names, _ = links[0]
+        def value(objs):
+            obj = objs[name]
+            try:
+                return getter(obj)
+            except AttributeError:
+                return _missing(obj, names)
+        return value
 
     def value(objs):
         '''
         The computation function returned the user. Computes the actual value
         of the the attribute expression when @objs is passed in.
         '''
-        if scalar: return attribute_list
-        #if context == 'self': return objs[context]
-        attr0 = attribute_list[0]
-        obj = expand(objs, objs, attr0, objs[attr0.name])
-        for attr in attribute_list[1:]:
-            if hasattr(obj, attr.name):
-                obj = expand(objs, obj, attr, getattr(obj, attr.name))
-            else:
-                raise Exception("object %s did not have attr %s" % (str(obj), attr.name))
+        obj = objs[root.name]
+        if root_calls is not None:
+            obj = root_calls(objs, obj)
+        for getter, names, calls in links:
+            try:
+                obj = getter(obj)
+            except AttributeError:
+                obj = _missing(obj, names)
+            if calls is not None:
+                obj = calls(objs, obj)
         return obj
 
     return value
 
+def constantValue(value):
+    '''
+    Returns a function which returns the literal value (the specialized form of
+    attributeValue(value, scalar=True)).
+    '''
+    def constant(objs):
+        return value
+    object.__setattr__(constant, '__objquery__', True)
+    return constant
+
+## A bind parameter $x is passed to the query in the namespace under the key
+## '$x', which can not collide with a name used in a query.
+PARAM_PREFIX = '$'
+
+def paramValue(name):
+    '''
+    Returns a function which returns the value bound to the parameter $name.
+    '''
+    key = PARAM_PREFIX + name
+    def param(objs):
+        return objs[key]
+    object.__setattr__(param, '__objquery__', True)
+    return param
+
+def boundParams(query, names):
+    '''
+    Returns the query executed with the values of the parameters $names
+    looked up once per execution and bound in a scope at the root of the
+    query. The namespace may be layered (bound parameters over the caller's
+    namespace, see pyflwor.PreparedQuery): the where clauses of the query
+    then find a parameter in that root scope instead of looking it up through
+    the layers for every object they are evaluated on.
+    '''
+    keys = [PARAM_PREFIX + name for name in names]
+    def bind(objs):
+        return Scope(objs, [(key, objs[key]) for key in keys])
+    def bound(objs):
+        return query(bind(objs))
+    object.__setattr__(bound, '__objquery__', True)
+    if hasattr(query, 'iterate'):
+        iterate = query.iterate
+        object.__setattr__(bound, 'iterate', lambda objs: iterate(bind(objs)))
+    return bound
+
 def operator(op):
     '''
     Returns a function which performs comparision operations
@@ -139,6 +370,15 @@ def operator(op):
     if op == '>': return lambda x,y: x > y
     raise Exception("operator %s not found" % op)
 
+def div(x, y):
+    '''
+    The python 2 semantics of x / y the query language uses: floor division
+    for two integers, true division otherwise.
+    '''
+    if isinstance(x, numbers.Integral) and isinstance(y, numbers.Integral):
+        return x // y
+    return x / y
+
 def arith_operator(op):
     '''
     Returns a function which performs arithmetic operations
@@ -146,16 +386,7 @@ def arith_operator(op):
     if op == '+': return lambda x,y: x + y
     if op == '-': return lambda x,y: x - y
     if op == '*': return lambda x,y: x * y
-    if op == '/': return lambda x,y: old_div(x, y)
-    raise Exception("operator %s not found" % op)
-
-def setoperator(op):
-    '''
-    Returns a function which performs set operations
-    '''
-    if op == '|': return lambda x,y: x | y
-    if op == '&': return lambda x,y: x & y
-    if op == '-': return lambda x,y: x - y
+    if op == '/': return div
     raise Exception("operator %s not found" % op)
 
 def setexprOperator1(op):
@@ -203,6 +434,20 @@ def comparisonValue(value1, op, value2):
     object.__setattr__(where, '__objquery__', True)
     return where
 
+def comparisonConstant(value, op, constant, constant_left=False):
+    '''
+    Returns a where function for a comparison of a value with a literal, the
+    literal is bound in the closure rather than computed by a function.
+    '''
+    if constant_left:
+        def where(objs):
+            return op(constant, value(objs))
+    else:
+        def where(objs):
+            return op(value(objs), constant)
+    object.__setattr__(where, '__objquery__', True)
+    return where
+
 def arithValue(value1, op, value2):
     '''
     Returns a function which will calculate a where expression for a basic
@@ -213,32 +458,113 @@ def arithValue(value1, op, value2):
     object.__setattr__(arith_value, '__objquery__', True)
     return arith_value
 
-def setValue(s1, op, s2):
-    '''
-    Returns a Query function for the result of set operations (difference, union
-    etc..)
-    '''
-    def query(glbls):
-        return op(s1(glbls), s2(glbls))
+def _probe(s):
+    '''the membership test of the set s'''
+    if type(s) is OrderedSet: return s.map.__contains__ ## no python call
+    if type(s) is list: ## a bag, searched in a set if its members hash
+        try:
+            return set(s).__contains__
+        except TypeError:
+            pass
+    return s.__contains__
+
+def setFilter(op, items, sets):
+    '''
+    Returns an iterator over the items (of the left operand of a chain of &
+    or -) which are in every one (&) or in none (-) of the sets (the results
+    of the other operands). The sets are turned into filters on the items in
+    the order deciding most items first: for & the smallest set is tested
+    first (and an empty one decides there is no result without looking at
+    the items), for - the largest one.
+    '''
+    if op == '&':
+        if not all(sets): return iter(())
+        for s in sorted(sets, key=len):
+            items = filter(_probe(s), items)
+    elif op == '-':
+        for s in sorted(sets, key=len, reverse=True):
+            items = filterfalse(_probe(s), items)
+    else:
+        raise Exception("operator %s not found" % op)
+    return items
+
+def setValue(op, operands, dedup='value'):
+    '''
+    Returns a Query function for the result of a chain of one set operation
+    over the operands (eg. a & b & c). The chain is evaluated as a whole and
+    its result built once: a union chains the (lazy) results of the operands,
+    & and - evaluate every operand but the first and filter the results of the
+    first as they are produced (see setFilter), so they are never collected
+    on their own. The result is in the order of the first operand (followed
+    by the other operands for a union), de-duplicated as dedup says (see
+    RESULTS). For bags the union is the concatenation of the operands and a
+    result of the first operand is kept (&) or dropped (-) as a whole, however
+    often it occurs.
+    '''
+    if op not in ('|', '&', '-'):
+        raise Exception("operator %s not found" % op)
+    resultset, distinct = RESULTS[dedup]
+    ## the results are de-duplicated once, in the result set, so the
+    ## operands are taken as they come (see queryValue.select)
+    iterators = [getattr(s, 'items', None) or iterator(s) for s in operands]
+    first, rest = iterators[0], operands[1:]
+    if op == '|':
+        def items(objs):
+            return chain.from_iterable(i(objs) for i in iterators)
+    else:
+        def items(objs):
+            return setFilter(op, first(objs), [s(objs) for s in rest])
+    def query(objs):
+        return resultset(items(objs))
+    def iterate(objs):
+        '''the results one at a time, as they are found'''
+        return distinct(items(objs))
     object.__setattr__(query, '__objquery__', True)
+    object.__setattr__(query, 'iterate', iterate)
+    object.__setattr__(query, 'items', items)
     return query
 
 def setexprValue1(val, op, s):
     '''
     Returns a where function which returns the result of a value in set
-    operation
+    operation. A path query is searched lazily, up to the first match.
     '''
+    s = getattr(s, 'iterate', s)
     def where(objs):
         return op(val(objs), s(objs))
     object.__setattr__(where, '__objquery__', True)
     return where
 
+def setexprConstant(val, op, values):
+    '''
+    Returns a where function which tests whether the value is in (op == 'in')
+    or not in (op == 'not in') the literal values. The membership test is done
+    against a frozenset built once, an unhashable value falls back on
+    comparing it with each literal.
+    '''
+    s = frozenset(values)
+    positive = (op == 'in')
+    def where(objs):
+        x = val(objs)
+        try:
+            return (x in s) == positive
+        except TypeError:
+            return (x in values) == positive
+    object.__setattr__(where, '__objquery__', True)
+    return where
+
+def asSet(s):
+    '''the distinct members of the bag (list) s, other values as they are'''
+    if type(s) is list: return valueSet(s)
+    return s
+
 def setexprValue2(s1, op, s2):
     '''
-    Returns a where function which returns the result of a set op set operation
+    Returns a where function which returns the result of a set op set operation.
+    Bags are compared as the sets of their members.
     '''
     def where(objs):
-        return op(s1(objs), s2(objs))
+        return op(asSet(s1(objs)), asSet(s2(objs)))
     object.__setattr__(where, '__objquery__', True)
     return where
 
@@ -262,10 +588,17 @@ def unaryexprValue(op, val):
 
 def booleanValue(val):
     '''
-    returns the function which booleanizes the result of the Value function
+    returns the function which booleanizes the result of the Value function. A
+    path query (see queryValue) is only searched up to its first result.
     '''
-    def where(objs):
-        return bool(val(objs))
+    values = getattr(val, 'iterate', None)
+    if values is not None:
+        def where(objs):
+            for _ in values(objs): return True
+            return False
+    else:
+        def where(objs):
+            return bool(val(objs))
     object.__setattr__(where, '__objquery__', True)
     return where
 
@@ -296,90 +629,197 @@ def listValue(values):
     object.__setattr__(listval, '__objquery__', True)
     return listval
 
-# note this function was written well before I wrote any other pare of the code
-# as a technology demo. I need to refactor some parts of it...
-def queryValue(q):
+class Unhashable(object):
+    '''
+    The key of an unhashable item (a mapping record a path step reached, see
+    queryValue) among the distinct items: the item itself, by identity. The
+    item is kept, so its id can not be reused while the key is.
+    '''
+
+    __slots__ = ('obj',)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __hash__(self):
+        return id(self.obj)
+
+    def __eq__(self, other):
+        return type(other) is Unhashable and other.obj is self.obj
+
+def unique(iterable):
+    '''
+    yields the distinct items of iterable, in order. Unhashable items are
+    distinct unless they are the same object (see Unhashable).
+    '''
+    seen = set()
+    for x in iterable:
+        try:
+            if x in seen: continue
+            seen.add(x)
+        except TypeError:
+            key = Unhashable(x)
+            if key in seen: continue
+            seen.add(key)
+        yield x
+
+def unique_ids(iterable):
+    '''
+    yields the items of iterable which are not the same object as an earlier
+    one, in order. The items are kept (not just their ids) so an id can not be
+    reused while the iteration lasts.
+    '''
+    seen = dict()
+    for x in iterable:
+        if id(x) not in seen:
+            seen[id(x)] = x
+            yield x
+
+def valueSet(items=()):
+    '''
+    The OrderedSet of the distinct items, in order. If any of them is
+    unhashable (a mapping record, eg. the result of doc/store for a json
+    document) the result is the IdentitySet of the distinct items as unique
+    gives them: the hashable ones de-duplicated by value, the records by
+    identity.
+    '''
+    if type(items) is not list: items = list(items)
+    try:
+        return OrderedSet(items)
+    except TypeError:
+        return IdentitySet(unique(items))
+
+def keySet(keys):
+    '''
+    the distinct items as valueSet gives them for a result with records, from
+    the keys of the dict they were collected in (an unhashable item keyed by
+    its Unhashable, see codegen.CodeGen.depth_path)
+    '''
+    return IdentitySet(k.obj if type(k) is Unhashable else k for k in keys)
+
+## dedup mode (see pyflwor.compile) -> (the class of the results of a path,
+## the function de-duplicating an iterator over them)
+RESULTS = {
+    'value': (valueSet, unique),
+    'identity': (IdentitySet, unique_ids),
+    'bag': (list, iter),
+}
+
+def iterator(s):
     '''
-    Computes a path expression. The query (@q) is a list of attribute names and
-    associated where expressions. The function returned computes the result when
-    called.
+    Returns a function giving an iterator over the result of the query function
+    s. Path queries produce their results lazily (see queryValue).
     '''
+    iterate = getattr(s, 'iterate', None)
+    if iterate is not None: return iterate
+    return lambda objs: iter(s(objs))
+
+# note this function was written well before I wrote any other pare of the code
+# as a technology demo. I need to refactor some parts of it...
+def queryValue(q, dedup='value'):
+    '''
+    Computes a path expression. The query (@q) is a list of (attribute name,
+    where expression, descendant, probes) steps, descendant being True for a
+    step taken from every object reachable from the previous step
+    (a/descendant::b, see descendants). probes is None or a list of
+    (attribute chain, comparison, value function) triples an index of the
+    collection of the step can answer (see indexes.py). The function returned
+    computes the result when called.
+
+    The results are de-duplicated by value (dedup == 'value', an OrderedSet,
+    see valueSet for mapping records), by identity ('identity', an
+    IdentitySet) or not at all ('bag', a list of every object reached,
+    nothing is hashed).
+    '''
+    resultset, distinct = RESULTS[dedup]
     attrs = q
+    def children(objs, v, where, probes):
+        '''the values reached by a step whose where condition holds'''
+        #it is a collection (a mapping is a single record, see step)
+        if not isinstance(v, str) and hasattr(v, '__iter__') and not MAPPINGS[type(v)]:
+            if probes is not None and probed(v):
+                # only the members an index gives need to be checked
+                found = candidates(v, [(chain, op, value(objs))
+                                       for chain, op, value in probes])
+                if found is not None: v = found
+            for next in v:
+                # each child is processed but only if its where condition is
+                # satisfied
+                if where != None:
+                    cobjs = Scope(objs)
+                    cobjs['self'] = next
+                    if not where(cobjs): continue
+                yield next
+        else: #it is not iterable
+            if where != None:
+                cobjs = Scope(objs)
+                cobjs['self'] = v
+                if not where(cobjs): return
+            yield v
+    def step(objs, parents, attrname, where, probes):
+        '''
+        the values reached from each of the parents by one step: the item
+        attrname of a mapping (dicts, eg. json documents), the attribute
+        attrname of any other object.
+        '''
+        mappings = MAPPINGS
+        for u in parents:
+            if mappings[type(u)]:
+                v = u.get(attrname, _MISSING)
+            else:
+                v = getattr(u, attrname, _MISSING)
+            if v is _MISSING: continue
+            for next in children(objs, v, where, probes):
+                yield next
+    def select(objs):
+        '''
+        returns a generator which computes the actual results. Every step is a
+        generator pulling the objects of the step before it one at a time, so
+        nothing is computed ahead of the results asked for. Every result is at
+        the same depth, so they come out in the order a level by level
+        traversal finds them (the objects a descendant step searches are
+        visited depth first). The objects themselves are never modified so
+        concurrent traversals of one object graph do not interfere.
+        '''
+        # the first step is resolved directly in the namespace
+        attrname, where, _, probes = attrs[0]
+        if attrname not in objs: return iter(())
+        level = children(objs, objs[attrname], where, probes)
+        for attrname, where, descendant, probes in attrs[1:]:
+            if descendant:
+                level = descendants(level, set())
+            level = step(objs, level, attrname, where, probes)
+        return level
     def query(objs):
-        def select(objs, attrs):
-            '''a generator which computes the actual results'''
-            def add(queue, u, v, i):
-                '''adds the object v to the queue. It looks like u
-                isn't necessary anymore. I should fix that...'''
-                args = (v, '_objquery__i', i+1)
-                try:
-                    object.__setattr__(*args)
-                except TypeError:
-                    setattr(*args)
-                except:
-                    raise
-                queue.appendleft(v)
-            queue = deque()
-            add(queue, None, type('base', (object,), objs), -1)
-            while len(queue) > 0:
-                u = queue.pop()
-                i = object.__getattribute__(u, '_objquery__i')
-                attrname, where = attrs[i]
-                if hasattr(u, attrname): # the current object has the attr
-                    v = getattr(u, attrname)
-                    #it is iterable
-                    if not isinstance(v, str) and hasattr(v, '__iter__'):
-                        for z in v:
-                            # add each child into the processing queue
-                            if isinstance(v, dict):
-                                next = KeyValuePair(z, v[z])
-                            else:
-                                next = z
-                            # but only if its where condition is satisfied
-                            if where != None:
-                                cobjs = dict(objs)
-                                cobjs.update({'self':next})
-                                if not where(cobjs): continue
-                            # if this is the last attribute yield the obj
-                            if i+1 == len(attrs): yield next
-                            else: add(queue, u, next, i) # otherwise add to the queue
-                    else: #it is not iterable
-                        if where != None:
-                            cobjs = dict(objs)
-                            cobjs.update({'self':v})
-                            if not where(cobjs): continue
-                        # if this is the last attribute yield the obj
-                        if i+1 == len(attrs): yield v
-                        else: add(queue, u, v, i) # otherwise add to the queue
-        return OrderedSet(select(objs, attrs))
+        return resultset(select(objs))
+    def iterate(objs):
+        '''the results one at a time, as they are found'''
+        return distinct(select(objs))
     object.__setattr__(query, '__objquery__', True)
+    object.__setattr__(query, 'iterate', iterate)
+    object.__setattr__(query, 'items', select)
     return query
 
 def quantifiedValue(mode, name, s, satisfies):
     '''
     Processes the quantified expressions (some x in <> satisfie...) returns
-    the where function.
+    the where function. The collection is consumed lazily, the expression is
+    decided by the first x which satisfies (some) or does not satisfy (every).
     '''
-    def where(objs):
-        nobjs = s(objs) # runs the first part of the query (eg. the <path> expression)
-        if not nobjs: return False # if returns and empty set then return false
-        if mode == 'every':
-            r = True
-            for x in nobjs:
-                cobjs = dict(objs) # we have to copy the objects to not squash
-                                   # the upper namespace
-                cobjs.update({name:x})
-                if not satisfies(cobjs):
-                    r = False
-            return r
-        elif mode == 'some':
-            for x in nobjs:
-                cobjs = dict(objs)
-                cobjs.update({name:x})
-                if satisfies(cobjs):
-                    return True
-            return False
+    if mode not in ('every', 'some'):
         raise Exception("mode '%s' is not 'every' or 'some'" % mode)
+    values = iterator(s)
+    def where(objs):
+        empty = True
+        for x in values(objs): # runs the first part of the query (eg. the <path> expression)
+            empty = False
+            cobjs = Scope(objs) # a new scope to not squash the upper namespace
+            cobjs[name] = x
+            if satisfies(cobjs):
+                if mode == 'some': return True
+            elif mode == 'every': return False
+        # an empty collection satisfies neither
+        return mode == 'every' and not empty
     return where
 
 def flwrSequence(return_expr, for_expr=None, let_expr=None, where_expr=None, order_expr=None, flatten=False, collecting=False):
@@ -440,14 +880,14 @@ def flwrSequence(return_expr, for_expr=None, let_expr=None, where_expr=None, ord
                 ## to execute normally.
                 obs = [[None]]
             for items in product(*obs):
-                cobjs = dict(objs)
+                cobjs = Scope(objs)
                 if for_expr is not None:  ## we can only execute this if we
                                           ## actually have a for_expr though.
                     for name, item in items:
-                        cobjs.update({name:item})
+                        cobjs[name] = item
                 if let_expr:
                     for name, let in let_expr:
-                        cobjs.update({name:let(cobjs)}) # calculate the let expr
+                        cobjs[name] = let(cobjs) # calculate the let expr
                 if where_expr and not where_expr(cobjs):
                     continue # skip if the where fails
                 if not flatten:
@@ -492,9 +932,7 @@ def functionDefinition(params, query):
         def function(*args):
             if len(args) != len(params):
                 raise RuntimeError("Got wrong number of params expected %d got %d" % (len(params), len(args)))
-            namespace = dict(objs)
-            namespace.update(list(zip(params, args)))
-            return query(namespace)
+            return query(Scope(objs, zip(params, args)))
         return function
     return flwr_function
 
@@ -502,4 +940,9 @@ def ifExpr(condition, then, otherwise):
     def if_expr(objs):
         if condition(objs): return then(objs)
         else: return otherwise(objs)
+    if hasattr(then, 'iterate') and hasattr(otherwise, 'iterate'):
+        def iterate(objs):
+            if condition(objs): return then.iterate(objs)
+            else: return otherwise.iterate(objs)
+        object.__setattr__(if_expr, 'iterate', iterate)
     return if_expr
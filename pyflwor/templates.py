@@ -0,0 +1,191 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: templates.py
+Purpose: Normalizes query text into a template with its literals lifted out.
+
+Queries which only differ in their literals, whitespace or comments, eg.
+
+    orders[self.quantity > 5 and self.city in ["DC"]]
+    orders[self.quantity  >  10 and self.city in ["DC", "Columbus"]]  // hi
+
+have the same template
+
+    orders [ self . quantity > $__p0 and self . city in $__p1 ]
+
+and fingerprint (a hash of the template). The literals become hidden bind
+parameters (see prepared queries in pyflwor.py) so every variant can be executed
+with the plan compiled for the template.
+
+Literals the grammar requires to be literals are kept in the template: the
+key of an order by clause and the names of named return values (or any other
+literal followed by a colon, ie. dictionary keys). A literal list which is the
+right side of an in test is lifted as one LiteralSet parameter, so lists of
+different lengths share the template as well.
+'''
+import hashlib
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+try:
+    from .tokenizer import Tokenizer, OPERATORS
+    from .symbols import LiteralSet
+except SystemError:
+    from tokenizer import Tokenizer, OPERATORS
+    from symbols import LiteralSet
+
+## the hidden parameters are named $__p0, $__p1, ...
+HIDDEN = '__p'
+
+Template = namedtuple('Template', ['text', 'values', 'fingerprint'])
+
+_SYMBOLS = dict((typ, text) for text, typ in OPERATORS.items())
+_LITERALS = ('NUMBER', 'STRING')
+
+def _literal_text(t):
+    if t.type == 'NUMBER':
+        return repr(t.value)
+    ## the text is unicode_escape decoded again when the template is parsed.
+    value = t.value.encode('unicode_escape').decode('ascii')
+    if '"' not in value:
+        return '"%s"' % value
+    return "'%s'" % value
+
+def _literal_list(tokens, i):
+    '''
+    If tokens[i] opens a list of literals ([1, "a", 2]) returns the index of
+    the closing bracket, else None.
+    '''
+    j = i + 1
+    while j + 1 < len(tokens) and tokens[j].type in _LITERALS:
+        if tokens[j+1].type == 'RSQUARE':
+            return j + 1
+        if tokens[j+1].type != 'COMMA':
+            return None
+        j += 2
+    return None
+
+def parameterize(query):
+    '''
+    Returns the Template of the query: its normalized text, the values of the
+    lifted literals (in parameter order) and the fingerprint. query is the text
+    as passed to pyflwor.compile.
+    '''
+    text = bytes(query, 'utf-8').decode('unicode_escape')
+    lexer = Tokenizer()
+    lexer.input(text)
+    tokens = list(lexer)
+    out = list()
+    values = list()
+    i = 0
+    while i < len(tokens):
+        t = tokens[i]
+        prev = tokens[i-1].type if i > 0 else None
+        if t.type in _LITERALS:
+            nxt = tokens[i+1].type if i + 1 < len(tokens) else None
+            if prev == 'BY' or nxt == 'COLON':
+                out.append(_literal_text(t))
+            else:
+                out.append('$%s%d' % (HIDDEN, len(values)))
+                values.append(t.value)
+        elif (t.type == 'LSQUARE' and prev == 'IN' and
+              ## for x in [...] iterates the list, it is not a membership test
+              not (i >= 3 and tokens[i-3].type in ('FOR', 'COMMA')) and
+              _literal_list(tokens, i) is not None):
+            end = _literal_list(tokens, i)
+            out.append('$%s%d' % (HIDDEN, len(values)))
+            values.append(LiteralSet(tokens[j].value for j in range(i+1, end, 2)))
+            i = end
+        elif t.type == 'DOLLAR' and i + 1 < len(tokens) and tokens[i+1].type == 'NAME':
+            if tokens[i+1].value.startswith(HIDDEN):
+                raise SyntaxError("parameter names starting with %s are reserved, at %s.%s"
+                                  % (HIDDEN, t.lineno, t.lexpos))
+            out.append('$' + tokens[i+1].value)
+            i += 1
+        elif t.type in _SYMBOLS:
+            out.append(_SYMBOLS[t.type])
+        else:
+            out.append(str(t.value))
+        i += 1
+    template = ' '.join(out)
+    fingerprint = hashlib.sha1(template.encode('utf-8')).hexdigest()[:16]
+    return Template(template, tuple(values), fingerprint)
+
+
+TemplateInfo = namedtuple('TemplateInfo',
+                          ['fingerprint', 'template', 'variants', 'executions'])
+
+## the number of smallest hashes of the literal values of a template kept to
+## count its variants: the count is exact up to VARIANT_HASHES variants and
+## an estimate above (a k minimum values sketch), so the memory of the
+## counters does not grow with the cardinality of the literals (ids,
+## timestamps, ...).
+VARIANT_HASHES = 256
+
+## the hashes are integers below HASH_RANGE
+HASH_RANGE = 2**60
+
+def _variant_hash(values):
+    '''a hash of the literal values, uniform over [0, HASH_RANGE)'''
+    values = tuple(v.values if isinstance(v, LiteralSet) else v for v in values)
+    return int(hashlib.sha1(repr(values).encode('utf-8')).hexdigest()[:15], 16)
+
+class TemplateStats(object):
+    '''
+    Per fingerprint counters: how many distinct combinations of literal values
+    were compiled to the template (variants) and how many times they were
+    executed. Texts differing only in whitespace, comments or the spelling of
+    a number (0x10 and 16) are one variant.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = dict()
+
+    def _entry(self, template):
+        ## must be called with the lock held. The hashes are the sorted
+        ## smallest VARIANT_HASHES hashes of the variants.
+        entry = self.entries.get(template.fingerprint)
+        if entry is None:
+            entry = self.entries[template.fingerprint] = [template.text, [], 0]
+        return entry
+
+    def compiled(self, template):
+        h = _variant_hash(template.values)
+        with self.lock:
+            hashes = self._entry(template)[1]
+            i = bisect_left(hashes, h)
+            if i < len(hashes) and hashes[i] == h: return
+            if len(hashes) < VARIANT_HASHES:
+                hashes.insert(i, h)
+            elif i < VARIANT_HASHES:
+                hashes.insert(i, h)
+                hashes.pop()
+
+    def executed(self, template):
+        with self.lock:
+            self._entry(template)[2] += 1
+
+    @staticmethod
+    def variants(hashes):
+        if len(hashes) < VARIANT_HASHES:
+            return len(hashes)
+        return int(round((VARIANT_HASHES - 1) * float(HASH_RANGE) / (hashes[-1] + 1)))
+
+    def info(self):
+        '''the TemplateInfo of every template, most executed first'''
+        with self.lock:
+            infos = [TemplateInfo(fp, e[0], self.variants(e[1]), e[2])
+                     for fp, e in self.entries.items()]
+        return sorted(infos, key=lambda i: (-i.executions, -i.variants, i.fingerprint))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+STATS = TemplateStats()
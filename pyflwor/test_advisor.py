@@ -0,0 +1,178 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_advisor.py
+Purpose: Tests for the index advisor recording the predicates of path steps
+'''
+from __future__ import absolute_import
+
+import gc, unittest
+
+from . import pyflwor
+from . import indexes
+from . import advisor
+
+
+class A(object):
+    def __init__(self, n, name):
+        self.n = n
+        self.customer = Customer(name)
+
+class Customer(object):
+    def __init__(self, name):
+        self.name = name
+
+class Orders(list):
+    '''a list which can be weakly referenced'''
+
+def orders(n=1000):
+    '''the customer names are in blocks of n/10 orders (a sample would alias
+    a period)'''
+    return Orders(A(i, 'abcdefghij'[i*10//n]) for i in range(n))
+
+
+class TestAdvisor(unittest.TestCase):
+
+    def setUp(self):
+        pyflwor.advise(min_size=100)
+
+    def tearDown(self):
+        pyflwor.advise(False)
+        pyflwor.clear_index_advice()
+        indexes.REGISTRY.clear()
+
+    def run_queries(self, ns, runs=3, backend='closure'):
+        for _ in range(runs):
+            pyflwor.execute('orders[self.customer.name == "a" and self.n > 100]', ns,
+                            backend=backend)
+            pyflwor.execute('orders[self.n >= 10 and self.n < 20]', ns, backend=backend)
+
+    def test_advice(self):
+        ns = {'orders': orders()}
+        for backend in pyflwor.BACKENDS:
+            pyflwor.clear_index_advice()
+            self.run_queries(ns, backend=backend)
+            advice = pyflwor.index_advice()
+            self.assertEqual([(a.chain, a.kind) for a in advice],
+                             [(('n',), 'sorted'), (('customer', 'name'), 'hash')])
+            n, name = advice
+            self.assertTrue(n.collection is ns['orders'])
+            self.assertEqual((n.runs, n.equalities, n.ranges, n.checked), (6, 0, 9, 6000))
+            self.assertEqual((name.runs, name.equalities, name.ranges), (3, 3, 0))
+            self.assertAlmostEqual(name.selectivity, 0.1, places=1)
+            self.assertTrue(2600 < name.savings < 2800, name.savings)
+            self.assertEqual(name.memory, advisor.BYTES['hash']*1000)
+            self.assertEqual(name.indexed, None)
+
+    def test_indexed(self):
+        ns = {'orders': orders()}
+        pyflwor.index(ns['orders'], 'customer.name')
+        pyflwor.index(ns['orders'], 'n')
+        self.run_queries(ns)
+        advice = pyflwor.index_advice()
+        self.assertEqual([(a.chain, a.kind, a.indexed) for a in advice],
+                         [(('n',), 'sorted', 'hash')])
+        pyflwor.index(ns['orders'], 'n', kind='sorted')
+        self.assertEqual(pyflwor.index_advice(), [])
+
+    def test_not_recorded(self):
+        ns = {'orders': orders(99), 'x': orders()}
+        self.run_queries(ns)
+        pyflwor.execute('x[self.n == 1 or self.n == 2]', ns)
+        pyflwor.execute('x[f(self.n)]', {'x': ns['x'], 'f': bool})
+        self.assertEqual(pyflwor.index_advice(), [])
+        ## plain lists can not be weakly referenced, they would be held
+        self.run_queries({'orders': list(ns['x'])})
+        self.assertEqual(pyflwor.index_advice(), [])
+        self.assertEqual(advisor.ADVISOR.workloads, {})
+        pyflwor.advise(False)
+        ns['orders'] = ns['x']
+        self.run_queries(ns)
+        self.assertEqual(pyflwor.index_advice(), [])
+
+    def test_same_results(self):
+        ns = {'orders': orders()}
+        queries = ['orders[self.customer.name == "a" and self.n > 100]/n',
+                   'orders[self.n >= 10 and self.n < 20]/n',
+                   'orders[$v == self.customer.name]/n']
+        ns['$v'] = 'c'
+        pyflwor.advise(False)
+        expected = [pyflwor.execute(q, ns) for q in queries]
+        pyflwor.advise(auto=True, min_size=100, min_runs=2)
+        for backend in pyflwor.BACKENDS:
+            for _ in range(3):
+                for query, result in zip(queries, expected):
+                    self.assertEqual(pyflwor.execute(query, ns, backend=backend), result)
+        self.assertEqual(len(indexes.indexes_of(ns['orders']).indexes), 2)
+
+    def test_auto(self):
+        ns = {'orders': orders()}
+        pyflwor.advise(auto=True, min_size=100, min_runs=4)
+        self.run_queries(ns, runs=1)
+        self.assertEqual(indexes.indexes_of(ns['orders']), None)
+        self.run_queries(ns, runs=1)
+        self.assertEqual(list(indexes.indexes_of(ns['orders']).indexes), [('n',)])
+        self.assertEqual(indexes.indexes_of(ns['orders']).indexes[('n',)].kind, 'sorted')
+        self.run_queries(ns, runs=2)
+        self.assertEqual(sorted(indexes.indexes_of(ns['orders']).indexes),
+                         [('customer', 'name'), ('n',)])
+        self.assertEqual(pyflwor.index_advice(), [])
+        ## the indexes created are dropped when recording stops, unless
+        ## claimed by pyflwor.index
+        pyflwor.index(ns['orders'], 'n', kind='sorted')
+        pyflwor.advise(False)
+        self.assertEqual(list(indexes.indexes_of(ns['orders']).indexes), [('n',)])
+        pyflwor.drop_index(ns['orders'])
+        pyflwor.advise(auto=True, min_size=100, min_runs=1)
+        self.run_queries(ns, runs=1)
+        pyflwor.advise(False)
+        self.assertEqual(indexes.indexes_of(ns['orders']), None)
+
+    def test_budget(self):
+        ns = {'orders': orders()}
+        pyflwor.advise(auto=True, budget=advisor.BYTES['sorted']*1000, min_size=100,
+                       min_runs=1)
+        self.run_queries(ns, runs=2)
+        self.assertEqual(list(indexes.indexes_of(ns['orders']).indexes),
+                         [('customer', 'name')])
+        self.assertEqual([a.chain for a in pyflwor.index_advice()], [('n',)])
+        ## the memory of dropped indexes is given back
+        pyflwor.drop_index(ns['orders'])
+        gc.collect()
+        pyflwor.execute('orders[self.n >= 10 and self.n < 20]', ns)
+        self.assertEqual(list(indexes.indexes_of(ns['orders']).indexes), [('n',)])
+
+    def test_dead(self):
+        ns = {'orders': orders()}
+        self.run_queries(ns)
+        self.assertEqual(len(pyflwor.index_advice()), 2)
+        del ns
+        gc.collect()
+        self.assertEqual(advisor.ADVISOR.workloads, {})
+
+    def test_sample(self):
+        ## the selectivity is estimated on at most SAMPLE members, read by
+        ## position from a sequence
+        class Counted(Orders):
+            reads = 0
+            def __getitem__(self, i):
+                Counted.reads += 1
+                return Orders.__getitem__(self, i)
+        ns = {'orders': Counted(orders(10000))}
+        pyflwor.execute('orders[self.customer.name == "a"]', ns)
+        self.assertEqual(Counted.reads, advisor.SAMPLE)
+        self.assertAlmostEqual(pyflwor.index_advice()[0].selectivity, 0.1, places=1)
+        ns = {'orders': set(orders())}
+        self.assertEqual(len(advisor._sample(ns['orders'], 1000)), advisor.SAMPLE)
+
+    def test_errors(self):
+        self.assertRaises(ValueError, pyflwor.advise, budget=-1)
+        self.assertRaises(ValueError, pyflwor.advise, min_runs=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_cache.py
+Purpose: Tests for the compiled query cache
+'''
+from __future__ import absolute_import
+
+import unittest, threading
+
+from .OrderedSet import OrderedSet as oset
+from .cache import QueryCache
+from . import pyflwor
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_lru(self):
+        c = QueryCache(2)
+        c.put('a', 1)
+        c.put('b', 2)
+        self.assertEqual(c.get('a'), 1)
+        c.put('c', 3) ## evicts b, a was used more recently
+        self.assertTrue('a' in c)
+        self.assertFalse('b' in c)
+        self.assertTrue('c' in c)
+        self.assertEqual(c.get('b'), None)
+        self.assertEqual(c.info(), (1, 1, 1, 2, 2))
+
+    def test_resize(self):
+        c = QueryCache(4)
+        for i in range(4): c.put(i, i)
+        c.resize(1)
+        self.assertEqual(len(c), 1)
+        self.assertTrue(3 in c)
+        self.assertEqual(c.info().evictions, 3)
+        self.assertRaises(ValueError, c.resize, -1)
+
+    def test_disabled(self):
+        c = QueryCache(0)
+        c.put('a', 1)
+        self.assertEqual(c.get('a'), None)
+        self.assertEqual(len(c), 0)
+
+    def test_threads(self):
+        c = QueryCache(8)
+        def work(n):
+            for i in range(500):
+                k = (n + i) % 16
+                if c.get(k) is None: c.put(k, k)
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        info = c.info()
+        self.assertEqual(info.hits + info.misses, 8*500)
+        self.assertTrue(len(c) <= 8)
+
+
+class TestCompileCache(unittest.TestCase):
+
+    def setUp(self):
+        pyflwor.clear_cache()
+
+    def tearDown(self):
+        pyflwor.set_cache_size(512)
+        pyflwor.clear_cache()
+
+    def test_compile_hit(self):
+        q1 = pyflwor.compile('hello/world')
+        q2 = pyflwor.compile('  hello/world\n')
+        self.assertTrue(q1 is q2)
+        info = pyflwor.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+
+    def test_execute_hit(self):
+        a = 'hello'
+        self.assertEqual(pyflwor.execute('a', locals()), oset([a]))
+        self.assertEqual(pyflwor.execute('a', locals()), oset([a]))
+        self.assertEqual(pyflwor.cache_info().hits, 1)
+
+    def test_opt_out(self):
+        q1 = pyflwor.compile('hello', cache=False)
+        q2 = pyflwor.compile('hello', cache=False)
+        self.assertFalse(q1 is q2)
+        self.assertEqual(pyflwor.cache_info(), (0, 0, 0, 512, 0))
+
+    def test_eviction(self):
+        pyflwor.set_cache_size(2)
+        pyflwor.compile('a')
+        pyflwor.compile('b')
+        pyflwor.compile('c')
+        info = pyflwor.cache_info()
+        self.assertEqual((info.evictions, info.currsize), (1, 2))
+
+    def test_syntax_error_not_cached(self):
+        self.assertRaises(SyntaxError, pyflwor.compile, 'hello hello')
+        self.assertEqual(pyflwor.cache_info().currsize, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_codegen.py
+Purpose: Tests for the code generating backend. Every query is run with both
+    backends and the results must be the same.
+'''
+from __future__ import absolute_import
+from builtins import object
+
+import unittest
+
+from .OrderedSet import OrderedSet as oset
+from . import pyflwor
+from . import codegen
+
+
+class A(object):
+    def __init__(self, q, **kwargs):
+        self.q = q
+        self.__dict__.update(kwargs)
+    def __repr__(self): return 'A(%r)' % (self.q,)
+
+def namespace():
+    o = A('top')
+    o.x = [A(1, y=A('one')), A(2), A(3, y=A('three'))]
+    o.d = {'one':1, 'two':2}
+    o.j = [{'a':1, 'b':{'c':'x'}}, {'a':2, 'b':[{'c':'y'}, {'c':'z'}]}, {'a':3}]
+    l = [1, 2, 3, 4, 5, 6, 7, 3, 4]
+    a = 'hello'
+    def f(x): return x*2
+    def g(*args): return args
+    d = dict(locals())
+    try: d.update(__builtins__.__dict__)
+    except AttributeError: d.update(__builtins__)
+    return d
+
+QUERIES = [
+    'a',
+    'missing',
+    'o/x',
+    'o/x/q',
+    'o/x[hasattr(self, "y")]/y/q',
+    'o/x[self.q > 1]',
+    'o/x[self.q >= 2 and not (self.q == 3)]/q',
+    'o/x[self.q < 2 or self.q > 2]/q',
+    'o/d',
+    'o/d/two',
+    'o/d/items',
+    'o/d[self["one"] == 1]/two',
+    'o/j',
+    'o/j[self["a"] > 1]',
+    'o/j/b/c',
+    'o/j[self["a"] > 1]/b/c',
+    'o/j/a[self > 1]',
+    'o/descendant::q',
+    'o/descendant::y/q',
+    'o/descendant::x[self.q > 1]/descendant::q',
+    'o/descendant::c',
+    'l[self in <o/descendant::q>]',
+    'l[self > 3]',
+    'l[self in [1, 2, 3]]',
+    'l[self not in [1, 2, 3]]',
+    'l[self in <o/x/q>]',
+    'l[f(self) == 8]',
+    'l[g(self, 1)[1] == 1]',
+    'l[self * 2 - 1 == 5]',
+    'l[self / 2 == 1]',
+    'l[-self == -3]',
+    'l[<l[self > 6]> subset <l>]',
+    'l[<l> proper superset <l[self > 6]>]',
+    'l[<l> is <l>]',
+    'a[some x in <l> satisfies (x == 7)]',
+    'a[every x in <l> satisfies (x > 0)]',
+    'a[every x in <l> satisfies (x > 1)]',
+    'a[some x in <missing> satisfies (x)]',
+    'o/x[some y in <self/y> satisfies (y.q == "one")]/q',
+    'l - l[self < 5]',
+    'l[self < 3] | l[self > 6]',
+    'l & l[self > 4]',
+    'l & l[self > 2] & l[self < 6]',
+    'l - l[self < 2] - l[self > 6]',
+    'l[self > 5] | l[self < 2] | l',
+    '(l | o/x/q) & l[self > 1]',
+    'l & l[self > 100]',
+    'bag o/x/q',
+    'bag o/descendant::q | bag l',
+    'l[<bag l> is <l>]',
+    'l[self in <bag o/x/q>]',
+    'for x in <l> return x',
+    'for x in <bag o/x/q> return x',
+    'for x in l return x',
+    'for x in <l>, y in <o/x> where x == y.q return x, y.q',
+    'for x in <o/x> let y = <x/y/q> return "q":x.q, "y":y',
+    'for x in <l> where x > 4 order by 0 desc return x',
+    'for x in <l> order by "x" ascd return "x":x, "y":f(x)',
+    'for x in <l> return if (x > 4) then x else 0',
+    'for x in <l> return {"x":x}',
+    'for x in <l> return [x, f(x)]',
+    'return l',
+    'for x in <o/x> return flatten g(x.q, g(x.q, x.q))',
+    'let y = l return y',
+    'for x in <a> where 1 == 2 return x',
+]
+
+class TestCodegen(unittest.TestCase):
+
+    def test_equivalence(self):
+        for query in QUERIES:
+            c = pyflwor.compile(query, backend='closure')
+            g = pyflwor.compile(query, backend='codegen')
+            self.assertTrue(hasattr(g, '__source__'), query)
+            ns = namespace()
+            self.assertEqual(c(ns), g(ns), query)
+
+    def test_depth_traversal(self):
+        for query in QUERIES:
+            c = pyflwor.compile(query, backend='closure')
+            g = pyflwor.compile(query, backend='codegen', traversal='depth')
+            ns = namespace()
+            self.assertEqual(c(ns), g(ns), query)
+
+    def test_bag(self):
+        for query in QUERIES:
+            c = pyflwor.compile(query, backend='closure', dedup='bag')
+            for traversal in pyflwor.TRAVERSALS:
+                g = pyflwor.compile(query, backend='codegen', traversal=traversal,
+                                    dedup='bag')
+                ns = namespace()
+                self.assertEqual(c(ns), g(ns), query)
+
+    def test_traversal_order(self):
+        ## results are ordered by the object of each step they were reached
+        ## from, whatever the traversal
+        class N(object):
+            def __init__(self, v, kids=()):
+                self.v = v
+                self.kids = kids
+        ns = {'r': [N(0, [N(1, [N(3), N(4)]), N(2, [N(5), N(3)])]),
+                    N(6, [N(7, [N(8), N(1)])])]}
+        for backend in pyflwor.BACKENDS:
+            for traversal in pyflwor.TRAVERSALS:
+                q = pyflwor.compile('r/kids/kids/v', backend=backend, traversal=traversal)
+                self.assertEqual(list(q(ns)), [3, 4, 5, 8, 1])
+                self.assertEqual(list(q.iterate(ns)), [3, 4, 5, 8, 1])
+        q = pyflwor.compile('r/kids/kids', backend='codegen', traversal='depth')
+        self.assertFalse('= []' in q.__source__) ## no level lists
+        self.assertRaises(ValueError, pyflwor.compile, 'r', traversal='asdf')
+
+    def test_orderby_errors(self):
+        q = pyflwor.compile('for x in <l> order by "asdf" ascd return x', backend='codegen')
+        self.assertRaises(SyntaxError, q, namespace())
+        q = pyflwor.compile('for x in <l> order by 0 ascd return "asdf":x', backend='codegen')
+        self.assertRaises(SyntaxError, q, namespace())
+
+    def test_fallback(self):
+        for query in ['''for x in <l>
+                         let f = function(y) { y + 1 }
+                         return f(x)''',
+                      '''for n in l
+                         collect n as n with function(prev, next) {
+                           if prev == None then 1 else prev + 1
+                         }''']:
+            c = pyflwor.compile(query, backend='closure')
+            g = pyflwor.compile(query, backend='codegen')
+            self.assertFalse(hasattr(g, '__source__'))
+            ns = namespace()
+            self.assertEqual(c(ns), g(ns))
+
+    def test_source(self):
+        q = pyflwor.compile('o/x[self.q > 1]', backend='codegen')
+        self.assertTrue(q.__source__.startswith('def query(objs):'))
+        self.assertTrue('.q > 1' in q.__source__)
+
+    def test_keyword_names(self):
+        d = {'o':A(1, **{'class':A(2)})}
+        q = pyflwor.compile('o[self.class.q == 2]', backend='codegen')
+        self.assertEqual(q(d), oset([d['o']]))
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, pyflwor.compile, 'a', backend='asdf')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_indexes.py
+Purpose: Tests for the indexes of collections answering path predicates
+'''
+from __future__ import absolute_import
+
+import gc, unittest
+
+from . import pyflwor
+from . import indexes
+
+
+class A(object):
+    def __init__(self, n, name):
+        self.n = n
+        self.customer = Customer(name)
+
+class Customer(object):
+    def __init__(self, name):
+        self.name = name
+
+class Orders(list):
+    '''a list which can be weakly referenced'''
+
+def orders():
+    return Orders(A(i, name) for i, name in enumerate(['a', 'b', 'a', 'c', 'b', 'a'] * 3))
+
+QUERIES = [
+    'orders[self.customer.name == "a"]/n',
+    'orders[self.customer.name == "a" and self.n > 3]/n',
+    'orders[self.n > 3 and "b" == self.customer.name]/n',
+    'orders[self.customer.name == "z"]',
+    'orders[self.customer.name == "a" or self.n == 1]/n',
+    'x/orders[self.customer.name == "c"]/n',
+    'for o in <orders[self.customer.name == "b"]> return o.n',
+]
+
+
+class TestHashIndex(unittest.TestCase):
+
+    def tearDown(self):
+        indexes.REGISTRY.clear()
+
+    def namespace(self):
+        class X(object): pass
+        x = X()
+        x.orders = orders()
+        return {'orders': x.orders, 'x': x}
+
+    def test_same_results(self):
+        ns = self.namespace()
+        expected = [pyflwor.execute(q, ns) for q in QUERIES]
+        pyflwor.index(ns['orders'], 'customer.name')
+        pyflwor.index(ns['x'].orders, 'n')
+        for backend in pyflwor.BACKENDS:
+            for traversal in pyflwor.TRAVERSALS:
+                for query, result in zip(QUERIES, expected):
+                    self.assertEqual(pyflwor.execute(query, ns, backend=backend,
+                                                     traversal=traversal), result, query)
+
+    def test_only_candidates_checked(self):
+        ns = self.namespace()
+        seen = list()
+        ns['f'] = lambda o: seen.append(o) or True
+        pyflwor.index(ns['orders'], ('customer', 'name'))
+        for backend in pyflwor.BACKENDS:
+            del seen[:]
+            r = pyflwor.execute('orders[self.customer.name == "c" and f(self)]/n', ns,
+                                backend=backend)
+            self.assertEqual(list(r), [3, 9, 15])
+            self.assertEqual(len(seen), 3)
+            del seen[:]
+            q = pyflwor.prepare('orders[f(self) and self.customer.name == $name]/n',
+                                backend=backend)
+            self.assertEqual(list(q(ns, name='b')), [1, 4, 7, 10, 13, 16])
+            self.assertEqual(len(seen), 6)
+
+    def test_rebuild(self):
+        ns = self.namespace()
+        index = pyflwor.index(ns['orders'], 'customer.name')
+        self.assertTrue(pyflwor.index(ns['orders'], 'customer.name') is index)
+        ns['orders'].append(A(100, 'c'))
+        q = pyflwor.compile('orders[self.customer.name == "c"]/n')
+        self.assertEqual(list(q(ns)), [3, 9, 15, 100])
+        ## chains changed in place and members replaced are seen as well
+        ns['orders'][0].customer.name = 'c'
+        self.assertEqual(list(q(ns)), [0, 3, 9, 15, 100])
+        ns['orders'][3].customer = Customer('b')
+        self.assertEqual(list(q(ns)), [0, 9, 15, 100])
+        ns['orders'][1] = A(101, 'c')
+        self.assertEqual(list(q(ns)), [0, 101, 9, 15, 100])
+        ns['orders'][2] = A(2, 'a') ## an equal key, the member is the new one
+        r = pyflwor.execute('orders[self.customer.name == "a"]', ns, dedup='bag')
+        self.assertTrue(r[0] is ns['orders'][2])
+        ## unverified only a change of length is seen
+        pyflwor.index(ns['orders'], 'customer.name', verify=False)
+        ns['orders'][4].customer.name = 'c'
+        self.assertEqual(list(q(ns)), [0, 101, 9, 15, 100])
+        index.rebuild()
+        self.assertEqual(list(q(ns)), [0, 101, 4, 9, 15, 100])
+        ns['orders'].append(A(102, 'c'))
+        self.assertEqual(list(q(ns)), [0, 101, 4, 9, 15, 100, 102])
+
+    def test_unplaced_members(self):
+        ns = self.namespace()
+        ns['orders'].append(A(100, ['c']))
+        pyflwor.index(ns['orders'], 'customer.name')
+        self.assertEqual(len(indexes.indexes_of(ns['orders']).indexes), 1)
+        for backend in pyflwor.BACKENDS:
+            self.assertEqual(list(pyflwor.execute('orders[self.customer.name == "c"]/n',
+                                                  ns, backend=backend)), [3, 9, 15])
+            q = pyflwor.prepare('orders[self.customer.name == $name]/n', backend=backend)
+            self.assertEqual(list(q(ns, name=['c'])), [100])
+
+    def test_dropped(self):
+        l = orders()
+        pyflwor.index(l, 'customer.name')
+        self.assertTrue(indexes.indexes_of(l) is not None)
+        del l
+        gc.collect()
+        self.assertEqual(indexes.REGISTRY, {})
+        l = orders()
+        pyflwor.index(l, 'customer.name')
+        pyflwor.index(l, 'n')
+        pyflwor.drop_index(l, 'n')
+        self.assertEqual(list(indexes.indexes_of(l).indexes), [('customer', 'name')])
+        pyflwor.drop_index(l)
+        self.assertEqual(indexes.REGISTRY, {})
+        self.assertEqual(list(pyflwor.execute('l[self.customer.name == "c"]/n',
+                                              {'l': l})), [3, 9, 15])
+        ## plain lists and tuples can not be weakly referenced, indexing one
+        ## would keep it alive for good
+        self.assertRaises(TypeError, pyflwor.index, list(l), 'n')
+        self.assertRaises(TypeError, pyflwor.index, tuple(l), 'n')
+        self.assertEqual(indexes.REGISTRY, {})
+
+    def test_errors(self):
+        self.assertRaises(TypeError, pyflwor.index, {'a': 1}, 'a')
+        self.assertRaises(TypeError, pyflwor.index, 'abc', 'a')
+        self.assertRaises(TypeError, pyflwor.index, iter([1]), 'a')
+        self.assertRaises(ValueError, pyflwor.index, [], 'a..b')
+        self.assertRaises(ValueError, pyflwor.index, [], '')
+        self.assertRaises(ValueError, pyflwor.index, [], 'a', kind='btree')
+
+
+RANGES = [
+    'orders[self.n > 10]/n',
+    'orders[self.n >= 10]/n',
+    'orders[self.n < 3.5]/n',
+    'orders[4 >= self.n]/n',
+    'orders[self.n > 3 and self.n <= 7]/n',
+    'orders[self.n > 3 and self.n < 7 and self.n >= 5]/n',
+    'orders[self.n > 7 and self.n < 3]/n',
+    'orders[self.n == 8]/n',
+    'orders[self.n == 8.0 and self.customer.name == "c"]/n',
+    'orders[self.n > 2 and self.customer.name == "a"]/n',
+    'orders[self.customer.name >= "b"]/n',
+    'orders[self.customer.name < "b" and self.n > 4]/n',
+    'orders[self.n > 3 or self.n < 1]/n',
+    'for o in <orders[self.n >= 15]> return o.n',
+]
+
+
+class TestSortedIndex(unittest.TestCase):
+
+    def tearDown(self):
+        indexes.REGISTRY.clear()
+
+    def test_same_results(self):
+        ns = {'orders': orders()}
+        expected = [pyflwor.execute(q, ns) for q in RANGES]
+        pyflwor.index(ns['orders'], 'n', kind='sorted')
+        pyflwor.index(ns['orders'], 'customer.name', kind='sorted')
+        for backend in pyflwor.BACKENDS:
+            for traversal in pyflwor.TRAVERSALS:
+                for query, result in zip(RANGES, expected):
+                    self.assertEqual(pyflwor.execute(query, ns, backend=backend,
+                                                     traversal=traversal), result, query)
+
+    def test_only_candidates_checked(self):
+        ns = {'orders': orders()}
+        seen = list()
+        ns['f'] = lambda o: seen.append(o) or True
+        pyflwor.index(ns['orders'], 'n', kind='sorted')
+        for backend in pyflwor.BACKENDS:
+            del seen[:]
+            r = pyflwor.execute('orders[self.n >= 4 and f(self) and self.n < 7]/n', ns,
+                                backend=backend)
+            self.assertEqual(list(r), [4, 5, 6])
+            self.assertEqual(len(seen), 3)
+            del seen[:]
+            q = pyflwor.prepare('orders[f(self) and $lo < self.n]/n', backend=backend)
+            self.assertEqual(list(q(ns, lo=15)), [16, 17])
+            self.assertEqual(len(seen), 2)
+
+    def test_unplaced_members(self):
+        l = orders()
+        for i, n in enumerate([None, 'x', float('nan'), 2.5]):
+            l[i].n = n
+        ns = {'orders': l}
+        pyflwor.index(l, 'n', kind='sorted')
+        for backend in pyflwor.BACKENDS:
+            self.assertEqual(list(pyflwor.execute('orders[self.n == "x"]/n', ns,
+                                                  backend=backend)), ['x'])
+            self.assertEqual(list(pyflwor.execute('orders[self.n == 2.5 or self.n == 5]/n',
+                                                  ns, backend=backend)), [2.5, 5])
+            self.assertEqual(list(pyflwor.execute('orders[self.n == 5.0]/n',
+                                                  ns, backend=backend)), [5])
+            ## the unplaced members are compared as by a scan
+            self.assertRaises(TypeError, pyflwor.execute, 'orders[self.n > 3]', ns,
+                              backend=backend)
+
+    def test_unordered_values(self):
+        l = Orders(A(frozenset([i]), 'a') for i in range(5))
+        pyflwor.index(l, 'n', kind='sorted')
+        q = pyflwor.compile('orders[self.n <= $s]', dedup='bag')
+        s = frozenset([1, 2])
+        self.assertEqual(len(q({'orders': l, '$s': s})), 2)
+
+    def test_replace_kind(self):
+        l = orders()
+        hashed = pyflwor.index(l, 'n')
+        self.assertEqual(hashed.kind, 'hash')
+        ranged = pyflwor.index(l, 'n', kind='sorted')
+        self.assertEqual(ranged.kind, 'sorted')
+        self.assertTrue(indexes.indexes_of(l).indexes[('n',)] is ranged)
+        self.assertTrue(pyflwor.index(l, 'n', kind='sorted') is ranged)
+        l.append(A(3.5, 'z'))
+        self.assertEqual(list(pyflwor.execute('l[self.n > 3 and self.n < 4]/n', {'l': l})),
+                         [3.5])
+
+    def test_rebuild(self):
+        l = orders()
+        pyflwor.index(l, 'n', kind='sorted')
+        q = pyflwor.compile('l[self.n >= 10 and self.n < 12]/n')
+        self.assertEqual(list(q({'l': l})), [10, 11])
+        l[0].n = 10.5 ## changed in place
+        l[10] = A(20, 'z') ## replaced
+        l[17].n = float('nan')
+        self.assertEqual(list(q({'l': l})), [10.5, 11])
+        l[0].n = 3
+        self.assertEqual(list(q({'l': l})), [11])
+        self.assertRaises(TypeError, pyflwor.index, list(l), 'n', kind='sorted')
+
+
+if __name__ == '__main__':
+    unittest.main()
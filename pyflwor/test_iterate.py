@@ -0,0 +1,161 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_iterate.py
+Purpose: Tests for lazily iterated query results
+'''
+from __future__ import absolute_import
+
+import itertools, unittest
+
+from . import pyflwor
+
+
+class A(object):
+    def __init__(self, n, c=()):
+        self.n = n
+        self.c = c
+
+class Counted(object):
+    '''an iterable counting how many items were taken from it'''
+    def __init__(self, items):
+        self.items = items
+        self.taken = 0
+    def __iter__(self):
+        for x in self.items:
+            self.taken += 1
+            yield x
+
+def namespace():
+    return {'l': [A(1, [A(10), A(11)]), A(2, [A(10), A(12)]), A(3)]}
+
+QUERIES = [
+    'l/n',
+    'l[self.n > 1]/c/n',
+    'l/c[self.n > 10]/n',
+    'for x in <l> return x.n',
+    'for x in <l> return "n":x.n',
+    'l/c/n | l/n',
+    'l/c/n - l[self.n > 1]/c/n',
+    'bag l/c/n',
+    'for x in <bag l/c> return x.n',
+]
+
+
+class TestIterate(unittest.TestCase):
+
+    def test_same_results(self):
+        ns = namespace()
+        for backend in pyflwor.BACKENDS:
+            for query in QUERIES:
+                q = pyflwor.compile(query, backend=backend)
+                self.assertEqual(list(q.iterate(ns)), list(q(ns)), query)
+                q = pyflwor.compile(query, backend=backend, parameterize=True)
+                self.assertEqual(list(q.iterate(ns)), list(q(ns)), query)
+
+    def test_distinct(self):
+        q = pyflwor.compile('l/c/n')
+        self.assertEqual(list(q.iterate(namespace())), [10, 11, 12])
+
+    def test_first_result(self):
+        for backend in pyflwor.BACKENDS:
+            l = Counted(A(i) for i in itertools.count())
+            q = pyflwor.compile('l[self.n > 4]/n', backend=backend)
+            self.assertEqual(list(itertools.islice(q.iterate({'l':l}), 2)), [5, 6])
+            self.assertEqual(l.taken, 7)
+        l = Counted(A(i) for i in range(100))
+        q = pyflwor.compile('x[if (1 == 1) then <l[self.n > 5]> else <m>]',
+                            backend='codegen')
+        self.assertEqual(len(q({'x':1, 'l':l, 'm':[]})), 1)
+        self.assertEqual(l.taken, 7)
+
+    def test_prepared(self):
+        q = pyflwor.prepare('l[self.n > $n]/n')
+        it = q.iterate(namespace(), n=1)
+        self.assertEqual(next(it), 2)
+        self.assertRaises(TypeError, q.iterate, namespace())
+
+
+class TestLazyConsumers(unittest.TestCase):
+
+    def test_some(self):
+        for backend in pyflwor.BACKENDS:
+            l = Counted(A(i) for i in range(100))
+            q = pyflwor.compile('x[some y in <l> satisfies (y.n == 3)]', backend=backend)
+            self.assertEqual(len(q({'x':1, 'l':l})), 1)
+            self.assertEqual(l.taken, 4)
+
+    def test_every(self):
+        for backend in pyflwor.BACKENDS:
+            l = Counted(A(i) for i in range(100))
+            q = pyflwor.compile('x[every y in <l> satisfies (y.n < 3)]', backend=backend)
+            self.assertEqual(len(q({'x':1, 'l':l})), 0)
+            self.assertEqual(l.taken, 4)
+            ## an empty collection satisfies neither quantifier
+            self.assertEqual(len(q({'x':1, 'l':[]})), 0)
+            q = pyflwor.compile('x[some y in <l> satisfies (y.n < 3)]', backend=backend)
+            self.assertEqual(len(q({'x':1, 'l':[]})), 0)
+
+    def test_in(self):
+        for backend in pyflwor.BACKENDS:
+            l = Counted(A(i) for i in range(100))
+            q = pyflwor.compile('x[2 in <l/n>]', backend=backend)
+            self.assertEqual(len(q({'x':1, 'l':l})), 1)
+            self.assertEqual(l.taken, 3)
+            q = pyflwor.compile('x[200 not in <l/n>]', backend=backend)
+            self.assertEqual(len(q({'x':1, 'l':[A(1)]})), 1)
+
+    def test_bool(self):
+        l = Counted(A(i) for i in range(100))
+        q = pyflwor.compile('x[if y then <l/n> else <m>]')
+        self.assertEqual(len(q({'x':1, 'y':True, 'l':l, 'm':[]})), 1)
+        self.assertEqual(l.taken, 1)
+        self.assertEqual(len(q({'x':1, 'y':False, 'l':l, 'm':[]})), 0)
+        l = Counted(A(i) for i in range(100))
+        q = pyflwor.compile('x[if (1 == 1) then <l[self.n > 5]> else <m>]')
+        self.assertEqual(len(q({'x':1, 'l':l, 'm':[]})), 1)
+        self.assertEqual(l.taken, 7)
+        l = Counted(A(i) for i in range(100))
+        q = pyflwor.compile('x[if (1 == 1) then <l[self.n > 5]> else <m>]',
+                            backend='codegen')
+        self.assertEqual(len(q({'x':1, 'l':l, 'm':[]})), 1)
+        self.assertEqual(l.taken, 7)
+
+
+class TestSetOperations(unittest.TestCase):
+
+    def test_filtered_left_operand(self):
+        ## the right operands of & and - filter the left one as it is
+        ## traversed, an empty right operand of & ends the query at once
+        for backend in pyflwor.BACKENDS:
+            l = Counted(A(i) for i in range(100))
+            q = pyflwor.compile('l/n & m/n & k/n', backend=backend)
+            ns = {'l':l, 'm':[A(i) for i in range(0, 100, 2)], 'k':[A(3), A(4), A(6)]}
+            self.assertEqual(list(q(ns)), [4, 6])
+            self.assertEqual(l.taken, 100)
+            l.items = [A(i) for i in range(100)]
+            l.taken = 0
+            self.assertEqual(list(q(dict(ns, k=[]))), [])
+            self.assertEqual(l.taken, 0)
+            it = pyflwor.compile('l/n - m/n - k/n', backend=backend).iterate(
+                dict(ns, l=Counted(A(i) for i in itertools.count())))
+            self.assertEqual(list(itertools.islice(it, 3)), [1, 5, 7])
+
+    def test_order(self):
+        ns = {'a':[A(i) for i in [5, 1, 4, 2]], 'b':[A(i) for i in [2, 3, 5]]}
+        for backend in pyflwor.BACKENDS:
+            e = lambda q: list(pyflwor.compile(q, backend=backend)(ns))
+            self.assertEqual(e('a/n | b/n'), [5, 1, 4, 2, 3])
+            self.assertEqual(e('a/n & b/n'), [5, 2])
+            self.assertEqual(e('b/n & a/n'), [2, 5])
+            self.assertEqual(e('a/n - b/n'), [1, 4])
+            self.assertEqual(e('a/n - (b/n | a/n[self == 4])'), [1])
+            self.assertEqual(e('(a/n | b/n) & b/n[self > 2]'), [5, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -53,6 +53,8 @@ def comparable_tokens():
 
 class TestLexer(unittest.TestCase):
 
+    Lexer = lexer.Lexer
+
     def test_contextmng(self):
         t1 = token("NAME", 'a', 0, 1)
         t2 = token("NAME", 'a', 0, 1)
@@ -61,7 +63,7 @@ class TestLexer(unittest.TestCase):
             self.assertEquals(t1, t2)
 
     def test_NAME(self):
-        clex = lexer.Lexer()
+        clex = self.Lexer()
         clex.input('a 9a')
         tokens = [token("NAME", 'a', 0, 1),
                   token("NUMBER", 9, 2, 1),
@@ -72,7 +74,7 @@ class TestLexer(unittest.TestCase):
                 self.assertEquals(t1, tokens[i])
 
     def test_STRING(self):
-        clex = lexer.Lexer()
+        clex = self.Lexer()
         clex.input("'asdf' \"asdf\" '\n'")
         tokens = [token("STRING", 'asdf', 0, 1),
                   token("STRING", 'asdf', 7, 1),
@@ -82,7 +84,7 @@ class TestLexer(unittest.TestCase):
                 self.assertEquals(t1, tokens[i])
 
     def test_HEX(self):
-        clex = lexer.Lexer()
+        clex = self.Lexer()
         clex.input("0xab 0xab")
         tokens = [token("NUMBER", 0xab, 0, 1),
                   token("NUMBER", 171, 5, 1)]
@@ -91,7 +93,7 @@ class TestLexer(unittest.TestCase):
                 self.assertEquals(next(clex), t2)
 
     def test_FLOAT(self):
-        clex = lexer.Lexer()
+        clex = self.Lexer()
         clex.input("1.2 .2 2.3e4 .2 2.3e4")
         tokens = [token("NUMBER", 1.2, 0, 1), token("NUMBER", .2, 4, 1),
                   token("NUMBER", 2.3e4, 7, 1), token("NUMBER", .2, 13, 1),
@@ -101,7 +103,7 @@ class TestLexer(unittest.TestCase):
                 self.assertEquals(next(clex), t2)
 
     def test_OCT(self):
-        clex = lexer.Lexer()
+        clex = self.Lexer()
         clex.input("073 073 073")
         tokens = [token("NUMBER", 0o73, 0, 1),
                   token("NUMBER", 59, 4, 1),
@@ -111,7 +113,7 @@ class TestLexer(unittest.TestCase):
                 self.assertEquals(next(clex), t2)
 
     def test_DEC(self):
-        clex = lexer.Lexer()
+        clex = self.Lexer()
         clex.input("73 730 7")
         tokens = [token("NUMBER", 73, 0, 1),
                   token("NUMBER", 730, 3, 1),
@@ -122,7 +124,7 @@ class TestLexer(unittest.TestCase):
 
     def test_KEYWORDS(self):
         for value, typ in list(lexer.reserved.items()):
-            clex = lexer.Lexer()
+            clex = self.Lexer()
             clex.input(value)
             tokens = [token(typ, value, 0, 1)]
             with comparable_tokens():
@@ -137,7 +139,7 @@ class TestLexer(unittest.TestCase):
                            attr[2:] != 'ignore']:
             if value[0] == '\\':
                 value = value[1:]
-            clex = lexer.Lexer()
+            clex = self.Lexer()
             clex.input(value)
             tokens = [token(typ, value, 0, 1)]
             with comparable_tokens():
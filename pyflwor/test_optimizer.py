@@ -0,0 +1,193 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_optimizer.py
+Purpose: Tests for the query IR and the optimizer
+'''
+from __future__ import absolute_import
+
+import unittest
+
+from .OrderedSet import OrderedSet as oset
+from . import pyflwor
+from . import ir
+from .optimizer import optimize
+
+exe = pyflwor.execute
+
+def attr(*names):
+    return ir.AttributeValue([ir.Attribute(n, None) for n in names])
+
+
+class TestIR(unittest.TestCase):
+
+    def test_parse_path(self):
+        self.assertEqual(pyflwor.parse('a/b[self.x == 1]'),
+            ir.Path([ir.Step('a', None),
+                     ir.Step('b', ir.Compare('==', attr('self', 'x'), ir.Literal(1)))]))
+
+    def test_parse_flwr(self):
+        plan = pyflwor.parse('for x in <a> where x return "x":x')
+        self.assertTrue(isinstance(plan, ir.FLWR))
+        self.assertEqual(plan.fors, [ir.For('x', ir.Path([ir.Step('a', None)]))])
+        self.assertEqual(plan.where, ir.Bool(attr('x')))
+        self.assertEqual(plan.ret, ir.Return([attr('x')], ['x'], False))
+        self.assertEqual(plan.collects, None)
+
+    def test_parse_negate(self):
+        self.assertEqual(pyflwor.parse('a[-x]').steps[0].where,
+            ir.Bool(ir.Arith('*', ir.Literal(-1.0), attr('x'))))
+
+    def test_walk(self):
+        plan = pyflwor.parse('a[x in <b/c>]')
+        kinds = [n.__class__.__name__ for n in plan.walk()]
+        self.assertEqual(kinds, ['Path', 'Step', 'In', 'AttributeValue',
+                                 'Attribute', 'Path', 'Step', 'Step'])
+
+    def test_transform_shares_unchanged(self):
+        plan = pyflwor.parse('a[x]/b')
+        new = ir.transform(plan, lambda n: n)
+        self.assertTrue(new is plan)
+        new = ir.transform(plan, lambda n:
+            n.replace(name='z') if isinstance(n, ir.Step) and n.name == 'b' else n)
+        self.assertFalse(new is plan)
+        self.assertTrue(new.steps[0] is plan.steps[0])
+        self.assertEqual(new.steps[1], ir.Step('z', None))
+
+    def test_node_args(self):
+        self.assertRaises(TypeError, ir.Not, 1, 2)
+        self.assertRaises(TypeError, ir.Not, operand=1, other=2)
+        self.assertEqual(ir.Step('a'), ir.Step('a', None))
+
+
+class TestOptimizer(unittest.TestCase):
+
+    def test_double_negation(self):
+        plan = optimize(pyflwor.parse('a[not (not x)]'))
+        self.assertEqual(plan.steps[0].where, ir.Bool(attr('x')))
+
+    def test_negated_in(self):
+        plan = optimize(pyflwor.parse('a[not (x in <b>)]'))
+        self.assertEqual(plan.steps[0].where.op, 'not in')
+        plan = optimize(pyflwor.parse('a[not (x not in [1])]'))
+        self.assertEqual(plan.steps[0].where.op, 'in')
+
+    def test_rules_compose(self):
+        ## not (not (x in b)) => bool(x in b) => x in b
+        plan = optimize(pyflwor.parse('a[not (not (x in <b>))]'))
+        self.assertEqual(plan.steps[0].where,
+                         ir.In('in', attr('x'), ir.Path([ir.Step('b', None)])))
+
+    def test_does_not_modify_input(self):
+        plan = pyflwor.parse('a[not (not x)]')
+        optimize(plan)
+        self.assertEqual(plan.steps[0].where, ir.Not(ir.Not(ir.Bool(attr('x')))))
+
+    def test_custom_rules(self):
+        def rename(node):
+            if isinstance(node, ir.Step) and node.name == 'a':
+                return node.replace(name='b')
+        plan = optimize(pyflwor.parse('a/a'), rules=[rename])
+        self.assertEqual(plan, ir.Path([ir.Step('b', None), ir.Step('b', None)]))
+
+    def test_semantics(self):
+        a = 'hello'
+        x = [1, 2]
+        b = [1, 3]
+        self.assertEqual(exe('a[not (not x)]', locals()), oset([a]))
+        self.assertEqual(exe('a[not (not (1 in <b>))]', locals()), oset([a]))
+        self.assertEqual(exe('a[not (2 in <b>)]', locals()), oset([a]))
+        self.assertEqual(exe('a[not (2 not in <x>)]', locals()), oset([a]))
+
+    def test_explain(self):
+        s = pyflwor.explain('a[not (not x)]')
+        self.assertTrue('Bool' in s and 'Not' not in s)
+        s = pyflwor.explain('a[not (not x)]', optimized=False)
+        self.assertTrue('Not' in s)
+
+
+class TestConstantFolding(unittest.TestCase):
+
+    def where(self, query):
+        return optimize(pyflwor.parse(query)).steps[0].where
+
+    def test_negative_literal(self):
+        self.assertEqual(self.where('a[self.x == -5]'),
+                         ir.Compare('==', attr('self', 'x'), ir.Literal(-5.0)))
+
+    def test_arith(self):
+        self.assertEqual(self.where('a[self.x > 2*3 + 1]').right, ir.Literal(7))
+        ## same (python 2) division semantics as at runtime
+        self.assertEqual(self.where('a[self.x > 1/2]').right, ir.Literal(0))
+        self.assertEqual(self.where('a[self.x > 1.0/2]').right, ir.Literal(0.5))
+
+    def test_errors_not_folded(self):
+        where = self.where('a[self.x > 1/0]')
+        self.assertEqual(where.right, ir.Arith('/', ir.Literal(1), ir.Literal(0)))
+        self.assertRaises(ZeroDivisionError, exe, 'a[self > 1/0]', {'a':[1]})
+
+    def test_true_where_dropped(self):
+        plan = optimize(pyflwor.parse('a[1 < 2]/b["x"]/c[not 0]'))
+        self.assertEqual(plan, ir.Path([ir.Step('a', None), ir.Step('b', None),
+                                        ir.Step('c', None)]))
+        plan = optimize(pyflwor.parse('for x in <a> where 1 == 1 return x'))
+        self.assertEqual(plan.where, None)
+
+    def test_false_where_kept(self):
+        self.assertEqual(self.where('a[1 > 2]'), ir.Literal(False))
+        self.assertEqual(exe('a[1 > 2]', {'a':[1, 2]}), oset())
+
+    def test_boolop(self):
+        self.assertEqual(self.where('a[1 == 1 and x]'), ir.Bool(attr('x')))
+        self.assertEqual(self.where('a[1 == 2 and x]'), ir.Literal(False))
+        ## a literal on the right is not folded
+        self.assertEqual(self.where('a[x or 1 == 1]'),
+                         ir.BoolOp('or', ir.Bool(attr('x')), ir.Literal(True)))
+
+    def test_constant_in(self):
+        self.assertEqual(self.where('a[self in [1, "b", 3]]'),
+                         ir.In('in', attr('self'), ir.ConstSet((1, 'b', 3))))
+        self.assertEqual(self.where('a[self in [1, x]]').collection.__class__,
+                         ir.ListValue)
+        self.assertEqual(self.where('a["b" not in ["a", "b"]]'), ir.Literal(False))
+
+    def test_constant_in_semantics(self):
+        a = [1, 2.0, 'b', 'c']
+        class B(object):
+            def __init__(self, value): self.value = value
+        b = [B(1), B([1]), B('c')]
+        for backend in pyflwor.BACKENDS:
+            self.assertEqual(exe('a[self in [1, 2, "b"]]', locals(), backend=backend),
+                             oset([1, 2.0, 'b']))
+            self.assertEqual(exe('a[self not in [1, 2, "b"]]', locals(), backend=backend),
+                             oset(['c']))
+            ## unhashable values are compared with each literal
+            self.assertEqual(exe('b[self.value not in [1, "b"]]', locals(),
+                                 backend=backend), oset([b[1], b[2]]))
+
+    def test_index_probes(self):
+        step = optimize(pyflwor.parse('a[self.c.n == "x" and (f(self) or self.q == 1)]')).steps[0]
+        self.assertEqual(step.probes, [ir.Probe(('c', 'n'), '==', ir.Literal('x'))])
+        step = optimize(pyflwor.parse('a[$v == self.q and self.r == 2.5]')).steps[0]
+        self.assertEqual(step.probes, [ir.Probe(('q',), '==', ir.Param('v')),
+                                       ir.Probe(('r',), '==', ir.Literal(2.5))])
+        step = optimize(pyflwor.parse('a[self.r > 1 and 5 >= self.r and $v < self.q]')).steps[0]
+        self.assertEqual(step.probes, [ir.Probe(('r',), '>', ir.Literal(1)),
+                                       ir.Probe(('r',), '<=', ir.Literal(5)),
+                                       ir.Probe(('q',), '>', ir.Param('v'))])
+        for query in ['a[self.q != 1]', 'a[self.q == x]', 'a[self == 1]',
+                      'a[self.f() == 1]', 'a[x.q == 1]', 'a[self.q == 1 or y]']:
+            self.assertEqual(optimize(pyflwor.parse(query)).steps[0].probes, None, query)
+
+    def test_literal_compare(self):
+        a = [1, 5, 10]
+        self.assertEqual(exe('a[self > 4]', locals()), oset([5, 10]))
+        self.assertEqual(exe('a[4 > self]', locals()), oset([1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_orderedset.py
+Purpose: Tests for the ordered sets of path results
+'''
+from __future__ import absolute_import
+
+import gc, pickle, unittest, weakref
+
+from .OrderedSet import OrderedSet as oset
+from .IdentitySet import IdentitySet
+
+
+class TestOrderedSet(unittest.TestCase):
+
+    def test_order(self):
+        s = oset('abracadabra')
+        self.assertEqual(list(s), ['a', 'b', 'r', 'c', 'd'])
+        self.assertEqual(list(reversed(s)), ['d', 'c', 'r', 'b', 'a'])
+        s.add('a')
+        s.add('z')
+        s.discard('b')
+        s.discard('q')
+        self.assertEqual(list(s), ['a', 'r', 'c', 'd', 'z'])
+        self.assertEqual(s.pop(), 'z')
+        self.assertEqual(s.pop(last=False), 'a')
+        self.assertEqual(repr(s), "OrderedSet(['r', 'c', 'd'])")
+        self.assertEqual(repr(oset()), 'OrderedSet()')
+        self.assertRaises(KeyError, oset().pop)
+
+    def test_operators(self):
+        a, b = oset([5, 1, 4, 2]), oset([2, 3, 5])
+        self.assertEqual(list(a | b), [5, 1, 4, 2, 3])
+        self.assertEqual(list(a & b), [5, 2])
+        self.assertEqual(list(a - b), [1, 4])
+        self.assertEqual(list(a ^ b), [1, 4, 3])
+        self.assertEqual(list(a & set([1, 2])), [1, 2])
+        self.assertEqual(list(set([3]) | a), [3, 5, 1, 4, 2])
+        self.assertEqual(list(frozenset([1, 9]) - a), [9])
+        self.assertEqual(list(a.union([7], b)), [5, 1, 4, 2, 7, 3])
+        self.assertEqual(list(a.intersection([2, 5, 1], b)), [5, 2])
+        self.assertEqual(list(a.difference([1], [2])), [5, 4])
+        self.assertTrue(a.isdisjoint([0, 9]))
+        c = oset(a)
+        c |= [0]
+        c -= [5]
+        c &= b | oset([0])
+        self.assertEqual(list(c), [2, 0])
+        self.assertEqual(list(a), [5, 1, 4, 2])
+
+    def test_comparisons(self):
+        a = oset([1, 2, 3])
+        self.assertEqual(a, oset([1, 2, 3]))
+        self.assertNotEqual(a, oset([3, 2, 1])) ## order matters between OrderedSets
+        self.assertEqual(a, set([3, 2, 1]))
+        self.assertEqual(a, [3, 2, 1, 1])
+        self.assertNotEqual(a, None)
+        self.assertTrue(oset([1, 2]) < a)
+        self.assertTrue(a <= a and a >= a and not a < a)
+        self.assertTrue(a > set([3]))
+        self.assertFalse(a <= set([1, 2]))
+
+    def test_no_cycles(self):
+        ## freed by reference counting alone
+        class X(object): pass
+        x = X()
+        s = oset([x, 1, 'a'])
+        r = weakref.ref(x)
+        gc.disable()
+        try:
+            del x, s
+            self.assertTrue(r() is None)
+        finally:
+            gc.enable()
+
+    def test_pickle(self):
+        s = oset([3, 1, 2])
+        self.assertEqual(pickle.loads(pickle.dumps(s)), s)
+
+    def test_identity_set(self):
+        x, y = [1], [1]
+        s = IdentitySet([x, y, x])
+        self.assertEqual(len(s), 2)
+        self.assertTrue(x in s and [1] not in s)
+        self.assertEqual(s, IdentitySet([x, y]))
+        self.assertNotEqual(s, IdentitySet([y, x]))
+        self.assertEqual(list(s - IdentitySet([y])), [x])
+        self.assertEqual(list(s & IdentitySet([y])), [y])
+        s.discard(x)
+        self.assertEqual(list(s), [y])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,8 +12,10 @@ NB: Should test most of the language, as in make sure examples compile. Tests
 '''
 from __future__ import absolute_import
 
-import unittest, os, sys, base64, itertools, random, time
+import unittest, os, sys, base64, itertools, random, time, threading, subprocess
 from . import pyflwor
+from .parser import Parser
+from .lexer import Lexer
 
 
 class TestParser(unittest.TestCase):
@@ -221,6 +223,61 @@ class TestParser(unittest.TestCase):
           ''')
 
 
+class TestSharedParser(unittest.TestCase):
+
+    def test_reuse(self):
+        self.assertTrue(Parser() is Parser())
+        self.assertFalse(Lexer() is Lexer())
+
+    def test_no_lexer_table(self):
+        ## a generated table would be loaded without being checked against
+        ## the token rules, none is written
+        table = os.path.join(os.path.dirname(os.path.abspath(pyflwor.__file__)), 'lextab.py')
+        lexer = Lexer._build()
+        lexer.input('a/b')
+        self.assertEqual([t.type for t in lexer], ['NAME', 'SLASH', 'NAME'])
+        self.assertFalse(os.path.exists(table))
+
+    def test_lineno_reset(self):
+        self.assertRaises(SyntaxError, pyflwor.compile, 'a\n\n\n b', cache=False)
+        try:
+            pyflwor.compile('a b', cache=False)
+        except SyntaxError as e:
+            self.assertTrue(", 1." in str(e))
+
+    def test_threads(self):
+        errors = list()
+        def work(n):
+            try:
+                for i in range(50):
+                    q = pyflwor.compile('l[self > %d]' % i, cache=False)
+                    r = q({'l': list(range(100))})
+                    if len(r) != 99 - i:
+                        errors.append((n, i, len(r)))
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self.assertEqual(errors, [])
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_parser_loaded_on_first_compile(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = '; '.join([
+            'import sys',
+            'sys.path.insert(0, %r)' % root,
+            'import pyflwor',
+            'assert "ply" not in sys.modules, "ply imported"',
+            'assert "past" not in sys.modules, "past imported"',
+            'assert pyflwor.execute("a[self / 2 == 1]", {"a": [2, 3, 4]}) == set([2, 3])',
+            'assert "ply.yacc" in sys.modules',
+        ])
+        subprocess.check_call([sys.executable, '-c', code])
+
+
 class TestParser2(unittest.TestCase):
     """Test for the new 'feature': 'bla' in ['list', 'of', 'stuffs']"""
 
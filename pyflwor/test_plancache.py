@@ -0,0 +1,113 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_plancache.py
+Purpose: Tests for the on disk plan cache
+'''
+from __future__ import absolute_import
+
+import os, pickle, shutil, tempfile, unittest
+
+from .OrderedSet import OrderedSet as oset
+from .plancache import PlanCache, GRAMMAR_MODULES
+from . import lexer, tokenizer, parser, ir, optimizer
+from . import pyflwor
+
+QUERY = 'a[self > 1]'
+
+class TestPlanCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = PlanCache(os.path.join(self.dir, 'plans'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_roundtrip(self):
+        plan = pyflwor.parse(QUERY)
+        self.assertEqual(self.cache.load(QUERY), None)
+        self.cache.store(QUERY, plan)
+        self.assertEqual(self.cache.load(QUERY), plan)
+        self.assertEqual(self.cache.info()[:3], (1, 1, 0))
+        self.assertEqual(os.listdir(self.cache.directory),
+                         [os.path.basename(self.cache.path(QUERY))])
+
+    def test_corrupt(self):
+        self.cache.store(QUERY, pyflwor.parse(QUERY))
+        path = self.cache.path(QUERY)
+        with open(path, 'r+b') as f:
+            f.truncate(10)
+        self.assertEqual(self.cache.load(QUERY), None)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.cache.info().rebuilds, 1)
+
+    def test_stale(self):
+        self.cache.store(QUERY, pyflwor.parse(QUERY))
+        path = self.cache.path(QUERY)
+        with open(path, 'wb') as f:
+            pickle.dump((('0.1', 'x'), QUERY, pyflwor.parse(QUERY)), f)
+        self.assertEqual(self.cache.load(QUERY), None)
+        self.assertEqual(self.cache.info().rebuilds, 1)
+
+    def test_stamp(self):
+        other = PlanCache(self.cache.directory)
+        other.stamp = ('0.1', 'x')
+        self.assertNotEqual(other.path(QUERY), self.cache.path(QUERY))
+
+    def test_grammar_modules(self):
+        ## both lexer front ends (the tokenizer is the default) decide the plan
+        for module in (lexer, tokenizer, parser, ir, optimizer):
+            self.assertIn(os.path.basename(module.__file__), GRAMMAR_MODULES)
+
+    def test_clear(self):
+        self.cache.store(QUERY, pyflwor.parse(QUERY))
+        self.cache.clear()
+        self.assertEqual(os.listdir(self.cache.directory), [])
+
+    def test_unwritable(self):
+        cache = PlanCache(os.path.join(self.dir, 'file'))
+        open(cache.directory, 'w').close()
+        cache.store(QUERY, pyflwor.parse(QUERY)) ## does not raise
+        self.assertEqual(cache.load(QUERY), None)
+
+
+class TestCompilePlanCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        pyflwor.set_plan_cache(self.dir)
+        pyflwor.clear_cache()
+
+    def tearDown(self):
+        pyflwor.set_plan_cache(None)
+        pyflwor.clear_cache()
+        shutil.rmtree(self.dir)
+
+    def test_no_parse(self):
+        a = [1, 2, 3]
+        self.assertEqual(pyflwor.execute(QUERY, locals()), oset([2, 3]))
+        parse = pyflwor.parse
+        def fail(query): raise AssertionError("parsed %r" % query)
+        pyflwor.parse = fail
+        try:
+            for backend in pyflwor.BACKENDS:
+                q = pyflwor.compile(QUERY, cache=False, backend=backend)
+                self.assertEqual(q(locals()), oset([2, 3]))
+        finally:
+            pyflwor.parse = parse
+        self.assertEqual(pyflwor.plan_cache_info()[:3], (2, 1, 0))
+
+    def test_disabled(self):
+        pyflwor.set_plan_cache(None)
+        self.assertEqual(pyflwor.plan_cache_info(), None)
+        pyflwor.compile(QUERY)
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_prepare.py
+Purpose: Tests for prepared queries and bind parameters
+'''
+from __future__ import absolute_import
+
+import threading, unittest
+
+from .OrderedSet import OrderedSet as oset
+from . import pyflwor
+from . import ir
+
+
+class A(object):
+    def __init__(self, name, n):
+        self.name = name
+        self.n = n
+    def __repr__(self): return 'A(%r, %d)' % (self.name, self.n)
+
+def namespace():
+    return {'l': [A('x', 1), A('y', 2), A('z', 3), A('x', 4)]}
+
+
+class TestPrepare(unittest.TestCase):
+
+    def setUp(self):
+        pyflwor.clear_cache()
+
+    def test_parse(self):
+        self.assertEqual(pyflwor.parse('l[self.n > $n]').steps[0].where,
+            ir.Compare('>', ir.AttributeValue([ir.Attribute('self', None),
+                                               ir.Attribute('n', None)]),
+                       ir.Param('n')))
+        self.assertEqual(pyflwor.parse('l[self.n in $ns]').steps[0].where.collection,
+                         ir.Param('ns'))
+        self.assertRaises(SyntaxError, pyflwor.parse, 'l[self.n > $]')
+
+    def test_params(self):
+        q = pyflwor.prepare('for x in <l[self.name == $name]> where x.n > $n return $k * x.n')
+        self.assertEqual(q.params, ('name', 'n', 'k'))
+
+    def test_execute(self):
+        ns = namespace()
+        l = ns['l']
+        for backend in pyflwor.BACKENDS:
+            q = pyflwor.prepare('l[self.name == $name]', backend=backend)
+            self.assertEqual(q.execute(ns, name='x'), oset([l[0], l[3]]))
+            self.assertEqual(q(ns, name='z'), oset([l[2]]))
+            q = pyflwor.prepare('l[self.n in $ns]/name', backend=backend)
+            self.assertEqual(q(ns, ns=[1, 2]), oset(['x', 'y']))
+            q = pyflwor.prepare('l[self.n not in $ns]/name', backend=backend)
+            self.assertEqual(q(ns, ns=[1, 2]), oset(['z', 'x']))
+            q = pyflwor.prepare('''for x in <l> where x.n * $k > $m
+                                   return 'name':x.name, 'n':x.n + $k''', backend=backend)
+            self.assertEqual(q(ns, k=2, m=5), ({'name':'z', 'n':5}, {'name':'x', 'n':6}))
+            q = pyflwor.prepare('l[some y in <l> satisfies (y.n > self.n + $d)]/n',
+                                backend=backend)
+            self.assertEqual(q(ns, d=1), oset([1, 2]))
+
+    def test_compiled_once(self):
+        q = pyflwor.prepare('l[self.n > $n]')
+        for n in range(10):
+            self.assertEqual(len(q(namespace(), n=n)), max(0, 4 - n))
+            self.assertTrue(pyflwor.prepare('l[self.n > $n]').function is q.function)
+        self.assertEqual(pyflwor.cache_info().misses, 1)
+
+    def test_namespace_unchanged(self):
+        ns = namespace()
+        pyflwor.prepare('l[self.n > $n]')(ns, n=1)
+        self.assertEqual(sorted(ns), ['l'])
+
+    def test_namespace_not_copied(self):
+        class Namespace(dict):
+            def __iter__(self): raise AssertionError("namespace copied")
+            def keys(self): raise AssertionError("namespace copied")
+        ns = Namespace(namespace())
+        q = pyflwor.prepare('l[self.n > $n]/n', backend='codegen')
+        self.assertEqual(list(q(ns, n=2)), [3, 4])
+
+    def test_params_resolved_once(self):
+        looked_up = list()
+        class Namespace(dict):
+            def __getitem__(self, key):
+                if key.startswith('$'): looked_up.append(key)
+                return dict.__getitem__(self, key)
+        for backend in pyflwor.BACKENDS:
+            for query in ['l[self.n > $n and self.name != $name]/n',
+                          'for x in <l> where x.n > $n and x.name != $name return x.n']:
+                del looked_up[:]
+                q = pyflwor.compile(query, backend=backend)
+                ns = Namespace(namespace(), **{'$n': 1, '$name': 'z'})
+                self.assertEqual(list(q(ns)), [2, 4])
+                self.assertEqual(list(q.iterate(ns)), [2, 4])
+                self.assertEqual(sorted(looked_up), ['$n', '$n', '$name', '$name'])
+
+    def test_bad_params(self):
+        q = pyflwor.prepare('l[self.n > $n and self.name == $name]')
+        self.assertRaises(TypeError, q, namespace(), n=1)
+        self.assertRaises(TypeError, q, namespace(), n=1, name='x', other=2)
+
+    def test_unbound(self):
+        self.assertRaises(KeyError, pyflwor.execute, 'l[self.n > $n]', namespace())
+
+    def test_codegen_hoists(self):
+        q = pyflwor.prepare('l[self.n > $n and self.n < $n + 2]', backend='codegen')
+        self.assertEqual(q.function.__source__.count("objs['$n']"), 1)
+
+    def test_threads(self):
+        q = pyflwor.prepare('l[self.n > $n]/n')
+        errors = list()
+        def work(n):
+            try:
+                for _ in range(200):
+                    r = q(namespace(), n=n)
+                    if list(r) != list(range(n+1, 5)):
+                        errors.append((n, r))
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,10 +21,12 @@ try:
     from .OrderedSet import OrderedSet as oset
     from . import pyflwor
     from . import symbols
+    from .IdentitySet import IdentitySet
 except SystemError:
     from OrderedSet import OrderedSet as oset
     import pyflwor
     import symbols
+    from IdentitySet import IdentitySet
 
 exe = pyflwor.execute
 class TestPyQuery(unittest.TestCase):
@@ -401,6 +403,293 @@ class TestPyQuery(unittest.TestCase):
             {1: 1, 2: 1, 3: 3, 4: 3, 5: 2, 6: 2, 7: 2},
             {0: 1, 1: 4, 2: 5, 3: 4}))
 
+    def test_root_namespace(self):
+        class A(object):
+            def __init__(self, n): self.n = n
+        d = dict(('v%d' % i, A(i)) for i in range(5000))
+        for backend in pyflwor.BACKENDS:
+            self.assertEquals(exe('v42/n', d, backend=backend), oset([42]))
+            self.assertEquals(exe('v4999[self.n > 1]/n', d, backend=backend), oset([4999]))
+            ## names are only resolved in the namespace, not on a class built from it
+            self.assertEquals(exe('__class__', d, backend=backend), oset())
+            self.assertEquals(exe('__doc__', {'__doc__':'doc'}, backend=backend),
+                              oset(['doc']))
+            self.assertEquals(exe('missing/n', d, backend=backend), oset())
+
+    def test_scopes(self):
+        ## variables are bound in scopes over the namespace, which is never copied
+        class Namespace(dict):
+            def __iter__(self): raise AssertionError("namespace copied")
+            def keys(self): raise AssertionError("namespace copied")
+        class A(object):
+            def __init__(self, n): self.n = n
+        d = Namespace(l=[A(1), A(2), A(3)], k=2, self='outer')
+        for backend in pyflwor.BACKENDS:
+            self.assertEquals(exe('l[self.n > k]/n', d, backend=backend), oset([3]))
+            self.assertEquals(exe('l[some x in <l> satisfies (x.n > self.n)]/n', d,
+                                  backend=backend), oset([1, 2]))
+            self.assertEquals(exe('''for x in <l>
+                                     let y = x.n * k
+                                     let f = function(z) { z + y }
+                                     where y > 2
+                                     return f(k)''', d, backend=backend), (6, 8))
+            self.assertEquals(exe('for x in <l> return self', d, backend=backend),
+                              ('outer',)*3)
+            self.assertEquals(sorted(dict.keys(d)), ['k', 'l', 'self'])
+        s = symbols.Scope({'a':1}, [('b', 2)])
+        self.assertEquals((s['a'], s['b'], s.get('c', 3)), (1, 2, 3))
+        self.assertTrue('a' in s and 'b' in s and 'c' not in s)
+        self.assertRaises(KeyError, lambda: s['c'])
+
+    def test_attribute_kinds(self):
+        import collections
+        class S(object):
+            __slots__ = ('n', 'c')
+            def __init__(self, n, c=None):
+                self.n = n
+                self.c = c
+        class P(object):
+            def __init__(self, n): self._n = n
+            @property
+            def n(self): return self._n
+            @property
+            def broken(self): raise AttributeError('inner')
+        T = collections.namedtuple('T', 'n')
+        objs = [S(1, S(2)), P(3), T(4)]
+        try:
+            from dataclasses import dataclass
+        except ImportError:
+            pass
+        else:
+            D = dataclass(frozen=True)(type('D', (object,), {'__annotations__':{'n':int, 'c':object}}))
+            objs.append(D(6, D(7, None)))
+        d = {'l':objs, 'p':P(8), 'f':lambda x: x * 2, 'hasattr':hasattr}
+        for backend in pyflwor.BACKENDS:
+            self.assertEquals(exe('l[self.n > 0]/n', d, backend=backend),
+                              oset(x.n for x in objs))
+            self.assertEquals(exe('l[hasattr(self, "c") and self.c.n > 1]/c/n', d,
+                                  backend=backend),
+                              oset(x.c.n for x in objs if hasattr(x, 'c')))
+            self.assertEquals(exe('for x in <p> return f(x.n)', d, backend=backend), (16,))
+        self.assertRaises(Exception, exe, 'for x in <p> return x.missing', d)
+        try:
+            exe('for x in <p> return x.broken', d)
+        except Exception as e:
+            self.assertTrue('did not have attr broken' in str(e))
+        else:
+            self.fail('no exception')
+
+    def test_call_params(self):
+        ## call parameters which are query functions are computed, whatever
+        ## the expression (if expressions were passed uncalled)
+        d = {'f':lambda x: x * 2, 'l':[1, 2], 'x':3}
+        self.assertEquals(exe('for y in <l> return f(if (y == 1) then x else y)', d), (6, 4))
+        self.assertEquals(exe('for y in <l> return f(y + x)', d), (8, 10))
+
+    def test_unwritable_objects(self):
+        import collections
+        class S(object):
+            __slots__ = ('n', 'c')
+            def __init__(self, n, c=()):
+                self.n = n
+                self.c = c
+        T = collections.namedtuple('T', 'n c')
+        l = [S(1, [S(2), S(3)]), T(4, (T(5, ()),))]
+        ints = [1, 2]
+        for backend in pyflwor.BACKENDS:
+            self.assertEquals(exe('l/c/n', locals(), backend=backend), oset([2, 3, 5]))
+            self.assertEquals(exe('l[self.n > 1]/c/n', locals(), backend=backend),
+                              oset([5]))
+            self.assertEquals(exe('ints/n', locals(), backend=backend), oset())
+        self.assertFalse(hasattr(l[0].c[0], '_objquery__i'))
+
+    def test_mappings(self):
+        ## a step on a mapping looks up the key, lists of dicts are collections
+        ## of records
+        import json, collections
+        doc = json.loads('''{"store": {"items": [
+            {"name": "pen", "price": 2, "tags": ["office"]},
+            {"name": "desk", "price": 150, "tags": ["office", "furniture"]},
+            {"name": "lamp", "price": 30}]}}''')
+        class M(collections.abc.Mapping):
+            def __init__(self, d): self.d = d
+            def __getitem__(self, k): return self.d[k]
+            def __iter__(self): return iter(self.d)
+            def __len__(self): return len(self.d)
+        m = [M({'x': 1}), M({'y': 2}), M({'x': 3})]
+        d = {'doc': doc, 'm': m}
+        for backend in pyflwor.BACKENDS:
+            for traversal in pyflwor.TRAVERSALS:
+                e = lambda q: exe(q, d, backend=backend, traversal=traversal)
+                self.assertEquals(e('doc/store/items/name'), oset(['pen', 'desk', 'lamp']))
+                self.assertEquals(e('doc/store/items[self["price"] > 10]/name'),
+                                  oset(['desk', 'lamp']))
+                self.assertEquals(e('doc/store/items/tags'), oset(['office', 'furniture']))
+                self.assertEquals(e('doc/store/missing'), oset())
+                self.assertEquals(e('doc/store/keys'), oset()) ## not dict.keys
+                self.assertEquals(e('m/x'), oset([1, 3]))
+                ## records are results de-duplicated by identity (a dict does
+                ## not hash), hashable results with them by value
+                items = doc['store']['items']
+                self.assertEquals(e('doc/store'), IdentitySet([doc['store']]))
+                self.assertEquals(e('doc/store/items[self["price"] > 10]'),
+                                  IdentitySet(items[1:]))
+                self.assertEquals(list(e('doc/store/items | doc/store/items')), items)
+                self.assertEquals(list(e('doc/store/items - doc/store/items[self["price"] > 10]')),
+                                  items[:1])
+                self.assertEquals(e('doc/store/items/price | doc/store/items/price'),
+                                  oset([2, 150, 30]))
+                self.assertEquals(list(pyflwor.compile('doc/store/items', backend=backend)
+                                       .iterate(dict(d, doc={'store': {'items': items*2}}))),
+                                  items)
+                ## a mapping is not a collection of key, value entries (they
+                ## were before mapping steps looked up keys)
+                self.assertRaises(Exception, e, 'doc/store[self.key == "items"]/value')
+                self.assertEquals(e('doc/store/items/value'), oset())
+
+    def test_descendants(self):
+        ## a/descendant::b looks b up on every object reachable from a, once
+        ## per object whatever the cycles
+        import collections
+        class N(object):
+            def __init__(self, v, kids=()):
+                self.v = v
+                self.kids = list(kids)
+        class C(collections.abc.Mapping):
+            expanded = 0
+            def __init__(self, d): self.d = d
+            def __getitem__(self, k): return self.d[k]
+            def __iter__(self): return iter(self.d)
+            def __len__(self): return len(self.d)
+            def values(self):
+                C.expanded += 1
+                return self.d.values()
+        leaf = N(3)
+        a, b = N(1, [leaf]), N(2, [leaf])
+        a.kids.append(b)
+        b.kids.append(a) ## a cycle
+        c = C({'v': 4, 'next': a})
+        leaf.more = c
+        d = {'r': [a, b], 'doc': {'x': [{'price': 1}, {'y': {'price': 2}}], 'price': 3}}
+        for backend in pyflwor.BACKENDS:
+            for traversal in pyflwor.TRAVERSALS:
+                e = lambda q: exe(q, d, backend=backend, traversal=traversal)
+                C.expanded = 0
+                self.assertEquals(e('r/descendant::v'), oset([1, 3, 4, 2]))
+                self.assertEquals(C.expanded, 1)
+                self.assertEquals(e('r/descendant::kids[self.v > 1]/v'), oset([3, 2]))
+                self.assertEquals(e('r/descendant::kids/descendant::next/v'), oset([1]))
+                self.assertEquals(e('doc/descendant::price'), oset([3, 1, 2]))
+                self.assertEquals(e('doc/descendant::missing'), oset())
+                ## the items of an iterator are not searched, it would be
+                ## consumed
+                h = N(6)
+                h.g = (N(5) for _ in range(1))
+                self.assertEquals(exe('h/descendant::v', {'h': h}, backend=backend,
+                                      traversal=traversal), oset([6]))
+                self.assertEquals(len(list(h.g)), 1)
+        q = pyflwor.compile('r/descendant::v')
+        self.assertEquals(next(q.iterate(d)), 1)
+        ## // always starts a comment, whatever the spaces around it
+        self.assertEquals(exe('r//v', d), oset([a, b]))
+        self.assertEquals(exe('r // v', d), oset([a, b]))
+        self.assertEquals(exe('r/kids//v', d), oset([leaf, b, a]))
+        self.assertRaises(SyntaxError, exe, 'r/ descendant :: v', d) ## not the axis
+
+    def test_identity_dedup(self):
+        ## dedup='identity' never hashes the results: unhashable results are
+        ## fine and distinct equal objects are distinct results
+        class H(object):
+            def __init__(self, n): self.n = n
+            def __hash__(self): raise AssertionError('hashed')
+            def __eq__(self, other): return self.n == other.n
+        x, y = H(1), H(1)
+        d = {'l': [x, y, x], 'j': [[1], [1], {'a': 2}], 'n': [[3], [4]]}
+        d['o'] = {'kids': d['l']}
+        for backend in pyflwor.BACKENDS:
+            for traversal in pyflwor.TRAVERSALS:
+                e = lambda q: pyflwor.compile(q, backend=backend, traversal=traversal,
+                                              dedup='identity')
+                r = e('l')(d)
+                self.assertTrue(isinstance(r, IdentitySet))
+                self.assertEquals([id(v) for v in r], [id(x), id(y)])
+                self.assertEquals([id(v) for v in e('o/kids[self.n == 1]')(d)],
+                                  [id(x), id(y)])
+                self.assertEquals(list(e('j')(d)), [[1], [1], {'a': 2}])
+                self.assertEquals(list(e('j').iterate(d)), [[1], [1], {'a': 2}])
+                self.assertEquals(list(e('j - n')(d)), [[1], [1], {'a': 2}])
+                self.assertEquals(len(e('l | o/kids')(d)), 2)
+                self.assertEquals(e('j[self in <n>]')(d), IdentitySet())
+                ## by value the unhashable results are distinct by identity
+                ## as well (see symbols.valueSet)
+                self.assertEquals(list(exe('j', d, backend=backend, traversal=traversal)),
+                                  [[1], [1], {'a': 2}])
+        self.assertRaises(ValueError, pyflwor.compile, 'l', dedup='hash')
+
+    def test_bag(self):
+        ## dedup='bag' (or the bag keyword on a path) keeps every object
+        ## reached, in order, without hashing it
+        class H(object):
+            def __init__(self, n): self.n = n
+            def __hash__(self): raise AssertionError('hashed')
+        x, y = H(1), H(2)
+        d = {'l': [x, y, x], 'm': [1, 2, 2, 3], 'n': [2, 4]}
+        d['o'] = {'kids': d['l']}
+        x.bag, y.bag = 1, 2
+        d['bag'] = [x, y]
+        for backend in pyflwor.BACKENDS:
+            for traversal in pyflwor.TRAVERSALS:
+                e = lambda q, dedup='bag': pyflwor.compile(q, backend=backend,
+                    traversal=traversal, dedup=dedup)(d)
+                self.assertEquals(e('l'), [x, y, x])
+                self.assertEquals(e('o/kids[self.n == 1]'), [x, x])
+                self.assertEquals(e('l | o/kids'), [x, y, x, x, y, x])
+                self.assertEquals(e('m & n'), [2, 2])
+                self.assertEquals(e('m - n - n'), [1, 3])
+                self.assertEquals(e('for k in <o/kids> return k.n'), (1, 2, 1))
+                self.assertEquals(e('m[<m> is <m | n[self < 3]>]'), [1, 2, 2, 3])
+                self.assertEquals(e('bag m', 'value'), [1, 2, 2, 3])
+                self.assertEquals(e('bag m | n', 'value'), oset([1, 2, 3, 4]))
+                self.assertEquals(e('for k in <bag o/kids> return k.n', 'value'),
+                                  (1, 2, 1))
+                self.assertEquals(e('for k in <bag o/kids> return k.n', 'identity'),
+                                  (1, 2, 1))
+                self.assertEquals(e('m[<bag m[self > 1]> subset <m>]', 'value'), oset([1, 2, 3]))
+                self.assertEquals(e('m[<bag n> subset <m>]', 'value'), oset())
+                ## bag is a name anywhere but before a path
+                self.assertEquals(e('bag /* a bag */ bag/bag'), [1, 2])
+                self.assertEquals(e('bag[self.bag == 2]/n'), [2])
+                self.assertEquals(e('for k in <bag> where k.bag == 1 return bag'),
+                                  (d['bag'],))
+
+    def test_threads_shared_graph(self):
+        import threading
+        class Node(object):
+            def __init__(self, n):
+                self.n = n
+                self.next = list()
+        nodes = [Node(i) for i in range(20)]
+        for i, node in enumerate(nodes):
+            node.next = [nodes[(i+1) % 20], nodes[(i+7) % 20]]
+        d = {'nodes': nodes}
+        queries = ['nodes/next/n', 'nodes/next/next/n', 'nodes[self.n < 5]/next/next/next/n',
+                   'nodes/next[self.n > 10]/next/n']
+        for backend in pyflwor.BACKENDS:
+            expected = [exe(q, d, backend=backend) for q in queries]
+            errors = list()
+            def work(k):
+                try:
+                    for j in range(100):
+                        i = (j + k) % len(queries)
+                        r = exe(queries[i], d, backend=backend)
+                        if r != expected[i]: errors.append((queries[i], r))
+                except Exception as e:
+                    errors.append(e)
+            threads = [threading.Thread(target=work, args=(k,)) for k in range(8)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+            self.assertEquals(errors, [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,169 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_templates.py
+Purpose: Tests for literal parameterization and query fingerprints
+'''
+from __future__ import absolute_import
+
+import unittest
+
+from .OrderedSet import OrderedSet as oset
+from .symbols import LiteralSet
+from . import pyflwor
+from . import templates
+
+
+class A(object):
+    def __init__(self, name, n):
+        self.name = name
+        self.n = n
+
+def namespace():
+    return {'l': [A('x', 1), A('y', 2), A('z', 3), A('x', 4)]}
+
+
+class TestParameterize(unittest.TestCase):
+
+    def test_template(self):
+        t = pyflwor.fingerprint('l[self.n > 5 and self.name == "x"]')
+        self.assertEqual(t.text, 'l [ self . n > $__p0 and self . name == $__p1 ]')
+        self.assertEqual(t.values, (5, 'x'))
+
+    def test_same_fingerprint(self):
+        a = pyflwor.fingerprint('l[self.n > 5]')
+        b = pyflwor.fingerprint('''l[ self.n>0x10 ] // comment
+                                   /* another */''')
+        self.assertEqual(a.fingerprint, b.fingerprint)
+        self.assertEqual(b.values, (16,))
+        c = pyflwor.fingerprint('l[self.n >= 5]')
+        self.assertNotEqual(a.fingerprint, c.fingerprint)
+
+    def test_in_list(self):
+        a = pyflwor.fingerprint('l[self.n in [1, 2, 3]]')
+        b = pyflwor.fingerprint('l[self.n not in ["a"]]')
+        self.assertEqual(a.text, 'l [ self . n in $__p0 ]')
+        self.assertEqual(a.values, (LiteralSet([1, 2, 3]),))
+        self.assertEqual(b.text, 'l [ self . n not in $__p0 ]')
+        ## lists which are not only literals, or are iterated are not lifted whole
+        c = pyflwor.fingerprint('l[self.n in [1, x]]')
+        self.assertEqual(c.text, 'l [ self . n in [ $__p0 , x ] ]')
+        d = pyflwor.fingerprint('for x in [1, 2] return x')
+        self.assertEqual(d.text, 'for x in [ $__p0 , $__p1 ] return x')
+
+    def test_kept_literals(self):
+        t = pyflwor.fingerprint('''for x in <l> where x.n > 1
+                                   order by 'n' desc
+                                   return 'n':x.n, 'd':{'a':2}''')
+        self.assertEqual(t.values, (1, 2))
+        self.assertTrue("order by \"n\" desc" in t.text)
+        self.assertTrue("\"n\" : x . n" in t.text)
+        t = pyflwor.fingerprint('for x in <l> order by 1 ascd return x.n, x.name')
+        self.assertEqual(t.values, ())
+
+    def test_user_params(self):
+        t = pyflwor.fingerprint('l[self.n > $n and self.n < 3]')
+        self.assertEqual(t.text, 'l [ self . n > $n and self . n < $__p0 ]')
+        self.assertRaises(SyntaxError, pyflwor.fingerprint, 'l[self.n > $__p0]')
+
+    def test_string_escapes(self):
+        t = pyflwor.fingerprint('for x in <l> return "a\\\\tb":x')
+        ns = namespace()
+        self.assertEqual(pyflwor.execute(t.text, ns)[0],
+                         pyflwor.execute('for x in <l> return "a\\\\tb":x', ns)[0])
+        self.assertEqual(list(pyflwor.execute(t.text, ns)[0]), ['a\\tb'])
+
+
+class TestCompileParameterized(unittest.TestCase):
+
+    def setUp(self):
+        pyflwor.clear_cache()
+        pyflwor.clear_template_stats()
+
+    def test_shared_plan(self):
+        ns = namespace()
+        l = ns['l']
+        for backend in pyflwor.BACKENDS:
+            pyflwor.clear_cache()
+            for n in range(5):
+                r = pyflwor.execute('l[self.n > %d]' % n, ns, backend=backend,
+                                    parameterize=True)
+                self.assertEqual(r, oset(l[n:]))
+            ## one compile of the template, the variants are not cached
+            self.assertEqual(pyflwor.cache_info()[:2], (4, 1))
+            self.assertEqual(pyflwor.cache_info().currsize, 1)
+
+    def test_template_not_evicted(self):
+        pyflwor.set_cache_size(2)
+        try:
+            for n in range(10):
+                pyflwor.compile('l[self.n > %d]' % n, parameterize=True)
+            self.assertEqual(pyflwor.cache_info()[:3], (9, 1, 0))
+        finally:
+            pyflwor.set_cache_size(512)
+
+    def test_results(self):
+        ns = namespace()
+        queries = [
+            'l[self.name in ["x", "z"]]/n',
+            'l[self.name not in ["x"]]/n',
+            'for x in <l> where x.n * 2 > 3 order by "n" desc return "n":x.n + 1',
+            'for x in <l> where x.name == "x" order by 1 ascd return x.n, "c"',
+            'for x in [1, 2, 3] return x * 2',
+            'l[self.n > 1 and self.n < 4]/name',
+        ]
+        for backend in pyflwor.BACKENDS:
+            for query in queries:
+                self.assertEqual(
+                    pyflwor.execute(query, ns, backend=backend, parameterize=True),
+                    pyflwor.execute(query, ns, backend=backend), query)
+
+    def test_stats(self):
+        ns = namespace()
+        for n in range(3):
+            for _ in range(n + 1):
+                pyflwor.execute('l[self.n > %d]' % n, ns, parameterize=True)
+        pyflwor.execute('l[self.name == "x"]', ns, parameterize=True)
+        stats = pyflwor.template_stats()
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(stats[0].template, 'l [ self . n > $__p0 ]')
+        self.assertEqual(stats[0][2:], (3, 6))
+        self.assertEqual(stats[1][2:], (1, 1))
+        self.assertEqual(stats[0].fingerprint, pyflwor.fingerprint('l[self.n > 7]').fingerprint)
+
+    def test_variants(self):
+        for query in ['l[self.n > 16]', 'l[self.n>0x10] // again', 'l[self.n > 17]']:
+            pyflwor.compile(query, parameterize=True)
+            pyflwor.compile(query, cache=False, parameterize=True)
+        self.assertEqual(pyflwor.template_stats()[0].variants, 2)
+
+    def test_many_variants(self):
+        for n in range(5000):
+            pyflwor.compile('l[self.n > %d and self.name in ["a", "b"]]' % n,
+                            parameterize=True)
+        pyflwor.compile('l[self.n > 7 and self.name in ["a", "b"]]', parameterize=True)
+        stats = templates.STATS
+        self.assertEqual(len(list(stats.entries.values())[0][1]), templates.VARIANT_HASHES)
+        variants = pyflwor.template_stats()[0].variants
+        self.assertTrue(4000 < variants < 6000, variants)
+
+    def test_prepared(self):
+        q = pyflwor.prepare('l[self.n > $n and self.name == "x"]', parameterize=True)
+        self.assertEqual(q.params, ('n',))
+        self.assertEqual(len(q(namespace(), n=0)), 2)
+
+    def test_syntax_error(self):
+        try:
+            pyflwor.compile('l[self.n > 5 5]', parameterize=True)
+        except SyntaxError as e:
+            self.assertEqual(str(e), "Syntax error at 'LexToken(NUMBER,5,1,13)', 1.13")
+        else:
+            self.fail('no syntax error')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: test_tokenizer.py
+Purpose: Tests that the Tokenizer produces the same tokens as the Lexer
+'''
+from __future__ import absolute_import
+
+import random
+import unittest
+
+from . import lexer
+from . import pyflwor
+from . import test_lexer
+from .tokenizer import Tokenizer
+
+QUERIES = [
+    'hello/hello[self.x == 1.5e3 and self.y != .25]',
+    'a[self in [0x1f, 017, 12, "s\'q", \'d"q\']]',
+    'a[x <= 1 or x >= 2 or x < 3 or x > 4]',
+    '<a> | <b> & <c> - <d>',
+    '''for x in <a>, y in <b> // a comment
+       let z = function(q) { q.r }
+       /* a
+          multi line ** comment */
+       where every v in <x> satisfies (v is not y)
+       order by 'x' desc
+       return 'x':x, 'y':flatten (y)''',
+    'collect x.y as {1:2}[1] with f',
+    'a/*b*/c /**/ d /*/ e',
+    'a/descendant::b[x]/descendant::c // comment\n a /descendant:: b',
+    'a/x//comment\n r//v r // v a/descendant:b a/ descendant::b /descendant',
+    'for x in <bag a/descendant::b> return bag, x.bag',
+    'bag bag/bag a/bag[self.bag == bag] bag /* c */ a bag // c\n b x == bag return bagx',
+    '1. 1e5 1e+5 2E-3 0x 08x 9a',
+    '\n\n  a\t\n b',
+    '',
+]
+
+def stream(lex, text):
+    lex.input(text)
+    result = list()
+    try:
+        for t in lex:
+            result.append((t.type, t.value, t.lineno, t.lexpos))
+    except Exception as e:
+        result.append((e.__class__.__name__, str(e)))
+    result.append(lex.lineno)
+    return result
+
+
+class TestTokenizerLexerCases(test_lexer.TestLexer):
+    '''runs the Lexer tests against the Tokenizer'''
+
+    Lexer = Tokenizer
+
+
+class TestTokenizer(unittest.TestCase):
+
+    def assertSameTokens(self, text):
+        self.assertEqual(stream(Tokenizer(), text), stream(lexer.Lexer(), text), text)
+
+    def test_queries(self):
+        for query in QUERIES:
+            self.assertSameTokens(query)
+
+    def test_errors(self):
+        for text in ['a ? b', 'a\n\nb $c', '"unterminated', 'a\r\nb', '08']:
+            self.assertSameTokens(text)
+
+    def test_lazy_errors(self):
+        t = Tokenizer()
+        t.input('a b ?')
+        self.assertEqual(t.token().value, 'a')
+        self.assertEqual(t.token().value, 'b')
+        self.assertRaises(Exception, t.token)
+
+    def test_fuzz(self):
+        pieces = ['a', 'b1', '_', 'in', 'not', 'order', '0', '07', '0x1', '1.',
+                  '.5', '3e2', '"s"', "'t'", '"', "'", '/', '*', '//', '/*',
+                  '*/', '-', '=', '==', '<', '<=', '>', '!', '!=', '[', ']',
+                  ' ', '\t', '\n', '?', '.', ',', ':', '|', '&', '{', '}']
+        rand = random.Random(8)
+        for _ in range(2000):
+            text = ''.join(rand.choice(pieces) for _ in range(rand.randint(0, 12)))
+            self.assertSameTokens(text)
+
+    def test_parse(self):
+        for query in ['a[self.x == 1]/b', 'for x in <a> return x']:
+            self.assertEqual(pyflwor.parse(query, lexer='tokenizer'),
+                             pyflwor.parse(query, lexer='ply'))
+        self.assertRaises(ValueError, pyflwor.parse, 'a', lexer='flex')
+
+    def test_syntax_error_position(self):
+        for lex in pyflwor.LEXERS:
+            try:
+                pyflwor.parse('a\n  b', lexer=lex)
+            except SyntaxError as e:
+                self.assertEqual(str(e), "Syntax error at 'LexToken(NAME,'b',2,4)', 2.4")
+            else:
+                self.fail('no syntax error')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+'''
+PyQuery - The Python Object Query System
+Author: Tim Henderson
+Contact: tim.tadh@hackthology.com
+Copyright (c) 2010 All Rights Reserved.
+Licensed under a BSD style license see the LICENSE file.
+
+File: tokenizer.py
+Purpose: A single pass tokenizer producing the same tokens as the PLY Lexer.
+
+The PLY lexer (lexer.py) calls a python function for every NAME, STRING and
+NUMBER token and matches comments with a heavily backtracking regex. The
+Tokenizer scans the whole input with one regular expression (re.finditer), the
+alternatives being in the same order of precedence as the PLY master regex,
+and converts the token values inline. It produces the same token types, values,
+line numbers and positions (as ply LexTokens) and raises the same errors, so
+either can be handed to the Parser.
+'''
+from builtins import object
+
+import re
+
+from ply.lex import LexToken
+
+try:
+    from .lexer import tokens, name_type
+except SystemError:
+    from lexer import tokens, name_type
+
+## Same alternatives as Lexer: the function rules in definition order, then
+## the string rules longest first. A block comment ends at the first */ (which
+## is what the comment regex of the Lexer matches as well).
+_token = re.compile(r'''
+    (?P<WS>[ \t]+)
+  | (?P<STRING>"[^"]*"|'[^']*')
+  | (?P<NAME>[a-zA-Z_][a-zA-Z_0-9]*)
+  | (?P<HEX>0[xX][a-fA-F0-9]+)
+  | (?P<FLOAT>[0-9]+[Ee][+-]?[0-9]+|[0-9]*\.[0-9]+(?:[Ee][+-]?[0-9]+)?)
+  | (?P<INT>[0-9]+)
+  | (?P<DESCENDANT>/descendant::)
+  | (?P<COMMENT>//.*|/\*[\s\S]*?\*/)
+  | (?P<NEWLINE>\n+)
+  | (?P<OP>>=|<=|==|!=|[.*\-+:|(){}<>\[\]=,/&$])
+''', re.VERBOSE)
+
+OPERATORS = {
+    '>=':'GE', '<=':'LE', '==':'EQEQ', '!=':'NQ', '.':'DOT', '*':'STAR',
+    '-':'DASH', '+':'PLUS', ':':'COLON', '|':'UNION', '(':'LPAREN',
+    ')':'RPAREN', '{':'LCURLY', '}':'RCURLY', '<':'LANGLE', '>':'RANGLE',
+    '[':'LSQUARE', ']':'RSQUARE', '=':'EQ', ',':'COMMA', '/':'SLASH',
+    '&':'INTERSECTION', '$':'DOLLAR',
+}
+
+
+class Tokenizer(object):
+    '''
+    Implements the part of the PLY lexer interface the parser uses: input(),
+    token() and iteration. Tokens are produced lazily, so as with the Lexer an
+    illegal character is only reported once the parser gets to it.
+    '''
+
+    tokens = tokens
+
+    def __init__(self):
+        self.lineno = 1
+        self.lexpos = 0
+        self.lexdata = None
+        self._tokens = iter(())
+
+    def input(self, data):
+        self.lexdata = data
+        self.lexpos = 0
+        self._tokens = self._scan(data)
+
+    def token(self):
+        return next(self._tokens, None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = self.token()
+        if t is None:
+            raise StopIteration
+        return t
+
+    next = __next__
+
+    def _scan(self, data):
+        pos = 0
+        for m in _token.finditer(data):
+            start = m.start()
+            if start != pos:
+                self._error(data, pos)
+            pos = m.end()
+            kind = m.lastgroup
+            if kind == 'WS':
+                continue
+            value = m.group()
+            if kind == 'NAME':
+                typ = name_type(value, data, pos)
+            elif kind == 'OP':
+                typ = OPERATORS[value]
+            elif kind == 'DESCENDANT':
+                typ = 'DESCENDANT'
+            elif kind == 'INT':
+                typ = 'NUMBER'
+                if len(value) > 1 and value[0] == '0':
+                    value = int(value, 8)
+                else:
+                    value = int(value, 10)
+            elif kind == 'STRING':
+                typ = 'STRING'
+                value = value[1:-1]
+            elif kind == 'FLOAT':
+                typ = 'NUMBER'
+                value = float(value)
+            elif kind == 'HEX':
+                typ = 'NUMBER'
+                value = int(value, 16)
+            else: ## NEWLINE and COMMENT
+                self.lineno += value.count('\n')
+                continue
+            t = LexToken()
+            t.type = typ
+            t.value = value
+            t.lineno = self.lineno
+            t.lexpos = start
+            self.lexpos = pos
+            yield t
+        if pos != len(data):
+            self._error(data, pos)
+
+    def _error(self, data, pos):
+        t = LexToken()
+        t.type = 'error'
+        t.value = data[pos:]
+        t.lineno = self.lineno
+        t.lexpos = pos
+        self.lexpos = pos
+        raise Exception("Illegal character '%s'" % t)